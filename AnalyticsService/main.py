@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import psycopg2
 import json
@@ -6,16 +6,36 @@ import logging
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+import rollups
+from response_cache import ResponseCache, ResponseCacheMiddleware
+from pagination import (
+    NEXT_CURSOR_HEADER, decode_cursor, fetch_limit, finish_page,
+    keyset_clause, page_size, parse_fields, select_columns,
+)
+from structured_logging import RequestLoggingMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Analytics Service", description="Dashboard analytics and statistics service")
 
+# The dashboard polls these; (ttl, stale_ttl) in seconds per route prefix.
+# Registered before CORS so cached responses still get CORS headers.
+response_cache = ResponseCache({
+    "/dashboard-stats/": (30, 300),
+    "/recent-activity/": (30, 300),
+    "/activity-timeline/": (60, 600),
+    "/service-usage/": (60, 600),
+    "/user-applications/": (30, 300),
+    "/user-enhanced-resumes/": (60, 600),
+    "/user-cover-letters/": (60, 600),
+})
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,7 +47,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Request-ID"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -42,6 +64,47 @@ def get_db_connection():
         logging.error(f"Database connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
+@app.on_event("startup")
+def install_activity_rollups():
+    """Make sure the rollup tables and triggers exist before serving"""
+    try:
+        conn = get_db_connection()
+    except HTTPException:
+        logging.error("Database unavailable at startup; dashboard reads raw tables")
+        return
+    try:
+        rollups.install_rollups(conn)
+    finally:
+        conn.close()
+
+# Indexes matching the keyset order of the paged list endpoints: (sort key, id) newest first
+KEYSET_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_jobs_applied_applicant_keyset
+        ON jobs_applied (applicant_id, COALESCE(application_date, DATE '1970-01-01') DESC, job_id DESC);
+    CREATE INDEX IF NOT EXISTS idx_enhanced_resumes_user_keyset
+        ON enhanced_resumes (user_id, COALESCE(created_at, TIMESTAMP '1970-01-01') DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_cover_letter_applicant_keyset
+        ON cover_letter (applicant_id, COALESCE(created_at, TIMESTAMP '1970-01-01') DESC, cv_id DESC);
+"""
+
+@app.on_event("startup")
+def create_keyset_indexes():
+    """Independent of the rollups, so paged lists stay on index scans with ANALYTICS_ROLLUPS off"""
+    try:
+        conn = get_db_connection()
+    except HTTPException:
+        logging.error("Database unavailable at startup; skipping keyset indexes")
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute(KEYSET_INDEXES_SQL)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logging.warning(f"Could not create keyset indexes: {e}")
+    finally:
+        conn.close()
+
 @app.get("/")
 def health_check():
     """Health check endpoint"""
@@ -147,334 +210,363 @@ def test_create_application(user_id: str = "yEP9dNXUcvdi88efBGv4pKvR0vk2"):
         logging.error(f"Error creating test application: {e}")
         return {"error": str(e)}
 
+# Every dashboard counter for a set of users in one round trip
+DASHBOARD_STATS_QUERY = """
+    WITH ids AS (
+        SELECT DISTINCT unnest(%s::text[]) AS user_id
+    ),
+    apps AS (
+        SELECT applicant_id AS user_id,
+               COUNT(*) AS total_applications,
+               COUNT(*) FILTER (WHERE application_status = 'interview') AS total_interviews
+        FROM jobs_applied
+        WHERE applicant_id IN (SELECT user_id FROM ids)
+        GROUP BY applicant_id
+    ),
+    resumes AS (
+        SELECT user_id, COUNT(*) AS total_resumes
+        FROM enhanced_resumes
+        WHERE user_id IN (SELECT user_id FROM ids)
+        GROUP BY user_id
+    ),
+    letters AS (
+        SELECT applicant_id AS user_id, COUNT(*) AS total_cover_letters
+        FROM cover_letter
+        WHERE applicant_id IN (SELECT user_id FROM ids)
+        GROUP BY applicant_id
+    ),
+    matcher AS (
+        SELECT user_id, usage_count
+        FROM service_usage
+        WHERE user_id IN (SELECT user_id FROM ids) AND service_name = 'job_matcher'
+    )
+    SELECT ids.user_id,
+           COALESCE(apps.total_applications, 0),
+           COALESCE(apps.total_interviews, 0),
+           COALESCE(resumes.total_resumes, 0),
+           COALESCE(letters.total_cover_letters, 0),
+           COALESCE(matcher.usage_count, 0)
+    FROM ids
+    LEFT JOIN apps ON apps.user_id = ids.user_id
+    LEFT JOIN resumes ON resumes.user_id = ids.user_id
+    LEFT JOIN letters ON letters.user_id = ids.user_id
+    LEFT JOIN matcher ON matcher.user_id = ids.user_id
+"""
+
+# Same counters read from the trigger-maintained rollups (see rollups.py)
+DASHBOARD_ROLLUP_QUERY = """
+    SELECT ids.user_id,
+           COALESCE(t.applications, 0),
+           COALESCE(t.interviews, 0),
+           COALESCE(t.enhanced_resumes, 0),
+           COALESCE(t.cover_letters, 0),
+           COALESCE(t.job_matcher_uses, 0)
+    FROM (SELECT DISTINCT unnest(%s::text[]) AS user_id) ids
+    LEFT JOIN user_activity_totals t ON t.user_id = ids.user_id
+"""
+
+MAX_DASHBOARD_BATCH = int(os.getenv("MAX_DASHBOARD_BATCH", "500"))
+
+def build_dashboard_stats(total_applications: int, total_interviews: int, total_resumes: int,
+                          total_cover_letters: int, job_matcher_usage: int) -> Dict[str, Any]:
+    """Derive the dashboard payload from the raw counters"""
+    stats = {
+        'totalApplications': total_applications,
+        'totalResumesGenerated': total_resumes,
+        'totalCoverLettersGenerated': total_cover_letters,
+        'totalJobsShown': job_matcher_usage * 10,  # Assume 10 jobs shown per session
+        'totalJobsSelected': total_applications,
+        'totalInterviews': total_interviews,
+        'totalSavedJobs': int(total_applications * 0.3),  # Assume 30% saved
+        'profileViews': total_applications * 2,  # Mock based on applications
+    }
+    if total_applications > 0:
+        stats['applicationSuccessRate'] = round((total_interviews / total_applications) * 100)
+    else:
+        stats['applicationSuccessRate'] = 0
+    stats['averageMatchScore'] = 85  # Mock data for now
+    return stats
+
+def fetch_dashboard_stats(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Dashboard stats keyed by user_id, computed with a single query"""
+    conn = cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        query = DASHBOARD_ROLLUP_QUERY if rollups.ROLLUPS_READY else DASHBOARD_STATS_QUERY
+        cur.execute(query, (list(user_ids),))
+        return {row[0]: build_dashboard_stats(*row[1:]) for row in cur.fetchall()}
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
 @app.get("/dashboard-stats/{user_id}")
 def get_dashboard_stats(user_id: str):
     """Get comprehensive dashboard statistics for a user"""
+    try:
+        stats = fetch_dashboard_stats([user_id])[user_id]
+        logging.info(f"Retrieved dashboard stats for user {user_id}")
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting dashboard stats for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
+
+@app.get("/dashboard-stats")
+def get_dashboard_stats_batch(request: Request):
+    """Dashboard statistics for several users (?user_ids=a&user_ids=b or user_ids[]=a)"""
+    user_ids = request.query_params.getlist("user_ids") + request.query_params.getlist("user_ids[]")
+    user_ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="At least one user_ids value is required")
+    if len(user_ids) > MAX_DASHBOARD_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DASHBOARD_BATCH} user_ids per request")
+    try:
+        stats = fetch_dashboard_stats(user_ids)
+        logging.info(f"Retrieved dashboard stats for {len(stats)} users")
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting batch dashboard stats: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
+
+@app.get("/activity-timeline/{user_id}")
+def get_activity_timeline(user_id: str, days: int = 30):
+    """Per-day activity counters for the last `days` days"""
+    if not rollups.ROLLUPS_READY:
+        raise HTTPException(status_code=503, detail="Activity rollups are not available")
+    days = max(1, min(days, 366))
+    conn = cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        
-        stats = {}
-        
-        # 1. Get total applications
         cur.execute("""
-            SELECT COUNT(*) as total_applications
-            FROM jobs_applied 
-            WHERE applicant_id = %s
-        """, (user_id,))
-        result = cur.fetchone()
-        stats['totalApplications'] = result[0] if result else 0
-        
-        # Debug: Check if any applications exist
-        cur.execute("""
-            SELECT * FROM jobs_applied 
-            WHERE applicant_id = %s
-            LIMIT 1
-        """, (user_id,))
-        debug_applications = cur.fetchall()
-        logging.info(f"Debug: Found {len(debug_applications)} applications for user {user_id}")
-        if debug_applications:
-            logging.info(f"Debug: Sample application columns: {[desc[0] for desc in cur.description]}")
-            logging.info(f"Debug: Sample application data: {debug_applications[0]}")
-        
-        # Debug: Check all applications in the table
-        cur.execute("""
-            SELECT applicant_id, COUNT(*) as count 
-            FROM jobs_applied 
-            GROUP BY applicant_id
-        """)
-        all_applications = cur.fetchall()
-        logging.info(f"Debug: All applications in table: {all_applications}")
-        
-        # Debug: Check if user has any applications with different user_id format
-        cur.execute("""
-            SELECT * FROM jobs_applied 
-            LIMIT 3
-        """)
-        sample_all = cur.fetchall()
-        if sample_all:
-            logging.info(f"Debug: Sample applications from table: {sample_all}")
-            logging.info(f"Debug: Sample applicant_id format: {sample_all[0][0] if sample_all[0] else 'None'}")
-        
-        # 2. Get enhanced resumes count
-        cur.execute("""
-            SELECT COUNT(*) as total_resumes
-            FROM enhanced_resumes 
-            WHERE user_id = %s
-        """, (user_id,))
-        result = cur.fetchone()
-        stats['totalResumesGenerated'] = result[0] if result else 0
-        
-        # Debug: Check if any enhanced resumes exist
-        cur.execute("""
-            SELECT id, user_id, created_at 
-            FROM enhanced_resumes 
-            WHERE user_id = %s
-            LIMIT 5
-        """, (user_id,))
-        debug_resumes = cur.fetchall()
-        logging.info(f"Debug: Found {len(debug_resumes)} enhanced resumes for user {user_id}")
-        for resume in debug_resumes:
-            logging.info(f"Debug: Resume - ID: {resume[0]}, User: {resume[1]}, Created: {resume[2]}")
-        
-        # 3. Get cover letters count
-        cur.execute("""
-            SELECT COUNT(*) as total_cover_letters
-            FROM cover_letter 
-            WHERE applicant_id = %s
-        """, (user_id,))
-        result = cur.fetchone()
-        stats['totalCoverLettersGenerated'] = result[0] if result else 0
-        
-        # 4. Get service usage for job matching
-        cur.execute("""
-            SELECT usage_count
-            FROM service_usage 
-            WHERE user_id = %s AND service_name = 'job_matcher'
-        """, (user_id,))
-        result = cur.fetchone()
-        job_matcher_usage = result[0] if result else 0
-        stats['totalJobsShown'] = job_matcher_usage * 10  # Assume 10 jobs shown per session
-        stats['totalJobsSelected'] = stats['totalApplications']
-        
-        # 5. Calculate interviews (applications with interview status)
-        cur.execute("""
-            SELECT COUNT(*) as total_interviews
-            FROM jobs_applied 
-            WHERE applicant_id = %s AND application_status = 'interview'
-        """, (user_id,))
-        result = cur.fetchone()
-        stats['totalInterviews'] = result[0] if result else 0
-        
-        # 6. Calculate saved jobs (mock data for now)
-        stats['totalSavedJobs'] = int(stats['totalApplications'] * 0.3)  # Assume 30% saved
-        
-        # 7. Calculate profile views (mock based on applications)
-        stats['profileViews'] = stats['totalApplications'] * 2
-        
-        # 8. Calculate success rate (interviews / applications)
-        if stats['totalApplications'] > 0:
-            stats['applicationSuccessRate'] = round((stats['totalInterviews'] / stats['totalApplications']) * 100)
-        else:
-            stats['applicationSuccessRate'] = 0
-        
-        # 9. Calculate average match score (mock data for now)
-        stats['averageMatchScore'] = 85
-        
-        cur.close()
-        conn.close()
-        
-        logging.info(f"Retrieved dashboard stats for user {user_id}: {stats}")
-        return stats
-        
+            SELECT day, applications, interviews, enhanced_resumes, cover_letters, job_matcher_uses
+            FROM user_activity_daily
+            WHERE user_id = %s AND day > CURRENT_DATE - %s
+            ORDER BY day
+        """, (user_id, days))
+        return [
+            {"date": row[0].isoformat(), **dict(zip(rollups.ROLLUP_COUNTERS, row[1:]))}
+            for row in cur.fetchall()
+        ]
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Error getting dashboard stats for user {user_id}: {e}")
+        logging.error(f"Error getting activity timeline for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get activity timeline: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
         if conn:
             conn.close()
-        raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
+
+APPLICATION_COLUMNS = {
+    "application_id": "ja.applicant_id",
+    "job_id": "ja.job_id",
+    "job_title": "oj.job_title",
+    "org_name": "o.Org_Name",
+    "job_location": "oj.job_location",
+    "applied_date": "ja.application_date",
+    "status": "ja.application_status",
+    "created_at": "ja.sent_at",
+    "resume_sent": "TRUE",
+    "cover_letter_sent": "TRUE",
+}
+
+def format_application(name: str, value, job_id):
+    if name == "job_title":
+        return value or f"Job #{job_id}"
+    if name == "org_name":
+        return value or "Unknown Company"
+    if name == "job_location":
+        return value or "Location not specified"
+    if name == "applied_date":
+        return value.isoformat() if value else datetime.now().isoformat().split('T')[0]
+    if name == "status":
+        return value or "Applied"
+    if name == "created_at":
+        return value.isoformat() if value else datetime.now().isoformat()
+    return value
 
 @app.get("/user-applications/{user_id}")
-def get_user_applications(user_id: str):
-    """Get detailed application data for a user"""
+def get_user_applications(user_id: str, response: Response, cursor: Optional[str] = None,
+                          limit: Optional[int] = None, fields: Optional[str] = None):
+    """Get detailed application data for a user, newest first, one page at a time"""
+    selected = parse_fields(fields, list(APPLICATION_COLUMNS))
+    limit = page_size(limit, cursor)
+    sort_expr = "COALESCE(ja.application_date, DATE '1970-01-01')"
+    keyset_sql, keyset_params = keyset_clause(sort_expr, "ja.job_id", decode_cursor(cursor), cast="date")
+    conn = cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        
-        # First, let's see what columns exist
-        cur.execute("""
-            SELECT * FROM jobs_applied 
-            WHERE applicant_id = %s
-            LIMIT 1
-        """, (user_id,))
-        
-        sample = cur.fetchone()
-        if not sample:
-            logging.info(f"No applications found for user {user_id}")
-            return []
-        
-        columns = [desc[0] for desc in cur.description]
-        logging.info(f"Available columns in jobs_applied: {columns}")
-        
-        # Now query with job details from org_jobs table
-        cur.execute("""
-            SELECT 
-                ja.applicant_id,
-                ja.job_id,
-                ja.application_date,
-                ja.application_status,
-                ja.sent_at,
-                ja.updated_at,
-                oj.job_title,
-                oj.job_desc,
-                oj.salary,
-                oj.job_location,
-                oj.experience,
-                oj.work_type,
-                oj.date_posted,
-                oj.qualification,
-                o.Org_Name as org_name
+        cur.execute(f"""
+            SELECT {sort_expr}, ja.job_id,
+                   {select_columns(APPLICATION_COLUMNS, selected)}
             FROM jobs_applied ja
             LEFT JOIN org_jobs oj ON ja.job_id = oj.job_id
             LEFT JOIN Organisation o ON oj.Org_ID = o.Org_ID
-            WHERE ja.applicant_id = %s
-            ORDER BY ja.application_date DESC
-        """, (user_id,))
-        
-        results = cur.fetchall()
-        applications = []
-        
-        logging.info(f"Debug: Raw results from user-applications query: {results}")
-        
-        for row in results:
-            applications.append({
-                "application_id": row[0],  # applicant_id
-                "job_id": row[1],  # job_id
-                "job_title": row[6] or f"Job #{row[1]}",  # job_title from org_jobs
-                "org_name": row[14] or "Unknown Company",  # org_name from Organisation
-                "job_location": row[9] or "Location not specified",  # job_location
-                "applied_date": row[2].isoformat() if row[2] else datetime.now().isoformat().split('T')[0],
-                "status": row[3] or "Applied",  # application_status
-                "created_at": row[4].isoformat() if row[4] else datetime.now().isoformat(),  # sent_at
-                "resume_sent": True,  # Default values
-                "cover_letter_sent": True
-            })
-        
-        cur.close()
-        conn.close()
-        
+            WHERE ja.applicant_id = %s{keyset_sql}
+            ORDER BY 1 DESC, 2 DESC
+            LIMIT %s
+        """, (user_id, *keyset_params, fetch_limit(limit)))
+        rows = finish_page(cur.fetchall(), limit, response)
+        applications = [
+            {name: format_application(name, value, row[1]) for name, value in zip(selected, row[2:])}
+            for row in rows
+        ]
         logging.info(f"Retrieved {len(applications)} applications for user {user_id}")
         return applications
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting applications for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get applications: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
         if conn:
             conn.close()
-        raise HTTPException(status_code=500, detail=f"Failed to get applications: {str(e)}")
+
+ENHANCED_RESUME_COLUMNS = {
+    "id": "er.id",
+    "job_title": "oj.job_title",
+    "org_name": "o.Org_Name",
+    "created_at": "er.created_at",
+    "improvements": "er.improvements",
+    "keywords": "er.keywords",
+}
+
+def format_enhanced_resume(name: str, value):
+    if name == "job_title":
+        return value or "Enhanced Resume"
+    if name == "org_name":
+        return value or "Unknown Company"
+    if name == "created_at":
+        return value.isoformat() if value else datetime.now().isoformat()
+    if name == "improvements":
+        # Handle improvements - it might be a list or JSON string
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except json.JSONDecodeError:
+                return {"suggestions": [value] if value else []}
+        if isinstance(value, list):
+            return {"suggestions": value}
+        return {"suggestions": []}
+    if name == "keywords":
+        # Handle keywords - it might be a list or JSON string
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except json.JSONDecodeError:
+                return [value] if value else []
+        return value if isinstance(value, list) else []
+    return value
 
 @app.get("/user-enhanced-resumes/{user_id}")
-def get_user_enhanced_resumes(user_id: str):
-    """Get enhanced resumes data for a user"""
+def get_user_enhanced_resumes(user_id: str, response: Response, cursor: Optional[str] = None,
+                              limit: Optional[int] = None, fields: Optional[str] = None):
+    """Get enhanced resumes data for a user, newest first, one page at a time"""
+    selected = parse_fields(fields, list(ENHANCED_RESUME_COLUMNS))
+    limit = page_size(limit, cursor)
+    sort_expr = "COALESCE(er.created_at, TIMESTAMP '1970-01-01')"
+    keyset_sql, keyset_params = keyset_clause(sort_expr, "er.id", decode_cursor(cursor))
+    conn = cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                er.id,
-                er.user_id,
-                er.original_resume_url,
-                er.enhanced_resume_url,
-                er.job_id,
-                er.improvements,
-                er.keywords,
-                er.enhanced_content,
-                er.created_at,
-                oj.job_title,
-                o.Org_Name as org_name
+        cur.execute(f"""
+            SELECT {sort_expr}, er.id,
+                   {select_columns(ENHANCED_RESUME_COLUMNS, selected)}
             FROM enhanced_resumes er
             LEFT JOIN org_jobs oj ON er.job_id = oj.job_id
             LEFT JOIN Organisation o ON oj.Org_ID = o.Org_ID
-            WHERE er.user_id = %s
-            ORDER BY er.created_at DESC
-        """, (user_id,))
-        
-        results = cur.fetchall()
-        resumes = []
-        
-        logging.info(f"Debug: Raw results from user-enhanced-resumes query: {results}")
-        
-        for row in results:
-            # Handle improvements - it might be a list or JSON string
-            improvements = row[5]
-            if isinstance(improvements, str):
-                try:
-                    improvements = json.loads(improvements)
-                except json.JSONDecodeError:
-                    improvements = {"suggestions": [improvements] if improvements else []}
-            elif isinstance(improvements, list):
-                improvements = {"suggestions": improvements}
-            else:
-                improvements = {"suggestions": []}
-            
-            # Handle keywords - it might be a list or JSON string
-            keywords = row[6]
-            if isinstance(keywords, str):
-                try:
-                    keywords = json.loads(keywords)
-                except json.JSONDecodeError:
-                    keywords = [keywords] if keywords else []
-            elif not isinstance(keywords, list):
-                keywords = []
-            
-            resumes.append({
-                "id": row[0],
-                "job_title": row[9] or "Enhanced Resume",  # job_title from org_jobs
-                "org_name": row[10] or "Unknown Company",  # org_name from Organisation
-                "created_at": row[8].isoformat() if row[8] else datetime.now().isoformat(),
-                "improvements": improvements,
-                "keywords": keywords
-            })
-        
-        cur.close()
-        conn.close()
-        
+            WHERE er.user_id = %s{keyset_sql}
+            ORDER BY 1 DESC, 2 DESC
+            LIMIT %s
+        """, (user_id, *keyset_params, fetch_limit(limit)))
+        rows = finish_page(cur.fetchall(), limit, response)
+        resumes = [
+            {name: format_enhanced_resume(name, value) for name, value in zip(selected, row[2:])}
+            for row in rows
+        ]
         logging.info(f"Retrieved {len(resumes)} enhanced resumes for user {user_id}")
         return resumes
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting enhanced resumes for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get enhanced resumes: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
         if conn:
             conn.close()
-        raise HTTPException(status_code=500, detail=f"Failed to get enhanced resumes: {str(e)}")
+
+COVER_LETTER_COLUMNS = {
+    "id": "cl.cv_id",
+    "job_title": "oj.job_title",
+    "org_name": "o.Org_Name",
+    "created_at": "cl.created_at",
+    "content": "cl.details",
+}
+
+def format_cover_letter(name: str, value):
+    if name == "job_title":
+        return value or "Cover Letter"
+    if name == "org_name":
+        return value or "Unknown Company"
+    if name == "created_at":
+        return value.isoformat() if value else datetime.now().isoformat()
+    if name == "content":
+        return value or ""
+    return value
 
 @app.get("/user-cover-letters/{user_id}")
-def get_user_cover_letters(user_id: str):
-    """Get cover letters data for a user"""
+def get_user_cover_letters(user_id: str, response: Response, cursor: Optional[str] = None,
+                           limit: Optional[int] = None, fields: Optional[str] = None):
+    """Get cover letters data for a user, newest first, one page at a time"""
+    selected = parse_fields(fields, list(COVER_LETTER_COLUMNS))
+    limit = page_size(limit, cursor)
+    sort_expr = "COALESCE(cl.created_at, TIMESTAMP '1970-01-01')"
+    keyset_sql, keyset_params = keyset_clause(sort_expr, "cl.cv_id", decode_cursor(cursor))
+    conn = cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                cl.cv_id,
-                cl.applicant_id,
-                cl.cv_type,
-                cl.details,
-                cl.job_id,
-                cl.personalized,
-                cl.created_at,
-                oj.job_title,
-                o.Org_Name as org_name
+        cur.execute(f"""
+            SELECT {sort_expr}, cl.cv_id,
+                   {select_columns(COVER_LETTER_COLUMNS, selected)}
             FROM cover_letter cl
             LEFT JOIN org_jobs oj ON cl.job_id = oj.job_id
             LEFT JOIN Organisation o ON oj.Org_ID = o.Org_ID
-            WHERE cl.applicant_id = %s
-            ORDER BY cl.created_at DESC
-        """, (user_id,))
-        
-        results = cur.fetchall()
-        cover_letters = []
-        
-        for row in results:
-            cover_letters.append({
-                "id": row[0],
-                "job_title": row[7] or "Cover Letter",  # job_title from org_jobs
-                "org_name": row[8] or "Unknown Company",  # org_name from Organisation
-                "created_at": row[6].isoformat() if row[6] else datetime.now().isoformat(),
-                "content": row[3] or ""
-            })
-        
-        cur.close()
-        conn.close()
-        
+            WHERE cl.applicant_id = %s{keyset_sql}
+            ORDER BY 1 DESC, 2 DESC
+            LIMIT %s
+        """, (user_id, *keyset_params, fetch_limit(limit)))
+        rows = finish_page(cur.fetchall(), limit, response)
+        cover_letters = [
+            {name: format_cover_letter(name, value) for name, value in zip(selected, row[2:])}
+            for row in rows
+        ]
         logging.info(f"Retrieved {len(cover_letters)} cover letters for user {user_id}")
         return cover_letters
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting cover letters for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get cover letters: {str(e)}")
+    finally:
+        if cur:
+            cur.close()
         if conn:
             conn.close()
-        raise HTTPException(status_code=500, detail=f"Failed to get cover letters: {str(e)}")
 
 @app.get("/service-usage/{user_id}")
 def get_service_usage(user_id: str):
@@ -0,0 +1,264 @@
+"""
+Per-user activity rollups for the analytics dashboard.
+
+user_activity_daily holds one row of counters per user and day, and
+user_activity_totals the running sum per user. Both are maintained by
+triggers on jobs_applied, enhanced_resumes, cover_letter and service_usage,
+so the dashboard reads a single primary-key row instead of aggregating raw
+history on every page load.
+
+A rebuild locks the source tables against writers, so it is not exposed
+over HTTP; run it as a maintenance command:
+
+    python rollups.py rebuild
+"""
+import logging
+import os
+
+ROLLUPS_ENABLED = os.getenv("ANALYTICS_ROLLUPS", "true").lower() in ("1", "true", "yes")
+
+# Set by install_rollups() once the tables and triggers are in place
+ROLLUPS_READY = False
+
+ROLLUP_COUNTERS = ("applications", "interviews", "enhanced_resumes", "cover_letters", "job_matcher_uses")
+
+ROLLUP_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS user_activity_daily (
+    user_id VARCHAR NOT NULL,
+    day DATE NOT NULL,
+    applications INTEGER NOT NULL DEFAULT 0,
+    interviews INTEGER NOT NULL DEFAULT 0,
+    enhanced_resumes INTEGER NOT NULL DEFAULT 0,
+    cover_letters INTEGER NOT NULL DEFAULT 0,
+    job_matcher_uses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS user_activity_totals (
+    user_id VARCHAR PRIMARY KEY,
+    applications INTEGER NOT NULL DEFAULT 0,
+    interviews INTEGER NOT NULL DEFAULT 0,
+    enhanced_resumes INTEGER NOT NULL DEFAULT 0,
+    cover_letters INTEGER NOT NULL DEFAULT 0,
+    job_matcher_uses INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Keep the remaining per-user lookups (recent activity, lists) on index scans
+CREATE INDEX IF NOT EXISTS idx_jobs_applied_applicant_date ON jobs_applied (applicant_id, application_date DESC);
+CREATE INDEX IF NOT EXISTS idx_enhanced_resumes_user_created ON enhanced_resumes (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_cover_letter_applicant_created ON cover_letter (applicant_id, created_at DESC);
+
+CREATE OR REPLACE FUNCTION bump_user_activity(
+    p_user_id VARCHAR, p_day DATE,
+    d_applications INTEGER, d_interviews INTEGER, d_resumes INTEGER,
+    d_cover_letters INTEGER, d_job_matcher INTEGER
+) RETURNS void AS $$
+BEGIN
+    IF p_user_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO user_activity_daily AS d
+        (user_id, day, applications, interviews, enhanced_resumes, cover_letters, job_matcher_uses)
+    VALUES (p_user_id, COALESCE(p_day, CURRENT_DATE), d_applications, d_interviews, d_resumes, d_cover_letters, d_job_matcher)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        applications = d.applications + EXCLUDED.applications,
+        interviews = d.interviews + EXCLUDED.interviews,
+        enhanced_resumes = d.enhanced_resumes + EXCLUDED.enhanced_resumes,
+        cover_letters = d.cover_letters + EXCLUDED.cover_letters,
+        job_matcher_uses = d.job_matcher_uses + EXCLUDED.job_matcher_uses;
+    INSERT INTO user_activity_totals AS t
+        (user_id, applications, interviews, enhanced_resumes, cover_letters, job_matcher_uses, updated_at)
+    VALUES (p_user_id, d_applications, d_interviews, d_resumes, d_cover_letters, d_job_matcher, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id) DO UPDATE SET
+        applications = t.applications + EXCLUDED.applications,
+        interviews = t.interviews + EXCLUDED.interviews,
+        enhanced_resumes = t.enhanced_resumes + EXCLUDED.enhanced_resumes,
+        cover_letters = t.cover_letters + EXCLUDED.cover_letters,
+        job_matcher_uses = t.job_matcher_uses + EXCLUDED.job_matcher_uses,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_jobs_applied() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_user_activity(OLD.applicant_id, OLD.application_date, -1,
+            -COALESCE((OLD.application_status = 'interview')::int, 0), 0, 0, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_user_activity(NEW.applicant_id, NEW.application_date, 1,
+            COALESCE((NEW.application_status = 'interview')::int, 0), 0, 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_enhanced_resumes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_activity(NEW.user_id, NEW.created_at::date, 0, 0, 1, 0, 0);
+    ELSE
+        PERFORM bump_user_activity(OLD.user_id, OLD.created_at::date, 0, 0, -1, 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_cover_letter() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_activity(NEW.applicant_id, NEW.created_at::date, 0, 0, 0, 1, 0);
+    ELSE
+        PERFORM bump_user_activity(OLD.applicant_id, OLD.created_at::date, 0, 0, 0, -1, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- service_usage is itself a counter row, so only the delta is rolled up
+CREATE OR REPLACE FUNCTION rollup_service_usage() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.service_name = 'job_matcher' THEN
+        PERFORM bump_user_activity(OLD.user_id, CURRENT_DATE, 0, 0, 0, 0, -COALESCE(OLD.usage_count, 0));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.service_name = 'job_matcher' THEN
+        PERFORM bump_user_activity(NEW.user_id, COALESCE(NEW.last_used::date, CURRENT_DATE), 0, 0, 0, 0, COALESCE(NEW.usage_count, 0));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rollup_jobs_applied ON jobs_applied;
+CREATE TRIGGER trg_rollup_jobs_applied
+    AFTER INSERT OR DELETE OR UPDATE OF applicant_id, application_date, application_status ON jobs_applied
+    FOR EACH ROW EXECUTE FUNCTION rollup_jobs_applied();
+
+DROP TRIGGER IF EXISTS trg_rollup_enhanced_resumes ON enhanced_resumes;
+CREATE TRIGGER trg_rollup_enhanced_resumes
+    AFTER INSERT OR DELETE ON enhanced_resumes
+    FOR EACH ROW EXECUTE FUNCTION rollup_enhanced_resumes();
+
+DROP TRIGGER IF EXISTS trg_rollup_cover_letter ON cover_letter;
+CREATE TRIGGER trg_rollup_cover_letter
+    AFTER INSERT OR DELETE ON cover_letter
+    FOR EACH ROW EXECUTE FUNCTION rollup_cover_letter();
+
+DROP TRIGGER IF EXISTS trg_rollup_service_usage ON service_usage;
+CREATE TRIGGER trg_rollup_service_usage
+    AFTER INSERT OR DELETE OR UPDATE OF usage_count, service_name, user_id ON service_usage
+    FOR EACH ROW EXECUTE FUNCTION rollup_service_usage();
+"""
+
+# Recompute every counter from the raw tables
+ROLLUP_BACKFILL_SQL = """
+TRUNCATE user_activity_daily, user_activity_totals;
+
+INSERT INTO user_activity_daily
+    (user_id, day, applications, interviews, enhanced_resumes, cover_letters, job_matcher_uses)
+SELECT user_id, day, SUM(applications), SUM(interviews), SUM(enhanced_resumes), SUM(cover_letters), SUM(job_matcher_uses)
+FROM (
+    SELECT applicant_id AS user_id, COALESCE(application_date, CURRENT_DATE) AS day,
+           1 AS applications, CASE WHEN application_status = 'interview' THEN 1 ELSE 0 END AS interviews,
+           0 AS enhanced_resumes, 0 AS cover_letters, 0 AS job_matcher_uses
+    FROM jobs_applied
+    UNION ALL
+    SELECT user_id, COALESCE(created_at::date, CURRENT_DATE), 0, 0, 1, 0, 0
+    FROM enhanced_resumes
+    UNION ALL
+    SELECT applicant_id, COALESCE(created_at::date, CURRENT_DATE), 0, 0, 0, 1, 0
+    FROM cover_letter
+    UNION ALL
+    SELECT user_id, COALESCE(last_used::date, CURRENT_DATE), 0, 0, 0, 0, COALESCE(usage_count, 0)
+    FROM service_usage
+    WHERE service_name = 'job_matcher'
+) raw
+WHERE user_id IS NOT NULL
+GROUP BY user_id, day;
+
+INSERT INTO user_activity_totals
+    (user_id, applications, interviews, enhanced_resumes, cover_letters, job_matcher_uses, updated_at)
+SELECT user_id, SUM(applications), SUM(interviews), SUM(enhanced_resumes), SUM(cover_letters), SUM(job_matcher_uses), CURRENT_TIMESTAMP
+FROM user_activity_daily
+GROUP BY user_id;
+"""
+
+# Serialises schema setup and rebuilds across service replicas
+ROLLUP_LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('user_activity_rollups'))"
+
+
+def install_rollups(conn) -> bool:
+    """
+    Create the rollup tables and triggers, backfilling them the first time.
+
+    Runs in one transaction: creating the triggers blocks writers on the
+    source tables until commit, so the backfill cannot miss or double-count
+    rows written concurrently.
+    """
+    global ROLLUPS_READY
+    if not ROLLUPS_ENABLED:
+        logging.info("Analytics rollups disabled; dashboard reads raw tables")
+        return False
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute(ROLLUP_LOCK_SQL)
+        cur.execute("SELECT to_regclass('user_activity_totals') IS NULL")
+        first_install = cur.fetchone()[0]
+        cur.execute(ROLLUP_SCHEMA_SQL)
+        if first_install:
+            cur.execute(ROLLUP_BACKFILL_SQL)
+        conn.commit()
+        ROLLUPS_READY = True
+        logging.info(f"Analytics rollups ready (backfilled: {first_install})")
+        return True
+    except Exception as e:
+        conn.rollback()
+        ROLLUPS_READY = False
+        logging.error(f"Could not install analytics rollups, falling back to raw queries: {e}")
+        return False
+    finally:
+        if cur:
+            cur.close()
+
+
+def rebuild_rollups(conn):
+    """Recompute the rollups from scratch (repairs drift after manual edits)"""
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute(ROLLUP_LOCK_SQL)
+        # Hold writers off while the counters are rebuilt
+        cur.execute("LOCK TABLE jobs_applied, enhanced_resumes, cover_letter, service_usage IN SHARE MODE")
+        cur.execute(ROLLUP_BACKFILL_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+
+
+def main():
+    import argparse
+
+    import psycopg2
+    from dotenv import load_dotenv
+
+    args = argparse.ArgumentParser(description="Maintain the analytics activity rollups")
+    args.add_argument("command", choices=["rebuild"], help="recompute the rollups from the raw tables")
+    args.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    try:
+        rebuild_rollups(conn)
+        logging.info("Activity rollups rebuilt")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,8 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 # Removed redundant imports - we'll get job data from JobMatcher service instead
 from datetime import datetime
+from response_cache import ResponseCache, ResponseCacheMiddleware
+from structured_logging import RequestLoggingMiddleware, configure_logging
 # import sendgrid
 # from sendgrid.helpers.mail import Mail, Email, To, Content, Attachment, FileContent, FileName, FileType, Disposition
 # from sendgrid.helpers.mail import CustomArg
@@ -54,7 +56,17 @@ gmail_service = None
 # Setup FastAPI
 app = FastAPI(title="Automate Email Service", version="1.0.0")
 templates = Jinja2Templates(directory="templates")
-logging.basicConfig(level=logging.INFO)
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
+
+# Polled by the dashboard; (ttl, stale_ttl) in seconds per route prefix.
+# Registered before CORS so cached responses still get CORS headers.
+response_cache = ResponseCache({
+    "/get-real-time-stats/": (15, 120),
+    "/get-total-applications/": (15, 120),
+    "/get-applied-jobs/": (30, 300),
+})
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
 
 app.add_middleware(
     CORSMiddleware,
@@ -68,6 +80,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Database engine
 engine = create_engine(DATABASE_URL)
@@ -592,6 +605,7 @@ async def auto_apply_with_uploaded_resume(
             #     logging.error(f"Failed to send confirmation email: {email_error}")
             #     # Don't fail the whole request for email errors
 
+        await response_cache.invalidate_user_async(user_id)
         return {"message": "✅ Application sent and recorded successfully!"}
     except HTTPException:
         raise
@@ -682,6 +696,7 @@ async def auto_apply_with_resume_url(
             # Track service usage
             track_service_usage(user_id, "automate_email")
 
+        await response_cache.invalidate_user_async(user_id)
         return {"message": "✅ Application sent and recorded successfully!"}
     except HTTPException:
         raise
@@ -1059,6 +1074,7 @@ Application Date: {datetime.now().strftime('%B %d, %Y')}
             # Clean up temp file
             os.unlink(resume_path)
 
+        await response_cache.invalidate_user_async(user_id)
         return {
             "message": "✅ Enhanced resume application sent successfully!",
             "job_title": job_title,
@@ -1138,15 +1154,19 @@ async def track_email_status(
                     application_status = :status,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id = :application_id
+                RETURNING applicant_id
             """)
             
-            conn.execute(update_query, {
+            result = conn.execute(update_query, {
                 "application_id": application_id,
                 "status": status
             })
+            updated_users = [row[0] for row in result.fetchall()]
             
             logging.info(f"Updated application {application_id} status to {status}")
             
+        for applicant_id in updated_users:
+            await response_cache.invalidate_user_async(applicant_id)
         return {"message": f"Status updated to {status}"}
         
     except Exception as e:
@@ -1337,15 +1357,20 @@ async def update_application_status(application_id: int, status: str):
                     status = :status,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id = :application_id
+                RETURNING applicant_id
             """)
             
-            conn.execute(update_query, {
+            result = conn.execute(update_query, {
                 "application_id": application_id,
                 "status": status
             })
+            updated_users = [row[0] for row in result.fetchall()]
             
             logging.info(f"Updated application {application_id} status to {status}")
             
+        for applicant_id in updated_users:
+            await response_cache.invalidate_user_async(applicant_id)
+            
     except Exception as e:
         logging.error(f"Error updating application status: {e}")
 
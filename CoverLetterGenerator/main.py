@@ -10,11 +10,12 @@ import logging
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime
-import json
 from typing import Optional, List
+from profile_store import ProfileStore
+from structured_logging import RequestLoggingMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 
 # Load environment variables from .env file
 load_dotenv()
@@ -44,6 +45,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Pydantic models
 class CoverLetterRequest(BaseModel):
@@ -71,6 +73,8 @@ def get_db_connection():
         logging.error(f"Database connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
+profile_store = ProfileStore(get_db_connection)
+
 # Prompt template for Gemini (LLM)
 cover_letter_prompt = PromptTemplate.from_template("""
 You are a professional AI career assistant. Write a cover letter for the {domain} position at {company_name}.
@@ -98,100 +102,14 @@ Links: {links}
 # Fetch user profile data from DB
 def fetch_user_profile(user_id: str):
     """Fetch user profile from user_profiles table"""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT name, email, phone, location, education, skills, experience, 
-                   projects, achievements, societies, links
-            FROM user_profiles 
-            WHERE user_id = %s
-        """, (user_id,))
-        
-        result = cur.fetchone()
-        if not result:
+        profile = profile_store.get(user_id)
+        if not profile:
             raise ValueError(f"User ID {user_id} not found in the database.")
-        
-        # Parse JSON fields
-        json_fields = ['education', 'skills', 'experience', 'projects', 'achievements', 'societies', 'links']
-        user_data = dict(result)
-        
-        for field in json_fields:
-            if user_data.get(field):
-                try:
-                    parsed_data = json.loads(user_data[field])
-                    # Handle different data types
-                    if isinstance(parsed_data, list):
-                        # If it's a list, extract text from each item
-                        text_items = []
-                        for item in parsed_data:
-                            if isinstance(item, dict):
-                                # Extract relevant text fields from dictionary
-                                if 'title' in item:
-                                    text_items.append(str(item['title']))
-                                elif 'name' in item:
-                                    text_items.append(str(item['name']))
-                                elif 'description' in item:
-                                    text_items.append(str(item['description']))
-                                elif 'text' in item:
-                                    text_items.append(str(item['text']))
-                                else:
-                                    # Join all string values from the dictionary
-                                    text_items.append(' '.join([str(v) for v in item.values() if isinstance(v, str)]))
-                            elif isinstance(item, str):
-                                text_items.append(item)
-                            else:
-                                text_items.append(str(item))
-                        user_data[field] = text_items
-                    elif isinstance(parsed_data, dict):
-                        # If it's a dictionary, extract text values
-                        text_items = []
-                        for key, value in parsed_data.items():
-                            if isinstance(value, str):
-                                text_items.append(value)
-                            elif isinstance(value, list):
-                                text_items.extend([str(v) for v in value if isinstance(v, str)])
-                        user_data[field] = text_items
-                    else:
-                        user_data[field] = [str(parsed_data)]
-                except (json.JSONDecodeError, TypeError) as e:
-                    logging.warning(f"Error parsing {field} for user {user_id}: {e}")
-                    user_data[field] = []
-            else:
-                user_data[field] = []
-        
-        # Safely join the text items
-        def safe_join(items, separator=" "):
-            if not items:
-                return ""
-            try:
-                return separator.join([str(item) for item in items if item])
-            except Exception as e:
-                logging.warning(f"Error joining items: {e}")
-                return str(items[0]) if items else ""
-        
-        return {
-            "name": user_data["name"] or "Applicant",
-            "email": user_data["email"] or "",
-            "phone": user_data["phone"] or "",
-            "location": user_data["location"] or "",
-            "education": safe_join(user_data["education"]),
-            "experience": safe_join(user_data["experience"]),
-            "skills": safe_join(user_data["skills"]),
-            "achievements": safe_join(user_data["achievements"]),
-            "links": safe_join(user_data["links"]),
-        }
-        
+        return profile.as_prompt_fields()
     except Exception as e:
         logging.error(f"Error fetching user profile: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch user profile: {str(e)}")
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 # Generate the cover letter using Gemini
 def generate_cover_letter(user_id: str, domain: str, company_name: str):
@@ -0,0 +1,246 @@
+"""
+Cached access to the user_profiles table.
+
+Every service reads the same row: one query, JSON columns parsed once into a
+UserProfile, then projected into the shape each service needs. The same file
+is shipped in every service directory that reads profiles (each Dockerfile
+only copies its own folder), so keep the copies identical.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+PROFILE_JSON_FIELDS = ("education", "skills", "experience", "projects", "achievements", "societies", "links")
+
+PROFILE_QUERY = """
+    SELECT up.*, u.email AS user_email, u.role AS user_role
+    FROM user_profiles up
+    LEFT JOIN users u ON up.user_id = u.uid
+    WHERE up.user_id = %s
+"""
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+
+
+def _item_text(item) -> str:
+    """Reduce one parsed JSON list item to display text"""
+    if isinstance(item, dict):
+        for key in ("title", "name", "description", "text"):
+            if key in item:
+                return str(item[key])
+        return " ".join([str(v) for v in item.values() if isinstance(v, str)])
+    return item if isinstance(item, str) else str(item)
+
+
+def flatten_profile_field(value) -> List[str]:
+    """Turn a parsed JSON column into a flat list of strings"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [_item_text(item) for item in value]
+    if isinstance(value, dict):
+        text_items = []
+        for item in value.values():
+            if isinstance(item, str):
+                text_items.append(item)
+            elif isinstance(item, list):
+                text_items.extend([str(v) for v in item if isinstance(v, str)])
+        return text_items
+    return [str(value)]
+
+
+def _safe_join(items: List[str], separator: str = " ") -> str:
+    return separator.join([str(item) for item in items if item])
+
+
+@dataclass(slots=True)
+class UserProfile:
+    """One user_profiles row with its JSON columns already decoded"""
+    user_id: str
+    name: str = ""
+    email: str = ""
+    phone: str = ""
+    location: str = ""
+    original_resume_filepath: Optional[str] = None
+    profile_completed: Optional[bool] = None
+    user_email: Optional[str] = None
+    user_role: Optional[str] = None
+    # Decoded JSON columns; a column that failed to decode keeps its raw text
+    json_values: Dict[str, Any] = field(default_factory=dict)
+    unparsed: frozenset = frozenset()
+    # Remaining columns from user_profiles, untouched
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "UserProfile":
+        row = dict(row)
+        json_values = {}
+        unparsed = set()
+        for name in PROFILE_JSON_FIELDS:
+            raw = row.pop(name, None)
+            if not raw:
+                json_values[name] = None
+                continue
+            try:
+                json_values[name] = json.loads(raw) if isinstance(raw, str) else raw
+            except (json.JSONDecodeError, TypeError) as e:
+                logging.warning(f"Error parsing {name} for user {row.get('user_id')}: {e}")
+                json_values[name] = raw
+                unparsed.add(name)
+        return cls(
+            user_id=row.pop("user_id"),
+            name=row.pop("name", None) or "",
+            email=row.pop("email", None) or "",
+            phone=row.pop("phone", None) or "",
+            location=row.pop("location", None) or "",
+            original_resume_filepath=row.pop("original_resume_filepath", None),
+            profile_completed=row.pop("profile_completed", None),
+            user_email=row.pop("user_email", None),
+            user_role=row.pop("user_role", None),
+            json_values=json_values,
+            unparsed=frozenset(unparsed),
+            extra=row,
+        )
+
+    def text_list(self, name: str) -> List[str]:
+        """Flat list of strings for a JSON column ([] if it did not decode)"""
+        if name in self.unparsed:
+            return []
+        return flatten_profile_field(self.json_values.get(name))
+
+    def as_text_lists(self) -> Dict[str, Any]:
+        """Scalar columns plus every JSON column flattened to a list of strings"""
+        data = {
+            "name": self.name,
+            "email": self.email,
+            "phone": self.phone,
+            "location": self.location,
+            "original_resume_filepath": self.original_resume_filepath,
+            "profile_completed": self.profile_completed,
+        }
+        for name in PROFILE_JSON_FIELDS:
+            data[name] = self.text_list(name)
+        return data
+
+    def as_prompt_fields(self) -> Dict[str, str]:
+        """Space-joined text fields for LLM prompt templates"""
+        return {
+            "name": self.name or "Applicant",
+            "email": self.email,
+            "phone": self.phone,
+            "location": self.location,
+            "education": _safe_join(self.text_list("education")),
+            "experience": _safe_join(self.text_list("experience")),
+            "skills": _safe_join(self.text_list("skills")),
+            "achievements": _safe_join(self.text_list("achievements")),
+            "links": _safe_join(self.text_list("links")),
+        }
+
+    def as_api_dict(self) -> Dict[str, Any]:
+        """Full row with decoded JSON columns, as returned by /get-profile/"""
+        profile = dict(self.extra)
+        profile.update({
+            "user_id": self.user_id,
+            "name": self.name,
+            "email": self.email,
+            "phone": self.phone,
+            "location": self.location,
+            "original_resume_filepath": self.original_resume_filepath,
+            "profile_completed": self.profile_completed,
+            "user_email": self.user_email,
+            "user_role": self.user_role,
+        })
+        for name in PROFILE_JSON_FIELDS:
+            value = self.json_values.get(name)
+            profile[name] = list(value) if isinstance(value, list) else value
+        # The first achievement holds the resume summary (see insert_user_profile)
+        achievements = profile.get("achievements")
+        if isinstance(achievements, list) and achievements:
+            profile["summary"] = achievements[0]
+            profile["certifications"] = achievements[1:]
+        else:
+            profile["summary"] = ""
+            profile["certifications"] = achievements
+        profile["projects"] = profile.get("projects") or []
+        profile["education"] = profile.get("education") or []
+        return profile
+
+
+class ProfileStore:
+    """
+    In-process LRU of UserProfile objects in front of user_profiles.
+
+    Writers in the same process call invalidate() after committing. Entries
+    also expire after `ttl` seconds so services that never see the write
+    (they run in other containers) pick up changes on their own.
+    """
+
+    def __init__(self, connect: Callable, maxsize: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self._connect = connect
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, user_id: str) -> Optional[UserProfile]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, profile = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return profile
+
+    def _remember(self, profile: UserProfile):
+        if self._maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[profile.user_id] = (time.monotonic() + self._ttl, profile)
+            self._entries.move_to_end(profile.user_id)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def load(self, user_id: str) -> Optional[UserProfile]:
+        """Query the row and decode it, bypassing the cache"""
+        conn = cur = None
+        try:
+            conn = self._connect()
+            cur = conn.cursor()
+            cur.execute(PROFILE_QUERY, (user_id,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            colnames = [desc[0] for desc in cur.description]
+            return UserProfile.from_row(dict(zip(colnames, row)))
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+    def get(self, user_id: str) -> Optional[UserProfile]:
+        """Cached profile for user_id, or None if the user has no profile row"""
+        profile = self._cached(user_id)
+        if profile is not None:
+            return profile
+        profile = self.load(user_id)
+        if profile is not None:
+            self._remember(profile)
+        return profile
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
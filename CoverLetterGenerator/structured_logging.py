@@ -0,0 +1,157 @@
+"""
+Structured logging shared by the FastAPI services.
+
+configure_logging() installs a single handler that writes one JSON object per
+line (LOG_FORMAT=text for local runs), stamps every record with the current
+request id, drops most records marked as sampled, and redacts bearer tokens,
+JWTs and password/secret values before anything is written.
+
+RequestLoggingMiddleware assigns the request id (taken from X-Request-ID when
+the caller sends one), echoes it back on the response, and emits the single
+access line per request, so handlers can keep their step-by-step detail at
+DEBUG. Access lines of successful GETs faster than LOG_SLOW_MS are sampled;
+errors, writes and slow requests are always logged.
+
+Environment:
+    LOG_LEVEL        root level (default INFO)
+    LOG_LEVELS       per-logger overrides, e.g. "main=DEBUG,uvicorn.access=WARNING"
+    LOG_FORMAT       json (default) or text
+    LOG_SAMPLE_RATE  share of sampled records kept (default 0.01)
+    LOG_SLOW_MS      access lines at or above this duration are never sampled (default 1000)
+
+Mark a high-volume record as sampled with extra={"sample": True}; sampling
+applies at any level, so hot-path INFO records should carry it. The same file
+is shipped in every service that uses it, so keep the copies identical.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", "1000"))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+REDACTIONS = (
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9\-_.~+/=]+"), r"\1[REDACTED]"),
+    (re.compile(r"eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*"), "[REDACTED_JWT]"),
+    (re.compile(r"(?i)(['\"]?(?:password|passwd|secret|api_key|token)['\"]?\s*[:=]\s*['\"]?)[^\s,'\"}]+"), r"\1[REDACTED]"),
+)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "sample"}
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class ContextFilter(logging.Filter):
+    """Adds request_id, applies sampling and redaction"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sample", False) and random.random() >= LOG_SAMPLE_RATE:
+            return False
+        record.request_id = request_id_var.get()
+        record.msg = redact(record.getMessage())
+        record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging():
+    """Replace the root handlers with the structured handler and apply levels"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(ContextFilter())
+    if LOG_FORMAT == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    # Our access line replaces uvicorn's
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    for item in LOG_LEVELS.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+class RequestLoggingMiddleware:
+    """ASGI middleware: request id propagation plus one access line per request"""
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode("latin-1"), b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            routine = scope["method"] == "GET" and status_code < 400 and duration_ms < LOG_SLOW_MS
+            self.logger.info(
+                "%s %s %s", scope["method"], scope["path"], status_code,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": duration_ms,
+                    "sample": routine,
+                },
+            )
+            request_id_var.reset(token)
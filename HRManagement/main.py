@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Header
+from fastapi import FastAPI, HTTPException, Depends, status, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict, Any
@@ -8,18 +8,18 @@ import json
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-import jwt
 import logging
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('hr_api_debug.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+from decimal import Decimal, InvalidOperation
+from pagination import (
+    DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, fetch_limit, finish_page,
+    keyset_clause, page_size, parse_fields, select_columns,
 )
+import org_search
+from structured_logging import RequestLoggingMiddleware, configure_logging
+from token_auth import TokenVerifier
+
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -32,7 +32,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Request-ID"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Database setup
 def get_db_connection():
@@ -42,13 +44,7 @@ def get_db_connection():
         db_user = os.getenv("DB_USER", "postgres")
         db_password = os.getenv("DB_PASSWORD", "postgres")
         db_port = os.getenv("DB_PORT", "5432")
-        
-        logger.info(f"🔍 Database connection attempt:")
-        logger.info(f"   Host: {db_host}")
-        logger.info(f"   Database: {db_name}")
-        logger.info(f"   User: {db_user}")
-        logger.info(f"   Port: {db_port}")
-        
+
         connection = psycopg2.connect(
             host=db_host,
             database=db_name,
@@ -56,7 +52,7 @@ def get_db_connection():
             password=db_password,
             port=db_port
         )
-        logger.info("✅ Database connection successful!")
+        logger.info("✅ Database connection opened", extra={"sample": True})
         return connection
     except Exception as e:
         logger.error(f"❌ Database connection failed: {str(e)}")
@@ -67,6 +63,8 @@ SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+token_verifier = TokenVerifier(SECRET_KEY, [ALGORITHM])
+
 # Pydantic Models - Simplified for existing schema
 class OrganizationCreate(BaseModel):
     name: str
@@ -117,34 +115,22 @@ class JobPostingResponse(BaseModel):
     applicant_count: int = 0
 
 def verify_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    return token_verifier.verify(token)
 
 def get_current_user(authorization: Optional[str] = Header(None)):
-    logger.info(f"🔐 get_current_user called with authorization: {authorization}")
-    
     # For development, allow requests without authentication
     if not authorization:
-        logger.info("👤 No authorization header, returning mock user for development")
+        logger.debug("👤 No authorization header, returning mock user for development")
         mock_user = {
             "user_id": "dev_user_123",
             "name": "Development User",
             "email": "dev@example.com"
         }
-        logger.info(f"   Mock user: {mock_user}")
         return mock_user
     
     try:
-        logger.info("🔑 Authorization header present, attempting to verify token")
         token = authorization.split(" ")[1]
-        logger.info(f"   Token: {token[:20]}...")
         payload = verify_token(token)
-        logger.info(f"✅ Token verified successfully: {payload}")
         
         # Ensure the payload has the required fields
         if not isinstance(payload, dict):
@@ -153,19 +139,18 @@ def get_current_user(authorization: Optional[str] = Header(None)):
         
         # Check if user_id or uid exists in payload (handle both field names)
         if "user_id" not in payload and "uid" not in payload:
-            logger.error(f"❌ Missing user_id/uid in payload: {payload}")
+            logger.error("❌ Missing user_id/uid in token payload")
             raise HTTPException(status_code=401, detail="Missing user_id in token")
         
         # Normalize user_id field (some tokens use 'uid' instead of 'user_id')
         if "uid" in payload and "user_id" not in payload:
             payload["user_id"] = payload["uid"]
-            logger.info(f"🔄 Converted 'uid' to 'user_id': {payload['user_id']}")
         
         # Add name field if not present (for compatibility)
         if "name" not in payload:
             payload["name"] = payload.get("email", "Unknown User")
-        
-        logger.info(f"✅ Final user object: {payload}")
+
+        logger.info("✅ Authenticated user %s", payload['user_id'], extra={"sample": True})
         return payload
     except HTTPException:
         raise
@@ -177,21 +162,112 @@ def get_current_user(authorization: Optional[str] = Header(None)):
             "name": "Development User",
             "email": "dev@example.com"
         }
-        logger.info(f"   Returning mock user: {mock_user}")
         return mock_user
 
+def get_principal(current_user: dict = Depends(get_current_user)):
+    """
+    The caller plus their role and HR organisation, looked up once per request.
+
+    FastAPI caches dependency results per request, so every dependency and
+    handler that asks for the principal shares this single query. A user
+    with HR rows in several organisations resolves to the lowest org id.
+    """
+    principal = dict(current_user)
+    principal.setdefault("role", None)
+    principal["org_id"] = None
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT u.role,
+                       (SELECT h.hr_org_id FROM hr h
+                        WHERE h.user_id = caller.uid
+                        ORDER BY h.hr_org_id
+                        LIMIT 1)
+                FROM (SELECT %s::varchar AS uid) caller
+                LEFT JOIN users u ON u.uid = caller.uid
+            """, (principal["user_id"],))
+            row = cursor.fetchone()
+            if row:
+                principal["role"] = row[0] or principal["role"]
+                principal["org_id"] = row[1]
+    except Exception as e:
+        logger.error(f"❌ Error resolving principal: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error resolving user: {e}")
+    finally:
+        conn.close()
+    return principal
+
+def get_org_principal(org_id: int, principal: dict = Depends(get_principal)):
+    """
+    The principal for a write under /organizations/{org_id}.
+
+    Built on get_principal, so the handler and any other dependency asking
+    for the principal in the same request reuse its lookup. Callers who are
+    not HR of the organisation are still let through for development, with
+    a warning.
+    """
+    if principal["org_id"] != org_id:
+        logger.warning("HR user %s not found for org %s, allowing for development", principal["user_id"], org_id)
+    return principal
+
+# Indexes matching the keyset order of the paged list endpoints
+KEYSET_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_org_jobs_org_keyset
+        ON org_jobs (org_id, COALESCE(date_posted, TIMESTAMPTZ '1970-01-01') DESC, job_id DESC);
+    CREATE INDEX IF NOT EXISTS idx_application_status_keyset
+        ON application_status (job_id, COALESCE(sent_at, TIMESTAMP '1970-01-01') DESC, id DESC);
+"""
+
+@app.on_event("startup")
+def create_keyset_indexes():
+    try:
+        conn = get_db_connection()
+    except HTTPException:
+        logger.error("❌ Database unavailable at startup, skipping keyset indexes")
+        return
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(KEYSET_INDEXES_SQL)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"⚠️ Could not create keyset indexes: {e}")
+    finally:
+        conn.close()
+
+@app.on_event("startup")
+def install_org_search():
+    try:
+        conn = get_db_connection()
+    except HTTPException:
+        logger.error("❌ Database unavailable at startup, organization search uses ILIKE")
+        return
+    try:
+        org_search.install_search_indexes(conn)
+        if org_search.org_trie is not None:
+            org_search.org_trie.refresh(conn)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not prepare organization search: {e}")
+    finally:
+        conn.close()
+
+def mark_org_search_stale():
+    if org_search.org_trie is not None:
+        org_search.org_trie.mark_stale()
+
 # Organization Management
 @app.post("/organizations", response_model=OrganizationResponse)
 async def create_organization(org_data: OrganizationCreate, current_user: dict = Depends(get_current_user)):
     """Create a new organization"""
-    logger.info(f"🏢 Create organization called with data: {org_data}")
-    logger.info(f"   Current user: {current_user}")
+    logger.debug("🏢 Create organization called with data: %s", org_data)
+    logger.debug("   Current user: %s", current_user)
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
             # Check if organization already exists
-            logger.info(f"🔍 Checking if organization '{org_data.name}' already exists")
+            logger.debug("🔍 Checking if organization '%s' already exists", org_data.name)
             cursor.execute("""
                 SELECT org_id FROM organisation 
                 WHERE org_name = %s AND org_type = %s
@@ -199,7 +275,7 @@ async def create_organization(org_data: OrganizationCreate, current_user: dict =
             
             existing_org = cursor.fetchone()
             if existing_org:
-                logger.info(f"📋 Organization already exists with ID: {existing_org[0]}")
+                logger.debug("📋 Organization already exists with ID: %s", existing_org[0])
                 # Return existing organization
                 cursor.execute("""
                     SELECT org_id, org_name, org_type, org_desc
@@ -207,7 +283,7 @@ async def create_organization(org_data: OrganizationCreate, current_user: dict =
                 """, (existing_org[0],))
                 
                 result = cursor.fetchone()
-                logger.info(f"✅ Returning existing organization: {result}")
+                logger.debug("✅ Returning existing organization: %s", result)
                 return OrganizationResponse(
                     org_id=result[0],
                     name=result[1] if result[1] else "",
@@ -216,7 +292,7 @@ async def create_organization(org_data: OrganizationCreate, current_user: dict =
                 )
             
             # Create new organization
-            logger.info(f"🆕 Creating new organization: {org_data.name}")
+            logger.debug("🆕 Creating new organization: %s", org_data.name)
             cursor.execute("""
                 INSERT INTO organisation (org_name, org_type, org_desc)
                 VALUES (%s, %s, %s)
@@ -227,11 +303,11 @@ async def create_organization(org_data: OrganizationCreate, current_user: dict =
             
             result = cursor.fetchone()
             org_id = result[0]
-            logger.info(f"✅ Organization created with ID: {org_id}")
+            logger.debug("✅ Organization created with ID: %s", org_id)
             
             # Create HR user for this organization
             try:
-                logger.info(f"👤 Creating HR user for organization {org_id}")
+                logger.debug("👤 Creating HR user for organization %s", org_id)
                 cursor.execute("""
                     INSERT INTO hr (user_id, hr_name, hr_contact, hr_org_id, hr_orgs)
                     VALUES (%s, %s, %s, %s, %s)
@@ -244,12 +320,13 @@ async def create_organization(org_data: OrganizationCreate, current_user: dict =
                     current_user["user_id"], current_user.get("name", "HR User"), 
                     current_user.get("email", "hr@company.com"), org_id, org_data.name
                 ))
-                logger.info("✅ HR user created/updated successfully")
+                logger.debug("✅ HR user created/updated successfully")
             except Exception as hr_error:
                 logger.warning(f"⚠️ Could not create HR user: {hr_error}")
             
             conn.commit()
-            logger.info(f"💾 Database transaction committed successfully")
+            mark_org_search_stale()
+            logger.debug("💾 Database transaction committed successfully")
             
             response = OrganizationResponse(
                 org_id=result[0],
@@ -257,7 +334,7 @@ async def create_organization(org_data: OrganizationCreate, current_user: dict =
                 industry=result[2] if result[2] else None,
                 description=result[3] if result[3] else None
             )
-            logger.info(f"✅ Successfully created organization: {response}")
+            logger.debug("✅ Successfully created organization: %s", response)
             return response
     except Exception as e:
         logger.error(f"❌ Error creating organization: {str(e)}")
@@ -299,48 +376,70 @@ async def list_organizations(current_user: dict = Depends(get_current_user)):
         conn.close()
 
 @app.get("/organizations/search", response_model=List[OrganizationResponse])
-async def search_organizations(query: str = "", current_user: dict = Depends(get_current_user)):
-    """Search organizations"""
-    logger.info(f"🔍 Search organizations called with query: '{query}'")
+async def search_organizations(
+    response: Response,
+    query: str = "",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """Search organizations by name or type, best match first, DEFAULT_PAGE_SIZE per page"""
+    limit = page_size(limit, cursor)
+    after = decode_cursor(cursor)
+    if after and query.strip():
+        try:
+            after = (str(Decimal(str(after[0]))), after[1])
+        except InvalidOperation:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     
     conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            if not query or query.strip() == "":
-                cursor.execute("""
-                    SELECT org_id, org_name, org_type, org_desc
-                    FROM organisation 
-                    ORDER BY org_id
-                """)
-            else:
-                cursor.execute("""
-                    SELECT org_id, org_name, org_type, org_desc
-                    FROM organisation 
-                    WHERE org_name ILIKE %s OR org_type ILIKE %s
-                    ORDER BY org_id
-                """, (f"%{query}%", f"%{query}%"))
-            
-            results = cursor.fetchall()
-            response_data = []
-            for row in results:
-                try:
-                    org_response = OrganizationResponse(
-                        org_id=row[0],
-                        name=row[1] if row[1] else "",
-                        industry=row[2] if row[2] else None,
-                        description=row[3] if row[3] else None
-                    )
-                    response_data.append(org_response)
-                except Exception as row_error:
-                    logger.error(f"❌ Error processing row {row}: {str(row_error)}")
-                    continue
-            return response_data
+        rows = org_search.search_organizations(conn, query, fetch_limit(limit), after)
+        rows = finish_page(
+            [(str(row[0]) if isinstance(row[0], Decimal) else row[0], *row[1:]) for row in rows],
+            limit, response
+        )
+        return [
+            OrganizationResponse(
+                org_id=row[1],
+                name=row[2] if row[2] else "",
+                industry=row[3] if row[3] else None,
+                description=row[4] if row[4] else None
+            )
+            for row in rows
+        ]
     except Exception as e:
         logger.error(f"❌ Error searching organizations: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error searching organizations: {e}")
     finally:
         conn.close()
 
+@app.get("/organizations/autocomplete")
+async def autocomplete_organizations(
+    prefix: str,
+    limit: int = org_search.AUTOCOMPLETE_LIMIT,
+    current_user: dict = Depends(get_current_user)
+):
+    """Organization name suggestions for a typed prefix"""
+    limit = max(1, min(limit, org_search.AUTOCOMPLETE_LIMIT))
+    if not prefix.strip():
+        return []
+    trie = org_search.org_trie
+    if trie is not None and not trie.needs_refresh():
+        return trie.search(prefix, limit)
+    
+    conn = get_db_connection()
+    try:
+        if trie is not None:
+            trie.refresh(conn)
+            return trie.search(prefix, limit)
+        return org_search.autocomplete_from_db(conn, prefix, limit)
+    except Exception as e:
+        logger.error(f"❌ Error autocompleting organizations: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error autocompleting organizations: {e}")
+    finally:
+        conn.close()
+
 @app.get("/organizations/{org_id}", response_model=OrganizationResponse)
 async def get_organization(org_id: int, current_user: dict = Depends(get_current_user)):
     """Get organization details"""
@@ -372,7 +471,7 @@ async def get_organization(org_id: int, current_user: dict = Depends(get_current
 @app.put("/organizations/{org_id}")
 async def update_organization(org_id: int, org_data: OrganizationCreate, current_user: dict = Depends(get_current_user)):
     """Update organization details"""
-    logger.info(f"🔄 Update organization called for ID: {org_id}")
+    logger.debug("🔄 Update organization called for ID: %s", org_id)
     
     trimmed_name = org_data.name.strip()
     
@@ -413,6 +512,7 @@ async def update_organization(org_id: int, org_data: OrganizationCreate, current
             
             result = cursor.fetchone()
             conn.commit()
+            mark_org_search_stale()
             
             return OrganizationResponse(
                 org_id=result[0],
@@ -438,7 +538,7 @@ async def update_organization(org_id: int, org_data: OrganizationCreate, current
 @app.delete("/organizations/{org_id}")
 async def delete_organization(org_id: int, current_user: dict = Depends(get_current_user)):
     """Delete organization"""
-    logger.info(f"🗑️ Delete organization called for ID: {org_id}")
+    logger.debug("🗑️ Delete organization called for ID: %s", org_id)
     
     conn = get_db_connection()
     try:
@@ -453,6 +553,7 @@ async def delete_organization(org_id: int, current_user: dict = Depends(get_curr
             cursor.execute("DELETE FROM organisation WHERE org_id = %s", (org_id,))
             
             conn.commit()
+            mark_org_search_stale()
             
             return {"message": f"Organization {org_id} deleted successfully"}
     except HTTPException:
@@ -551,7 +652,7 @@ async def get_hr_users(org_id: int, current_user: dict = Depends(get_current_use
 @app.get("/hr-users/profile", response_model=dict)
 async def get_hr_profile(current_user: dict = Depends(get_current_user)):
     """Get HR user profile with organization details"""
-    logger.info(f"🔍 Getting HR profile for user: {current_user}")
+    logger.debug("🔍 Getting HR profile for user: %s", current_user)
     
     # Validate current_user has required fields
     if not current_user or not isinstance(current_user, dict):
@@ -563,7 +664,7 @@ async def get_hr_profile(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=401, detail="Missing user_id in user data")
     
     user_id = current_user["user_id"]
-    logger.info(f"🔍 Looking for HR user with user_id: {user_id}")
+    logger.debug("🔍 Looking for HR user with user_id: %s", user_id)
     
     conn = get_db_connection()
     try:
@@ -581,10 +682,10 @@ async def get_hr_profile(current_user: dict = Depends(get_current_user)):
             
             result = cursor.fetchone()
             if not result:
-                logger.info(f"📋 HR user not found for user_id: {user_id}")
+                logger.debug("📋 HR user not found for user_id: %s", user_id)
                 raise HTTPException(status_code=404, detail="HR user not found")
             
-            logger.info(f"✅ HR user found: {result}")
+            logger.debug("✅ HR user found: %s", result)
             
             # Format created_at date
             created_at = None
@@ -607,7 +708,7 @@ async def get_hr_profile(current_user: dict = Depends(get_current_user)):
                 "has_organization": result[3] is not None
             }
             
-            logger.info(f"✅ Returning HR profile: {profile_data}")
+            logger.debug("✅ Returning HR profile: %s", profile_data)
             return profile_data
     except HTTPException:
         raise
@@ -620,7 +721,7 @@ async def get_hr_profile(current_user: dict = Depends(get_current_user)):
 @app.put("/hr-users/profile", response_model=dict)
 async def update_hr_profile(profile_data: dict, current_user: dict = Depends(get_current_user)):
     """Update HR user profile"""
-    logger.info(f"🔧 Updating HR profile for user: {current_user}")
+    logger.debug("🔧 Updating HR profile for user: %s", current_user)
     
     # Validate current_user has required fields
     if not current_user or not isinstance(current_user, dict):
@@ -632,7 +733,7 @@ async def update_hr_profile(profile_data: dict, current_user: dict = Depends(get
         raise HTTPException(status_code=401, detail="Missing user_id in user data")
     
     user_id = current_user["user_id"]
-    logger.info(f"🔧 Updating HR profile for user_id: {user_id}")
+    logger.debug("🔧 Updating HR profile for user_id: %s", user_id)
     
     conn = get_db_connection()
     try:
@@ -685,13 +786,13 @@ async def update_hr_profile(profile_data: dict, current_user: dict = Depends(get
                 WHERE user_id = %s
             """
             
-            logger.info(f"🔧 Executing update query: {update_query}")
-            logger.info(f"🔧 Update values: {update_values}")
+            logger.debug("🔧 Executing update query: %s", update_query)
+            logger.debug("🔧 Update values: %s", update_values)
             
             cursor.execute(update_query, update_values)
             conn.commit()
             
-            logger.info(f"✅ HR profile updated successfully for user_id: {user_id}")
+            logger.debug("✅ HR profile updated successfully for user_id: %s", user_id)
             
             # Return updated profile
             return {
@@ -712,7 +813,7 @@ async def update_hr_profile(profile_data: dict, current_user: dict = Depends(get
 @app.post("/hr-users/initialize", response_model=dict)
 async def initialize_hr_user(init_data: dict, current_user: dict = Depends(get_current_user)):
     """Initialize HR user profile without default organization"""
-    logger.info(f"🔧 Initializing HR user for: {current_user}")
+    logger.debug("🔧 Initializing HR user for: %s", current_user)
     
     # Validate current_user has required fields
     if not current_user or not isinstance(current_user, dict):
@@ -724,7 +825,7 @@ async def initialize_hr_user(init_data: dict, current_user: dict = Depends(get_c
         raise HTTPException(status_code=401, detail="Missing user_id in user data")
     
     user_id = current_user["user_id"]
-    logger.info(f"🔧 Initializing HR user with user_id: {user_id}")
+    logger.debug("🔧 Initializing HR user with user_id: %s", user_id)
     
     conn = get_db_connection()
     try:
@@ -738,7 +839,7 @@ async def initialize_hr_user(init_data: dict, current_user: dict = Depends(get_c
             
             result = cursor.fetchone()
             if result:
-                logger.info(f"✅ HR user already exists: {result}")
+                logger.debug("✅ HR user already exists: %s", result)
                 # User exists, return current data
                 return {
                     "user_id": result[0],
@@ -750,7 +851,7 @@ async def initialize_hr_user(init_data: dict, current_user: dict = Depends(get_c
                     "has_organization": result[3] is not None
                 }
             else:
-                logger.info(f"🆕 Creating new HR user for user_id: {user_id}")
+                logger.debug("🆕 Creating new HR user for user_id: %s", user_id)
                 # Create new HR user without organization
                 cursor.execute("""
                     INSERT INTO hr (user_id, hr_name, hr_contact, hr_org_id, hr_orgs)
@@ -764,7 +865,7 @@ async def initialize_hr_user(init_data: dict, current_user: dict = Depends(get_c
                 
                 result = cursor.fetchone()
                 conn.commit()
-                logger.info(f"✅ HR user created successfully: {result}")
+                logger.debug("✅ HR user created successfully: %s", result)
                 
                 return {
                     "user_id": result[0],
@@ -837,26 +938,18 @@ async def assign_hr_to_organization(assignment_data: dict, current_user: dict =
 async def create_job_posting(
     org_id: int, 
     job_data: JobPostingCreate, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_org_principal)
 ):
     """Create a new job posting"""
-    logger.info(f"Creating job posting for org_id: {org_id}, user_id: {current_user['user_id']}")
-    logger.info(f"Job data: {job_data}")
+    logger.debug("Creating job posting for org_id: %s, user_id: %s", org_id, current_user['user_id'])
+    logger.debug("Job data: %s", job_data)
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Verify HR user belongs to organization
-            cursor.execute("""
-                SELECT user_id FROM hr 
-                WHERE user_id = %s AND hr_org_id = %s
-            """, (current_user["user_id"], org_id))
-            
-            hr_user = cursor.fetchone()
-            logger.info(f"HR user verification result: {hr_user}")
-            
+            # Verify HR user belongs to organization (resolved with the principal)
             # For development/testing, allow if no HR user found but org exists
-            if not hr_user:
+            if current_user["org_id"] != org_id:
                 # Check if organization exists
                 cursor.execute("SELECT org_id FROM organisation WHERE org_id = %s", (org_id,))
                 org_exists = cursor.fetchone()
@@ -864,15 +957,13 @@ async def create_job_posting(
                     logger.error(f"Organization {org_id} not found")
                     raise HTTPException(status_code=404, detail="Organization not found")
                 
-                # For development, allow job creation even without HR user
-                logger.warning(f"HR user {current_user['user_id']} not found for org {org_id}, but allowing job creation for development")
             
             insert_values = (
                 org_id, job_data.job_title, job_data.job_desc, job_data.location,
                 job_data.job_type, job_data.experience_level, job_data.salary_range, job_data.qualification,
                 datetime.utcnow()
             )
-            logger.info(f"Inserting job with values: {insert_values}")
+            logger.debug("Inserting job with values: %s", insert_values)
             
             cursor.execute("""
                 INSERT INTO org_jobs 
@@ -911,42 +1002,69 @@ async def create_job_posting(
     finally:
         conn.close()
 
-@app.get("/organizations/{org_id}/jobs", response_model=List[JobPostingResponse])
+JOB_POSTING_COLUMNS = {
+    "job_id": "job_id",
+    "org_id": "org_id",
+    "job_title": "job_title",
+    "job_desc": "job_desc",
+    "qualification": "qualification",
+    "location": "job_location",
+    "salary_range": "salary",
+    "job_type": "work_type",
+    "experience_level": "experience",
+    "skills_required": "NULL",
+    "status": "NULL",
+    "created_at": "date_posted",
+    "applicant_count": "NULL",
+}
+
+def format_job_posting(name: str, value):
+    if name == "salary_range":
+        return value or "Not specified"
+    if name == "job_type":
+        return value or "Full-time"
+    if name == "experience_level":
+        return value or "Entry"
+    if name == "skills_required":
+        return []
+    if name == "status":
+        return "active"  # Default status
+    if name == "created_at":
+        return value.isoformat() if value else datetime.now().isoformat()
+    if name == "applicant_count":
+        return 0
+    return value
+
+@app.get("/organizations/{org_id}/jobs", response_model=List[Dict[str, Any]])
 async def get_job_postings(
     org_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all job postings for an organization"""
+    """Get job postings for an organization, newest first, one page at a time"""
+    selected = parse_fields(fields, list(JOB_POSTING_COLUMNS))
+    limit = page_size(limit, cursor)
+    sort_expr = "COALESCE(date_posted, TIMESTAMPTZ '1970-01-01')"
+    keyset_sql, keyset_params = keyset_clause(sort_expr, "job_id", decode_cursor(cursor), cast="timestamptz")
     conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT job_id, org_id, job_title, job_desc, qualification,
-                       job_location, salary, work_type, experience,
-                       date_posted
+        with conn.cursor() as db_cursor:
+            db_cursor.execute(f"""
+                SELECT {sort_expr}, job_id,
+                       {select_columns(JOB_POSTING_COLUMNS, selected)}
                 FROM org_jobs 
-                WHERE org_id = %s
-                ORDER BY date_posted DESC
-            """, (org_id,))
+                WHERE org_id = %s{keyset_sql}
+                ORDER BY 1 DESC, 2 DESC
+                LIMIT %s
+            """, (org_id, *keyset_params, fetch_limit(limit)))
             
-            results = cursor.fetchall()
+            rows = finish_page(db_cursor.fetchall(), limit, response)
             return [
-                JobPostingResponse(
-                    job_id=row[0],
-                    org_id=row[1],
-                    job_title=row[2],
-                    job_desc=row[3],
-                    qualification=row[4],
-                    location=row[5],
-                    salary_range=row[6] or "Not specified",
-                    job_type=row[7] or "Full-time",
-                    experience_level=row[8] or "Entry",
-                    skills_required=[],
-                    status="active",  # Default status
-                    created_at=row[9].isoformat() if row[9] else datetime.now().isoformat(),
-                    applicant_count=0
-                )
-                for row in results
+                {name: format_job_posting(name, value) for name, value in zip(selected, row[2:])}
+                for row in rows
             ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching job postings: {e}")
@@ -961,7 +1079,7 @@ async def update_job_posting(
     current_user: dict = Depends(get_current_user)
 ):
     """Update job posting"""
-    logger.info(f"🔧 Updating job {job_id} for organization {org_id}")
+    logger.debug("🔧 Updating job %s for organization %s", job_id, org_id)
     
     conn = get_db_connection()
     try:
@@ -994,7 +1112,7 @@ async def update_job_posting(
             ))
             
             conn.commit()
-            logger.info(f"✅ Job {job_id} updated successfully")
+            logger.debug("✅ Job %s updated successfully", job_id)
             
             return {"message": "Job updated successfully"}
                 
@@ -1051,56 +1169,69 @@ async def update_job_status(
     finally:
         conn.close()
 
+APPLICATION_COLUMNS = {
+    "id": "a.id",
+    "job_id": "a.job_id",
+    "applicant_id": "a.applicant_id",
+    "status": "a.status",
+    "enhanced_resume_url": "a.enhanced_resume_url",
+    "cover_letter_id": "a.cover_letter_id",
+    "sent_at": "a.sent_at",
+    "updated_at": "a.updated_at",
+    "job_title": "oj.job_title",
+    "company_name": "o.name",
+    "location": "oj.job_location",
+    "applicant_name": "au.u_name",
+    "applicant_email": "au.email_id",
+}
+
+def format_application(name: str, value, applicant_id):
+    if name == "status":
+        return value or "applied"
+    if name in ("sent_at", "updated_at"):
+        return value.isoformat() if value else None
+    if name == "applicant_name":
+        return value or f"Applicant {applicant_id}"
+    if name == "applicant_email":
+        return value or "No email provided"
+    return value
+
 @app.get("/organizations/{org_id}/applications")
-async def get_organization_applications(org_id: int, current_user: dict = Depends(get_current_user)):
-    """Get all applications for an organization"""
+async def get_organization_applications(
+    org_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get applications for an organization, newest first, one page at a time"""
+    selected = parse_fields(fields, list(APPLICATION_COLUMNS))
+    limit = page_size(limit, cursor)
+    sort_expr = "COALESCE(a.sent_at, TIMESTAMP '1970-01-01')"
+    keyset_sql, keyset_params = keyset_clause(sort_expr, "a.id", decode_cursor(cursor))
     conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        with conn.cursor() as db_cursor:
             # Try to get applications from application_status table
             try:
-                cursor.execute("""
-                    SELECT 
-                        a.id,
-                        a.job_id,
-                        a.applicant_id,
-                        a.status,
-                        a.enhanced_resume_url,
-                        a.cover_letter_id,
-                        a.sent_at,
-                        a.updated_at,
-                        oj.job_title,
-                        o.name as company_name,
-                        oj.job_location as location,
-                        au.u_name as applicant_name,
-                        au.email_id as applicant_email
+                db_cursor.execute(f"""
+                    SELECT {sort_expr}, a.id, a.applicant_id,
+                           {select_columns(APPLICATION_COLUMNS, selected)}
                     FROM application_status a
                     JOIN org_jobs oj ON a.job_id = oj.job_id
                     JOIN organisation o ON oj.org_id = o.org_id
                     LEFT JOIN app_user au ON a.applicant_id = au.user_id
-                    WHERE oj.org_id = %s
-                    ORDER BY a.sent_at DESC
-                """, (org_id,))
-                
-                applications = []
-                for row in cursor.fetchall():
-                    applications.append({
-                        "id": row[0],
-                        "job_id": row[1],
-                        "applicant_id": row[2],
-                        "status": row[3] or "applied",
-                        "enhanced_resume_url": row[4],
-                        "cover_letter_id": row[5],
-                        "sent_at": row[6].isoformat() if row[6] else None,
-                        "updated_at": row[7].isoformat() if row[7] else None,
-                        "job_title": row[8],
-                        "company_name": row[9],
-                        "location": row[10],
-                        "applicant_name": row[11] or f"Applicant {row[2]}",
-                        "applicant_email": row[12] or "No email provided"
-                    })
+                    WHERE oj.org_id = %s{keyset_sql}
+                    ORDER BY 1 DESC, 2 DESC
+                    LIMIT %s
+                """, (org_id, *keyset_params, fetch_limit(limit)))
                 
-                return applications
+                rows = finish_page(db_cursor.fetchall(), limit, response)
+                return [
+                    {name: format_application(name, value, row[2]) for name, value in zip(selected, row[3:])}
+                    for row in rows
+                ]
             except Exception as e:
                 logger.warning(f"Application_status table not available: {e}")
                 # Return empty list if table doesn't exist
@@ -1193,21 +1324,15 @@ async def get_organization_analytics(org_id: int, current_user: dict = Depends(g
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    logger.info("🏥 Health check endpoint called")
-    
     try:
-        logger.info("🔍 Testing database connection...")
         conn = get_db_connection()
-        logger.info("✅ Database connection successful")
         
         # Test basic query
         with conn.cursor() as cursor:
             cursor.execute("SELECT COUNT(*) FROM organisation")
             org_count = cursor.fetchone()[0]
-            logger.info(f"📊 Found {org_count} organizations in database")
         
         conn.close()
-        logger.info("✅ Health check completed successfully")
         
         return {
             "status": "healthy", 
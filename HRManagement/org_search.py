@@ -0,0 +1,194 @@
+"""
+Organization search and autocomplete.
+
+Search runs on pg_trgm (substring / fuzzy match on name and type) plus a
+'simple' tsvector for whole-word hits, ranked and returned in keyset pages.
+If pg_trgm cannot be installed the same API falls back to a limited ILIKE
+scan. Autocomplete uses a name prefix index, or an in-memory trie of
+organisation names when ORG_AUTOCOMPLETE_TRIE is enabled.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ORG_AUTOCOMPLETE_TRIE = os.getenv("ORG_AUTOCOMPLETE_TRIE", "false").lower() in ("1", "true", "yes")
+ORG_TRIE_TTL = float(os.getenv("ORG_TRIE_TTL", "300"))
+AUTOCOMPLETE_LIMIT = 10
+
+# Set by install_search_indexes() when pg_trgm and its indexes are available
+TRGM_READY = False
+
+ORG_DOCUMENT_SQL = "to_tsvector('simple', coalesce(org_name, '') || ' ' || coalesce(org_type, ''))"
+
+ORG_SEARCH_SCHEMA_SQL = f"""
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_organisation_name_trgm ON organisation USING gin (org_name gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_organisation_type_trgm ON organisation USING gin (org_type gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_organisation_fts ON organisation USING gin ({ORG_DOCUMENT_SQL});
+    CREATE INDEX IF NOT EXISTS idx_organisation_name_prefix ON organisation (lower(org_name) text_pattern_ops);
+"""
+
+
+def install_search_indexes(conn) -> bool:
+    global TRGM_READY
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(ORG_SEARCH_SCHEMA_SQL)
+        conn.commit()
+        TRGM_READY = True
+    except Exception as e:
+        conn.rollback()
+        TRGM_READY = False
+        logger.warning(f"⚠️ pg_trgm search unavailable, falling back to ILIKE: {e}")
+    return TRGM_READY
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_organizations(conn, query: str, limit: int, after: Optional[Tuple]) -> List[Tuple]:
+    """
+    Rows of (rank, org_id, org_name, org_type, org_desc), best match first.
+
+    `after` is the (rank, org_id) of the last row of the previous page. An
+    empty query lists organisations by name instead, with `after` holding
+    (org_name, org_id).
+    """
+    query = query.strip()
+    with conn.cursor() as cursor:
+        if not query:
+            keyset_sql, params = "", []
+            if after:
+                keyset_sql, params = "WHERE (org_name, org_id) > (%s, %s)", list(after)
+            cursor.execute(f"""
+                SELECT org_name, org_id, org_name, org_type, org_desc
+                FROM organisation
+                {keyset_sql}
+                ORDER BY org_name, org_id
+                LIMIT %s
+            """, (*params, limit))
+            return cursor.fetchall()
+
+        contains = f"%{_like_escape(query)}%"
+        prefix = f"{_like_escape(query.lower())}%"
+        if TRGM_READY:
+            rank_sql = f"""
+                round((
+                    GREATEST(similarity(org_name, %s), 0.5 * similarity(coalesce(org_type, ''), %s))
+                    + CASE WHEN lower(org_name) LIKE %s THEN 1 ELSE 0 END
+                    + ts_rank({ORG_DOCUMENT_SQL}, plainto_tsquery('simple', %s))
+                )::numeric, 6)
+            """
+            rank_params = [query, query, prefix, query]
+            match_sql = f"""
+                org_name ILIKE %s OR org_type ILIKE %s OR org_name %% %s
+                OR {ORG_DOCUMENT_SQL} @@ plainto_tsquery('simple', %s)
+            """
+            match_params = [contains, contains, query, query]
+        else:
+            rank_sql = "(CASE WHEN lower(org_name) LIKE %s THEN 1 ELSE 0 END)::numeric"
+            rank_params = [prefix]
+            match_sql = "org_name ILIKE %s OR org_type ILIKE %s"
+            match_params = [contains, contains]
+
+        keyset_sql, keyset_params = "", []
+        if after:
+            keyset_sql, keyset_params = "WHERE (rank, org_id) < (%s::numeric, %s)", list(after)
+        cursor.execute(f"""
+            SELECT rank, org_id, org_name, org_type, org_desc
+            FROM (
+                SELECT {rank_sql} AS rank, org_id, org_name, org_type, org_desc
+                FROM organisation
+                WHERE {match_sql}
+            ) ranked
+            {keyset_sql}
+            ORDER BY rank DESC, org_id DESC
+            LIMIT %s
+        """, (*rank_params, *match_params, *keyset_params, limit))
+        return cursor.fetchall()
+
+
+def autocomplete_from_db(conn, prefix: str, limit: int) -> List[Dict]:
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT org_id, org_name
+            FROM organisation
+            WHERE lower(org_name) LIKE %s
+            ORDER BY length(org_name), org_name
+            LIMIT %s
+        """, (f"{_like_escape(prefix.lower())}%", limit))
+        return [{"org_id": row[0], "name": row[1]} for row in cursor.fetchall()]
+
+
+class OrgPrefixTrie:
+    """
+    Case-insensitive prefix trie over organisation names.
+
+    Every word start in a name is indexed, so "goo" finds "Alphabet Google".
+    The trie is rebuilt from the table when marked stale or after ttl seconds.
+    """
+
+    def __init__(self, ttl: float = ORG_TRIE_TTL):
+        self._ttl = ttl
+        self._root: Dict = {}
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def _build(self, rows):
+        root: Dict = {}
+        for org_id, name in rows:
+            if not name:
+                continue
+            words = name.lower().split()
+            for start in range(len(words)):
+                node = root
+                for char in " ".join(words[start:]):
+                    node = node.setdefault(char, {})
+                    node.setdefault("", []).append((len(name), name, org_id))
+        # Keep only the best few entries per node so lookups are O(prefix length)
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == "":
+                    continue
+                seen = {}
+                for entry in sorted(child[""]):
+                    seen.setdefault(entry[2], entry)
+                child[""] = list(seen.values())[:AUTOCOMPLETE_LIMIT]
+                stack.append(child)
+        return root
+
+    def refresh(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT org_id, org_name FROM organisation")
+            rows = cursor.fetchall()
+        root = self._build(rows)
+        with self._lock:
+            self._root = root
+            self._loaded_at = time.monotonic()
+            self._stale = False
+        logger.info(f"🌲 Organization autocomplete trie loaded with {len(rows)} organizations")
+
+    def needs_refresh(self) -> bool:
+        return self._stale or time.monotonic() - self._loaded_at > self._ttl
+
+    def search(self, prefix: str, limit: int) -> List[Dict]:
+        node = self._root
+        for char in " ".join(prefix.lower().split()):
+            node = node.get(char)
+            if node is None:
+                return []
+        return [{"org_id": org_id, "name": name} for _, name, org_id in node.get("", [])[:limit]]
+
+
+org_trie = OrgPrefixTrie() if ORG_AUTOCOMPLETE_TRIE else None
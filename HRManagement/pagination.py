@@ -0,0 +1,99 @@
+"""
+Keyset pagination and field projection helpers for list endpoints.
+
+Lists are ordered newest first on (sort_key, id) and paged with an opaque
+cursor holding the last row's key, so each page is one index range scan no
+matter how deep the client has paged. The page body stays a plain JSON list
+for existing clients; the cursor for the next page is returned in the
+X-Next-Cursor header (absent on the last page). A request with neither
+limit nor cursor gets the first MAX_PAGE_SIZE rows, so older clients that
+never page still see a full list for typical accounts but can no longer pull
+an unbounded result; the header tells them when there is more.
+
+The same file is shipped in every service with paged lists, so keep the
+copies identical.
+"""
+import base64
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    if isinstance(sort_value, (datetime, date)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, Any]]:
+    """(sort_value, row_id) from a cursor, or None for the first page"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return sort_value, row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: Optional[int], cursor: Optional[str] = None) -> int:
+    """Rows per page; MAX_PAGE_SIZE when neither limit nor cursor was sent"""
+    if limit is None and not cursor:
+        return MAX_PAGE_SIZE
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def fetch_limit(limit: int) -> int:
+    """LIMIT parameter for a page: one look-ahead row past the page size"""
+    return limit + 1
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """Requested output fields in `allowed` order; all of them when fields is empty"""
+    if not fields:
+        return list(allowed)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+    return [name for name in allowed if name in requested]
+
+
+def select_columns(columns: Dict[str, str], selected: Sequence[str]) -> str:
+    """SQL select list for the selected output fields (expressions come from a whitelist)"""
+    return ",\n".join(f"{columns[name]} AS {name}" for name in selected)
+
+
+def keyset_clause(sort_expr: str, id_expr: str, cursor: Optional[Tuple[Any, Any]], cast: str = "timestamp"):
+    """WHERE fragment and params continuing a newest-first listing after `cursor`"""
+    if cursor is None:
+        return "", ()
+    return f" AND ({sort_expr}, {id_expr}) < (%s::{cast}, %s)", cursor
+
+
+def finish_page(rows: List[Tuple], limit: int, response: Response) -> List[Tuple]:
+    """
+    Trim the look-ahead row and set the next-page cursor header.
+
+    Rows must start with (sort_key, id) and be fetched with LIMIT fetch_limit(limit).
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last[0], last[1])
+    return rows
@@ -0,0 +1,74 @@
+"""
+/organizations/search paging against a recording fake connection.
+
+No database is needed: the fake cursor records the LIMIT each query was
+sent with and returns no rows. Run from the HRManagement directory:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE  # noqa: E402
+
+
+class RecordingCursor:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.calls.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.calls = []
+
+    def cursor(self):
+        return RecordingCursor(self.calls)
+
+    def close(self):
+        pass
+
+
+class OrganizationSearchPagingTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = RecordingConnection()
+        patcher = mock.patch.object(main, "get_db_connection", return_value=self.conn)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def sent_limit(self):
+        sql, params = self.conn.calls[-1]
+        self.assertIn("LIMIT %s", sql)
+        return params[-1]
+
+    def test_empty_query_without_params_is_paged(self):
+        response = self.client.get("/organizations/search")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sent_limit(), DEFAULT_PAGE_SIZE + 1)
+
+    def test_limit_is_capped(self):
+        self.client.get("/organizations/search", params={"limit": MAX_PAGE_SIZE * 10})
+        self.assertEqual(self.sent_limit(), MAX_PAGE_SIZE + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
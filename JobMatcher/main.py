@@ -15,9 +15,11 @@ import json
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from matcher import load_and_prepare_data_from_db, job_matcher, EMBEDDING_CACHE_FILE, BATCH_SIZE
+from profile_store import ProfileStore
+from structured_logging import RequestLoggingMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 
 # Load environment variables from .env file
 load_dotenv()
@@ -42,6 +44,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Database connection function
 def get_db_connection():
@@ -52,6 +55,8 @@ def get_db_connection():
         logging.error(f"Database connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
+profile_store = ProfileStore(get_db_connection)
+
 # Pydantic models
 class JobPreferencesRequest(BaseModel):
     user_id: str
@@ -108,78 +113,16 @@ def load_jobs_data():
 
 def get_user_profile(user_id: str) -> Dict[str, Any]:
     """Get user profile from user_profiles table"""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT name, email, phone, location, education, skills, experience, 
-                   projects, achievements, societies, links, profile_completed
-            FROM user_profiles 
-            WHERE user_id = %s
-        """, (user_id,))
-        
-        profile = cur.fetchone()
-        if profile:
-            # Parse JSON fields
-            json_fields = ['education', 'skills', 'experience', 'projects', 'achievements', 'societies', 'links']
-            for field in json_fields:
-                if profile.get(field):
-                    try:
-                        parsed_data = json.loads(profile[field])
-                        # Handle different data types
-                        if isinstance(parsed_data, list):
-                            # If it's a list, extract text from each item
-                            text_items = []
-                            for item in parsed_data:
-                                if isinstance(item, dict):
-                                    # Extract relevant text fields from dictionary
-                                    if 'title' in item:
-                                        text_items.append(str(item['title']))
-                                    elif 'name' in item:
-                                        text_items.append(str(item['name']))
-                                    elif 'description' in item:
-                                        text_items.append(str(item['description']))
-                                    elif 'text' in item:
-                                        text_items.append(str(item['text']))
-                                    else:
-                                        # Join all string values from the dictionary
-                                        text_items.append(' '.join([str(v) for v in item.values() if isinstance(v, str)]))
-                                elif isinstance(item, str):
-                                    text_items.append(item)
-                                else:
-                                    text_items.append(str(item))
-                            profile[field] = text_items
-                        elif isinstance(parsed_data, dict):
-                            # If it's a dictionary, extract text values
-                            text_items = []
-                            for key, value in parsed_data.items():
-                                if isinstance(value, str):
-                                    text_items.append(value)
-                                elif isinstance(value, list):
-                                    text_items.extend([str(v) for v in value if isinstance(v, str)])
-                            profile[field] = text_items
-                        else:
-                            profile[field] = [str(parsed_data)]
-                    except (json.JSONDecodeError, TypeError) as e:
-                        logging.warning(f"Error parsing {field} for user {user_id}: {e}")
-                        profile[field] = []
-                else:
-                    profile[field] = []
-            
-            return dict(profile)
-        else:
+        profile = profile_store.get(user_id)
+        if not profile:
             return {}
-            
+        user_data = profile.as_text_lists()
+        user_data.pop("original_resume_filepath", None)
+        return user_data
     except Exception as e:
         logging.error(f"Error fetching user profile: {e}")
         return {}
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 def get_user_job_preferences(user_id: str) -> Dict[str, Any]:
     """Get user job preferences from job_preferences table"""
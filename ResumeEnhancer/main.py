@@ -26,9 +26,12 @@ from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 import anyio
 from io import BytesIO
+from profile_store import ProfileStore
+from response_cache import ResponseCache
+from structured_logging import RequestLoggingMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 def clean_text(text):
@@ -57,6 +60,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Environment variables
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -455,6 +459,13 @@ def get_db_connection():
         logging.error(f"Database connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
+profile_store = ProfileStore(get_db_connection)
+
+# Nothing is cached here; this only bumps the user's generation so dashboard
+# caches sharing RESPONSE_CACHE_REDIS_URL drop stale enhancement counts.
+# Without the shared backend it does nothing and those caches expire by TTL.
+response_cache = ResponseCache({}, shared_only=True)
+
 # Pydantic models
 class ResumeEnhancementRequest(BaseModel):
     user_id: str
@@ -506,87 +517,19 @@ Exclude project-specific links, certificate links, or general social media links
 
 async def fetch_user_profile(user_id: str) -> Dict[str, Any]:
     """Fetch user profile from user_profiles table"""
-    conn = None
-    cur = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        logging.info(f"Fetching user profile for user_id: {user_id}")
-        cur.execute("""
-            SELECT name, email, phone, location, education, skills, experience, 
-                   projects, achievements, societies, links, original_resume_filepath
-            FROM user_profiles 
-            WHERE user_id = %s
-        """, (user_id,))
-        result = cur.fetchone()
-        if not result:
+        profile = await anyio.to_thread.run_sync(profile_store.get, user_id)
+        if not profile:
             logging.error(f"No user profile found for user_id: {user_id}")
             raise HTTPException(status_code=404, detail=f"User profile not found for user_id '{user_id}'")
-        logging.info(f"Raw database result: {dict(result)}")
-        json_fields = ['education', 'skills', 'experience', 'projects', 'achievements', 'societies', 'links']
-        user_data = dict(result)
-        for field in json_fields:
-            logging.info(f"Processing field: {field}, Raw value: {user_data.get(field)}")
-            if user_data.get(field):
-                try:
-                    import json
-                    parsed_data = json.loads(user_data[field])
-                    logging.info(f"Parsed {field}: {parsed_data}")
-                    if isinstance(parsed_data, list):
-                        text_items = []
-                        for item in parsed_data:
-                            if isinstance(item, dict):
-                                if 'title' in item:
-                                    text_items.append(str(item['title']))
-                                elif 'name' in item:
-                                    text_items.append(str(item['name']))
-                                elif 'description' in item:
-                                    text_items.append(str(item['description']))
-                                elif 'text' in item:
-                                    text_items.append(str(item['text']))
-                                else:
-                                    text_items.append(' '.join([str(v) for v in item.values() if isinstance(v, str)]))
-                            elif isinstance(item, str):
-                                text_items.append(item)
-                            else:
-                                text_items.append(str(item))
-                        user_data[field] = text_items
-                        logging.info(f"Final {field} (list): {text_items}")
-                    elif isinstance(parsed_data, dict):
-                        text_items = []
-                        for key, value in parsed_data.items():
-                            if isinstance(value, str):
-                                text_items.append(value)
-                            elif isinstance(value, list):
-                                text_items.extend([str(v) for v in value if isinstance(v, str)])
-                        user_data[field] = text_items
-                        logging.info(f"Final {field} (dict): {text_items}")
-                    else:
-                        user_data[field] = [str(parsed_data)]
-                        logging.info(f"Final {field} (other): {user_data[field]}")
-                except (json.JSONDecodeError, TypeError) as e:
-                    logging.warning(f"Error parsing {field} for user {user_id}: {e}")
-                    user_data[field] = []
-            else:
-                user_data[field] = []
-                logging.info(f"Field {field} is empty or null")
-        logging.info(f"Final processed user data:")
-        for key, value in user_data.items():
-            if isinstance(value, list):
-                logging.info(f"  {key}: {len(value)} items - {value[:3]}...")
-            else:
-                logging.info(f"  {key}: {value}")
+        user_data = profile.as_text_lists()
+        user_data.pop("profile_completed", None)
         return user_data
     except HTTPException:
         raise
     except Exception as e:
         logging.error(f"Error fetching user profile: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch user profile: {str(e)}")
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 async def generate_enhanced_resume(user_id: str, job_preference: str) -> Dict[str, Any]:
     """Generate enhanced resume using AI (using the working approach from main.py)"""
@@ -1848,6 +1791,7 @@ async def enhance_resume_endpoint(request: ResumeEnhancementRequest):
         try:
             conn.commit()
             logging.info("Database transaction committed")
+            await response_cache.invalidate_user_async(request.user_id)
         except Exception as commit_error:
             logging.error(f"Database commit failed: {commit_error}")
             raise HTTPException(status_code=500, detail=f"Database commit failed: {str(commit_error)}")
@@ -1946,6 +1890,7 @@ async def enhance_resume_from_db_get(
         
         # Track service usage
         track_service_usage(user_id, "resume_enhancer")
+        await response_cache.invalidate_user_async(user_id)
         
         # Generate PDF on-demand and return
         pdf_bytes = generate_pdf_with_reportlab(enhancement_result)
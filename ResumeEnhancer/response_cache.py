@@ -0,0 +1,266 @@
+"""
+Response cache middleware for polled, per-user GET endpoints.
+
+Responses are cached per route with a TTL, tagged with an ETag (clients that
+send If-None-Match get a 304), and served stale for a grace period while a
+background request refreshes them. Each user has a generation counter that is
+part of every cache key; bumping it with invalidate_user() after a write makes
+all of that user's cached responses unreachable at once.
+
+The default backend is an in-process LRU: entries and invalidations then
+stay inside one worker, so a write made in another service only shows up
+once the cached entry's TTL (plus stale grace) runs out. Invalidating
+across services requires the shared backend: set RESPONSE_CACHE_REDIS_URL
+(needs the `redis` package, which is not installed by default). Caches
+built with shared_only=True, for services that only invalidate, do nothing
+without it.
+
+The same file is shipped in every service that caches or invalidates
+responses, so keep the copies identical.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class LRUBackend:
+    """Bounded in-process store; entries and user generations live in this worker only"""
+
+    shared = False
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict, ttl: float):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def generation(self, user_id: str) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def bump_generation(self, user_id: str):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+class RedisBackend:
+    """Shared store; invalidations made by any service are seen by all of them"""
+
+    # Network round trips: called off the event loop by the async code paths
+    shared = True
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed when RESPONSE_CACHE_REDIS_URL is set
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self._redis.get(f"respcache:entry:{key}")
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: dict, ttl: float):
+        self._redis.set(f"respcache:entry:{key}", json.dumps(entry), ex=max(1, int(ttl)))
+
+    def generation(self, user_id: str) -> int:
+        raw = self._redis.get(f"respcache:gen:{user_id}")
+        return int(raw) if raw else 0
+
+    def bump_generation(self, user_id: str):
+        self._redis.incr(f"respcache:gen:{user_id}")
+
+
+class ResponseCache:
+    """
+    Cache policy plus backend.
+
+    `routes` maps a path prefix to (ttl, stale_ttl) in seconds. The path
+    segment right after the prefix is taken as the user id, matching the
+    `/route/{user_id}` shape of the dashboard endpoints. With shared_only,
+    invalidate_user is a no-op unless the backend is shared.
+    """
+
+    def __init__(self, routes: Dict[str, Tuple[float, float]], backend=None, shared_only: bool = False):
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.backend = backend or self._default_backend()
+        self.shared_only = shared_only
+        self._refreshing = set()
+        self._tasks = set()
+        if shared_only and not self.backend.shared:
+            logging.info("RESPONSE_CACHE_REDIS_URL not set; other services' cached responses expire by TTL only")
+
+    @staticmethod
+    def _default_backend():
+        if RESPONSE_CACHE_REDIS_URL:
+            try:
+                return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+            except Exception as e:
+                logging.error(f"Redis response cache unavailable, using in-process LRU: {e}")
+        return LRUBackend()
+
+    def match(self, path: str) -> Optional[Tuple[str, float, float]]:
+        """(user_id, ttl, stale_ttl) for a cacheable path, else None"""
+        for prefix, (ttl, stale_ttl) in self.routes:
+            if path.startswith(prefix):
+                user_id = path[len(prefix):].strip("/").split("/")[0]
+                return user_id, ttl, stale_ttl
+        return None
+
+    def key_for(self, user_id: str, path: str, query_string: bytes) -> str:
+        query = "&".join(sorted(query_string.decode("latin-1").split("&")))
+        return f"{user_id}:{self.backend.generation(user_id)}:{path}?{query}"
+
+    def invalidate_user(self, user_id: Optional[str]):
+        """Drop every cached response for user_id (call after committing a write)"""
+        if not user_id or (self.shared_only and not self.backend.shared):
+            return
+        try:
+            self.backend.bump_generation(str(user_id))
+        except Exception as e:
+            logging.error(f"Failed to invalidate cached responses for {user_id}: {e}")
+
+    async def invalidate_user_async(self, user_id: Optional[str]):
+        """invalidate_user for async endpoints; keeps Redis round trips off the event loop"""
+        await self.call(self.invalidate_user, user_id)
+
+    async def call(self, fn, *args):
+        if self.backend.shared:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+
+# Response headers replayed from the cache (e.g. the pagination cursor)
+REPLAYED_HEADERS = (b"x-next-cursor", b"link")
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving GET responses from a ResponseCache"""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if not RESPONSE_CACHE_ENABLED or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        matched = self.cache.match(scope["path"])
+        if not matched:
+            await self.app(scope, receive, send)
+            return
+        user_id, ttl, stale_ttl = matched
+        key = await self.cache.call(self.cache.key_for, user_id, scope["path"], scope.get("query_string", b""))
+        if_none_match = dict(scope.get("headers", [])).get(b"if-none-match", b"").decode("latin-1")
+
+        entry = await self.cache.call(self.cache.backend.get, key)
+        age = time.time() - entry["stored_at"] if entry else None
+        if entry and age < ttl:
+            await self._send_entry(send, entry, if_none_match, "HIT")
+            return
+        if entry and age < ttl + stale_ttl:
+            if key not in self.cache._refreshing:
+                self.cache._refreshing.add(key)
+                # The loop only keeps a weak reference to tasks
+                task = asyncio.create_task(self._refresh(scope, key, ttl + stale_ttl))
+                self.cache._tasks.add(task)
+                task.add_done_callback(self.cache._tasks.discard)
+            await self._send_entry(send, entry, if_none_match, "STALE")
+            return
+
+        status, headers, body = await self._render(scope)
+        if status == 200:
+            entry = await self._store(key, headers, body, ttl + stale_ttl)
+            await self._send_entry(send, entry, if_none_match, "MISS")
+            return
+        await self._send(send, status, headers, body)
+
+    async def _render(self, scope):
+        """Run the wrapped app for a GET and collect its response"""
+        status = 500
+        headers = []
+        chunks = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def collect(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, collect)
+        return status, headers, b"".join(chunks)
+
+    async def _store(self, key: str, headers, body: bytes, lifetime: float) -> dict:
+        header_map = dict(headers)
+        entry = {
+            "stored_at": time.time(),
+            "etag": _etag(body),
+            "content_type": header_map.get(b"content-type", b"application/json").decode("latin-1"),
+            "headers": [
+                [name.decode("latin-1"), header_map[name].decode("latin-1")]
+                for name in REPLAYED_HEADERS if name in header_map
+            ],
+            "body": body.decode("utf-8"),
+        }
+        await self.cache.call(self.cache.backend.set, key, entry, lifetime)
+        return entry
+
+    async def _refresh(self, scope, key: str, lifetime: float):
+        try:
+            status, headers, body = await self._render(dict(scope))
+            if status == 200:
+                await self._store(key, headers, body, lifetime)
+        except Exception as e:
+            logging.error(f"Background refresh failed for {scope['path']}: {e}")
+        finally:
+            self.cache._refreshing.discard(key)
+
+    async def _send_entry(self, send, entry: dict, if_none_match: str, state: str):
+        headers = [
+            (b"etag", entry["etag"].encode("latin-1")),
+            (b"x-cache", state.encode("latin-1")),
+            (b"cache-control", b"private, no-cache"),
+        ]
+        if if_none_match and entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+            await self._send(send, 304, headers, b"")
+            return
+        headers.append((b"content-type", entry["content_type"].encode("latin-1")))
+        headers.extend((name.encode("latin-1"), value.encode("latin-1")) for name, value in entry.get("headers", []))
+        await self._send(send, 200, headers, entry["body"].encode("utf-8"))
+
+    @staticmethod
+    async def _send(send, status: int, headers, body: bytes):
+        headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,117 @@
+"""
+Accuracy and latency of the rule-based resume pre-parser.
+
+Runs resume_rules.pre_parse over the text resumes in resume_corpus/, scores
+the locally extracted fields against expected.json, and compares the size of
+the prompt sent to the LLM with and without the pre-parser. With --llm it
+also calls Gemini both ways (needs GOOGLE_API_KEY) and reports latency and
+agreement on the fields both runs return.
+
+    python benchmarks/benchmark_preparser.py [--iterations 200] [--llm]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from resume_rules import pre_parse  # noqa: E402
+
+CORPUS_DIR = os.path.join(HERE, "resume_corpus")
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS_DIR, "expected.json"), encoding="utf-8") as handle:
+        expected = json.load(handle)
+    corpus = []
+    for name in sorted(expected):
+        with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as handle:
+            corpus.append((name, handle.read(), expected[name]))
+    return corpus
+
+
+def score_field(actual, wanted):
+    """(correct, total) for one field; list fields are scored per item"""
+    if isinstance(wanted, list):
+        actual = {str(item).lower() for item in actual or []}
+        wanted_set = {item.lower() for item in wanted}
+        hits = len(actual & wanted_set)
+        return hits, max(len(wanted_set), len(actual))
+    return int((actual or "").strip() == wanted), 1
+
+
+def bench_rules(corpus, iterations):
+    totals = {}
+    print(f"{'file':<24}{'field':<10}{'result'}")
+    for name, text, expected in corpus:
+        result = pre_parse(text)
+        for field, wanted in expected.items():
+            correct, total = score_field(result.fields.get(field), wanted)
+            acc = totals.setdefault(field, [0, 0])
+            acc[0] += correct
+            acc[1] += total
+            if correct != total:
+                print(f"{name:<24}{field:<10}got {result.fields.get(field)!r}, expected {wanted!r}")
+
+    print("\nRule accuracy by field")
+    for field, (correct, total) in totals.items():
+        print(f"  {field:<8} {correct}/{total} ({100.0 * correct / max(total, 1):.0f}%)")
+
+    timings = []
+    for _ in range(iterations):
+        for _, text, _ in corpus:
+            started = time.perf_counter()
+            pre_parse(text)
+            timings.append((time.perf_counter() - started) * 1000)
+    print(f"\npre_parse latency: mean {statistics.mean(timings):.3f} ms, "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.3f} ms over {len(timings)} runs")
+
+
+def bench_prompts(corpus, call_llm):
+    import parser as resume_parser
+
+    print(f"\n{'file':<24}{'full prompt':>12}{'focused':>10}{'saved':>8}")
+    for name, text, expected in corpus:
+        resume_parser.RULE_PREPARSE = False
+        full_prompt, _ = resume_parser.build_prompt(text)
+        resume_parser.RULE_PREPARSE = True
+        focused_prompt, _ = resume_parser.build_prompt(text)
+        saved = 100.0 * (1 - len(focused_prompt) / len(full_prompt))
+        print(f"{name:<24}{len(full_prompt):>12}{len(focused_prompt):>10}{saved:>7.0f}%")
+
+        if not call_llm:
+            continue
+        runs = {}
+        for mode in (False, True):
+            resume_parser.RULE_PREPARSE = mode
+            started = time.perf_counter()
+            runs[mode] = resume_parser.parse_resume_with_gpt(text)
+            runs[mode]["_seconds"] = time.perf_counter() - started
+        agree = [
+            field for field in expected
+            if score_field(runs[True].get(field), expected[field]) >= score_field(runs[False].get(field), expected[field])
+        ]
+        print(f"  LLM full {runs[False]['_seconds']:.2f}s, focused {runs[True]['_seconds']:.2f}s; "
+              f"focused at least as accurate on {len(agree)}/{len(expected)} fields")
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    args.add_argument("--iterations", type=int, default=200)
+    args.add_argument("--llm", action="store_true", help="also call the model with both prompts")
+    options = args.parse_args()
+
+    corpus = load_corpus()
+    bench_rules(corpus, options.iterations)
+    try:
+        bench_prompts(corpus, options.llm)
+    except ImportError as e:
+        print(f"\nSkipping prompt comparison ({e}); install requirements.txt to include it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# bulk_ingest.py
+"""
+Bulk resume ingestion.
+
+Resumes from a zip archive or a directory flow through three stages, each
+with its own worker pool and a bounded queue in front of it:
+
+    extract (text layer, OCR for scanned pages)
+      -> parse (rule pre-parser + LLM, skipped on a parse-cache hit)
+      -> store (GCS upload + insert_user_profile)
+
+The bounded queues keep memory flat however many files there are, and the
+slow LLM stage never starves the others. Every finished file is appended to
+a JSONL progress file named after the job, so re-running a job skips what
+already succeeded. Each resume gets a stable user id derived from its
+content hash, which makes re-ingesting the same file an update, not a
+duplicate.
+
+Imported candidates have no login of their own: their profiles live under
+these import_<hash> ids, not under any existing account. Every job
+therefore names an owner (the HR or admin user running the import), and
+the per-file report lists each import id with its owner and the email
+parsed from the resume, which is what a recruiter uses to find or hand over
+an imported profile.
+
+CLI (uses the same wiring as the API, see main.build_ingest_pipeline):
+
+    python bulk_ingest.py resumes.zip --owner UID [--job-id ID]
+    python bulk_ingest.py /path/to/resumes/ --owner UID
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+INGEST_STATE_DIR = os.getenv("INGEST_STATE_DIR", "/tmp/resume_ingest")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+INGEST_EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", "4"))
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "8"))
+INGEST_STORE_WORKERS = int(os.getenv("INGEST_STORE_WORKERS", "2"))
+INGEST_MAX_FILE_SIZE = 10 * 1024 * 1024  # same limit as /parse-resume/
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+_STOP = object()
+
+
+@dataclass
+class IngestItem:
+    name: str
+    data: bytes
+    digest: str
+    user_id: str
+    text: str = ""
+    parsed: Optional[dict] = None
+    from_cache: bool = False
+    started_at: float = field(default_factory=time.monotonic)
+
+
+def resume_user_id(digest: str) -> str:
+    return f"import_{digest[:24]}"
+
+
+def iter_resumes(path: str) -> Iterator[Tuple[str, bytes]]:
+    """(name, bytes) for every PDF/DOCX in a zip archive or directory tree"""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for filename in sorted(files):
+                if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    full_path = os.path.join(root, filename)
+                    if os.path.getsize(full_path) > INGEST_MAX_FILE_SIZE:
+                        yield os.path.relpath(full_path, path), b""
+                        continue
+                    with open(full_path, "rb") as handle:
+                        yield os.path.relpath(full_path, path), handle.read()
+        return
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            if info.file_size > INGEST_MAX_FILE_SIZE:
+                yield info.filename, b""  # reported as too large by the pipeline
+                continue
+            yield info.filename, archive.read(info)
+
+
+def job_id_for(path: str) -> str:
+    """Stable id for a source, so submitting the same archive again resumes it"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        digest.update(os.path.abspath(path).encode("utf-8"))
+    else:
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class IngestJob:
+    """Progress of one ingestion run, persisted as JSONL for resuming"""
+
+    def __init__(self, job_id: str, state_dir: str = INGEST_STATE_DIR, owner: Optional[str] = None):
+        os.makedirs(state_dir, exist_ok=True)
+        self.job_id = job_id
+        self.owner = owner
+        self.path = os.path.join(state_dir, f"{job_id}.jsonl")
+        self.results: Dict[str, dict] = {}
+        self.state = "pending"
+        self.total = 0
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.results[record["file"]] = record
+
+    def is_done(self, name: str) -> bool:
+        return self.results.get(name, {}).get("status") == "done"
+
+    def record(self, file_name: str, status: str, **details):
+        record = {"file": file_name, "status": status, **details}
+        with self._lock:
+            self.results[file_name] = record
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(record) + "\n")
+
+    def report(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for record in self.results.values():
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+            return {
+                "job_id": self.job_id,
+                "owner": self.owner,
+                "state": self.state,
+                "total": self.total,
+                "counts": counts,
+                "files": list(self.results.values()),
+            }
+
+
+class IngestPipeline:
+    """
+    Staged, bounded pipeline. The stage callables come from the service:
+
+        lookup(digest) -> (text, parsed) or None   parse-cache hit skips extract and parse
+        extract(name, data) -> text
+        parse(digest, text) -> parsed
+        store(item) -> resume path
+    """
+
+    def __init__(self, lookup: Callable, extract: Callable, parse: Callable, store: Callable,
+                 extract_workers: int = INGEST_EXTRACT_WORKERS,
+                 parse_workers: int = INGEST_PARSE_WORKERS,
+                 store_workers: int = INGEST_STORE_WORKERS,
+                 queue_size: int = INGEST_QUEUE_SIZE):
+        self._lookup = lookup
+        self._extract = extract
+        self._parse = parse
+        self._store = store
+        self._workers = (extract_workers, parse_workers, store_workers)
+        self._queue_size = queue_size
+
+    def run(self, source: str, job: IngestJob) -> dict:
+        if not job.owner:
+            raise ValueError("An ingest job needs an owner for the profiles it creates")
+        queues = [queue.Queue(maxsize=self._queue_size) for _ in range(3)]
+        stages = [self._extract_stage, self._parse_stage, self._store_stage]
+        threads: List[List[threading.Thread]] = []
+        for index, (stage, workers) in enumerate(zip(stages, self._workers)):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            pool = [
+                threading.Thread(target=self._work, args=(stage, queues[index], outbox, job),
+                                 name=f"ingest-{stage.__name__}-{n}", daemon=True)
+                for n in range(max(1, workers))
+            ]
+            for thread in pool:
+                thread.start()
+            threads.append(pool)
+
+        job.state = "running"
+        seen = {record["digest"] for record in job.results.values() if record.get("digest")}
+        try:
+            for name, data in iter_resumes(source):
+                job.total += 1
+                if not data:
+                    job.record(name, "failed", error="File is empty or exceeds 10 MB")
+                    continue
+                if job.is_done(name):
+                    continue
+                digest = hashlib.sha256(data).hexdigest()
+                if digest in seen:
+                    job.record(name, "skipped", error="Duplicate of another file in this batch")
+                    continue
+                seen.add(digest)
+                queues[0].put(IngestItem(name=name, data=data, digest=digest, user_id=resume_user_id(digest)))
+        finally:
+            # Drain stage by stage: each stage stops after the one before it has
+            # finished. Runs even if reading the source failed, so no worker is left blocked.
+            for stage_queue, pool in zip(queues, threads):
+                for _ in pool:
+                    stage_queue.put(_STOP)
+                for thread in pool:
+                    thread.join()
+        job.state = "finished"
+        report = job.report()
+        logging.info(f"Ingest job {job.job_id} finished: {report['counts']}")
+        return report
+
+    @staticmethod
+    def _work(stage, inbox: queue.Queue, outbox: Optional[queue.Queue], job: IngestJob):
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            try:
+                forward = stage(item, job)
+            except Exception as e:
+                logging.error(f"Ingest of {item.name} failed in {stage.__name__}: {e}")
+                job.record(item.name, "failed", stage=stage.__name__, error=str(e), user_id=item.user_id)
+                continue
+            if forward and outbox is not None:
+                outbox.put(item)
+
+    def _extract_stage(self, item: IngestItem, job: IngestJob) -> bool:
+        cached = self._lookup(item.digest)
+        if cached:
+            item.text, item.parsed = cached
+            item.from_cache = True
+            return True
+        item.text = self._extract(item.name, item.data)
+        if not item.text.strip():
+            raise ValueError("No text could be extracted")
+        return True
+
+    def _parse_stage(self, item: IngestItem, job: IngestJob) -> bool:
+        if item.parsed is None:
+            item.parsed = self._parse(item.digest, item.text)
+        if "error" in item.parsed:
+            raise ValueError(item.parsed["error"])
+        return True
+
+    def _store_stage(self, item: IngestItem, job: IngestJob) -> bool:
+        resume_path = self._store(item)
+        job.record(
+            item.name, "done",
+            user_id=item.user_id,
+            owner=job.owner,
+            digest=item.digest,
+            candidate=item.parsed.get("name", ""),
+            email=item.parsed.get("email", ""),
+            resume_path=resume_path,
+            cached_parse=item.from_cache,
+            seconds=round(time.monotonic() - item.started_at, 2),
+        )
+        item.data = b""
+        return False
+
+
+def main():
+    import argparse
+
+    args = argparse.ArgumentParser(description="Ingest a zip or directory of resumes")
+    args.add_argument("source", help="zip archive or directory of PDF/DOCX resumes")
+    args.add_argument("--owner", required=True, help="uid of the HR or admin user the import is run for")
+    args.add_argument("--job-id", help="resume an earlier run (defaults to a hash of the source)")
+    options = args.parse_args()
+
+    from main import build_ingest_pipeline
+
+    job = IngestJob(options.job_id or job_id_for(options.source), owner=options.owner)
+    report = build_ingest_pipeline().run(options.source, job)
+    print(json.dumps({key: value for key, value in report.items() if key != "files"}, indent=2))
+    print(f"Per-file report: {job.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form
+from types import SimpleNamespace
+from io import BytesIO
+import threading
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import os
+import tempfile
 import psycopg2
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
 from resume_uploader import upload_to_gcs  # GCS upload handler
-from parser import extract_text, parse_resume_with_gpt
+from parser import PARSER_VERSION, extract_document, extract_text, parse_resume_with_gpt
+from profile_store import ProfileStore
+from parse_cache import ParseCache, content_hash
+from bulk_ingest import INGEST_STATE_DIR, IngestJob, IngestPipeline, job_id_for
 import re
 import ast
 import json
+from structured_logging import RequestLoggingMiddleware, configure_logging
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 
 app = FastAPI()
 
@@ -25,6 +34,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 
 # Load environment variables
@@ -60,6 +70,13 @@ def get_db_connection():
         logging.error(f"PostgreSQL connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection error")
 
+profile_store = ProfileStore(get_db_connection)
+parse_cache = ParseCache(get_db_connection, PARSER_VERSION)
+
+@app.on_event("startup")
+def install_parse_cache():
+    parse_cache.install()
+
 def to_json_list(val, sep=","):
     if isinstance(val, list):
         return val
@@ -146,6 +163,7 @@ def insert_user_profile(user_id: str, parsed_data: dict, resume_url: str = None)
         ))
         
         conn.commit()
+        profile_store.invalidate(user_id)
         logging.info(f"Successfully inserted/updated profile for user {user_id}")
         
     except Exception as e:
@@ -204,6 +222,20 @@ def postprocess_parsed_data(parsed_data, raw_text):
             parsed_data["name"] = lines[0].strip()
     return parsed_data
 
+def normalize_parsed_data(parsed_data: dict, extracted_text: str) -> dict:
+    parsed_data = postprocess_parsed_data(parsed_data, extracted_text)
+
+    # Ensure parsed_data fields are lists for JSON serialization
+    parsed_data["skills"] = to_json_list(parsed_data.get("skills", ""), sep=",")
+    parsed_data["projects"] = to_json_list(parsed_data.get("projects", ""), sep="\n")
+    parsed_data["experience"] = to_json_list(parsed_data.get("experience", ""), sep="\n")
+    parsed_data["achievements"] = to_json_list(parsed_data.get("achievements", ""), sep="\n")
+    parsed_data["societies"] = to_json_list(parsed_data.get("societies", ""), sep=",")
+    parsed_data["links"] = to_json_list(parsed_data.get("links", ""), sep="\n")
+    parsed_data["education"] = to_json_list(parsed_data.get("education", ""), sep="\n")
+    parsed_data["qualification"] = to_json_list(parsed_data.get("qualification", ""), sep="\n")
+    return parsed_data
+
 @app.post("/parse-resume/")
 async def parse_resume(
     file: UploadFile = File(...),
@@ -221,34 +253,41 @@ async def parse_resume(
     username = user_info.get("email", "").split("@")[0] if user_info.get("email") else user_id
     username = username.replace(" ", "_") or "anonymous"
 
-    # Construct cloud path: resume_and_job_matching/raw_resume/<user_id>/<username>_<date>.pdf
-    date_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    clean_ext = os.path.splitext(file.filename)[1]
-    safe_filename = f"{username}_{date_str}{clean_ext}"
-    gcs_path = f"resume_and_job_matching/raw_resume/{user_id}/{safe_filename}"
-
-    # Upload to GCS
-    try:
-        upload_to_gcs(file, gcs_path)
-    except Exception as e:
-        logging.error(f"Upload failed: {e}")
-        raise HTTPException(status_code=500, detail="Cloud upload failed")
-
-    # Reset stream and extract text
-    file.file.seek(0)
-    extracted_text = extract_text(file)
-    parsed_data = parse_resume_with_gpt(extracted_text)
-    parsed_data = postprocess_parsed_data(parsed_data, extracted_text)
-
-    # Ensure parsed_data fields are lists for JSON serialization
-    parsed_data["skills"] = to_json_list(parsed_data.get("skills", ""), sep=",")
-    parsed_data["projects"] = to_json_list(parsed_data.get("projects", ""), sep="\n")
-    parsed_data["experience"] = to_json_list(parsed_data.get("experience", ""), sep="\n")
-    parsed_data["achievements"] = to_json_list(parsed_data.get("achievements", ""), sep="\n")
-    parsed_data["societies"] = to_json_list(parsed_data.get("societies", ""), sep=",")
-    parsed_data["links"] = to_json_list(parsed_data.get("links", ""), sep="\n")
-    parsed_data["education"] = to_json_list(parsed_data.get("education", ""), sep="\n")
-    parsed_data["qualification"] = to_json_list(parsed_data.get("qualification", ""), sep="\n")
+    data = await file.read()
+    file_hash = content_hash(data)
+
+    # A user re-uploading the same file reuses the stored copy
+    gcs_path = parse_cache.upload_path(user_id, file_hash)
+    if gcs_path:
+        logging.info(f"Duplicate upload for user {user_id}; reusing {gcs_path}")
+    else:
+        # Construct cloud path: resume_and_job_matching/raw_resume/<user_id>/<username>_<date>.pdf
+        date_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        clean_ext = os.path.splitext(file.filename)[1]
+        safe_filename = f"{username}_{date_str}{clean_ext}"
+        gcs_path = f"resume_and_job_matching/raw_resume/{user_id}/{safe_filename}"
+
+        # Upload to GCS
+        try:
+            file.file.seek(0)
+            upload_to_gcs(file, gcs_path)
+        except Exception as e:
+            logging.error(f"Upload failed: {e}")
+            raise HTTPException(status_code=500, detail="Cloud upload failed")
+        parse_cache.record_upload(user_id, file_hash, gcs_path)
+
+    # Same bytes and parser version: skip extraction and the LLM call
+    cached = parse_cache.get(file_hash)
+    if cached:
+        extracted_text, parsed_data = cached
+        logging.info(f"Parse cache hit for {file_hash[:12]}")
+    else:
+        # Reset stream and extract text
+        file.file.seek(0)
+        extracted_text = extract_text(file)
+        parsed_data = parse_resume_with_gpt(extracted_text)
+        parse_cache.put(file_hash, extracted_text, parsed_data)
+    parsed_data = normalize_parsed_data(parsed_data, extracted_text)
 
     # Store parsed info in user_profiles table
     insert_user_profile(user_id, parsed_data, gcs_path)
@@ -319,59 +358,15 @@ async def update_profile(data: dict = Body(...)):
 
 @app.get("/get-profile/")
 async def get_profile(user_id: str):
-    conn = cur = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Get profile from user_profiles table
-        cur.execute("""
-            SELECT up.*, u.email as user_email, u.role as user_role
-            FROM user_profiles up
-            LEFT JOIN users u ON up.user_id = u.uid
-            WHERE up.user_id = %s
-        """, (user_id,))
-        
-        row = cur.fetchone()
-        if not row:
+        profile = profile_store.get(user_id)
+        if not profile:
             raise HTTPException(status_code=404, detail=f"Profile for user_id {user_id} not found")
-        
-        # Get column names
-        colnames = [desc[0] for desc in cur.description]
-        profile = dict(zip(colnames, row))
-        
-        # Attempt to parse JSON fields
-        json_fields = ["skills", "projects", "experience", "achievements", "societies", "links", "education"]
-        for field in json_fields:
-            if profile.get(field):
-                try:
-                    profile[field] = json.loads(profile[field])
-                except Exception:
-                    pass  # Leave as string if not parseable
-        
-        # Extract summary from achievements if present
-        if isinstance(profile.get("achievements"), list) and profile["achievements"]:
-            profile["summary"] = profile["achievements"][0] if profile["achievements"] else ""
-            profile["certifications"] = profile["achievements"][1:] if len(profile["achievements"]) > 1 else []
-        else:
-            profile["summary"] = ""
-            profile["certifications"] = profile.get("achievements", [])
-        
-        # Always provide 'projects' as an alias for 'project'
-        profile["projects"] = profile.get("projects", [])
-        
-        # Always provide 'education' as an alias for 'qualification'
-        profile["education"] = profile.get("education", [])
-        
-        return profile
-        
+        return profile.as_api_dict()
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch profile: {e}")
-    finally:
-        if cur: cur.close()
-        if conn: conn.close()
 
 @app.get("/check-user/{user_id}")
 async def check_user(user_id: str):
@@ -393,6 +388,91 @@ async def check_user(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to check user: {e}")
 
+# -------------------- Bulk ingestion --------------------
+
+def _parse_for_ingest(digest: str, text: str) -> dict:
+    parsed = parse_resume_with_gpt(text)
+    parse_cache.put(digest, text, parsed)
+    return parsed
+
+def _store_ingested(item) -> str:
+    gcs_path = parse_cache.upload_path(item.user_id, item.digest)
+    if not gcs_path:
+        filename = os.path.basename(item.name).replace(" ", "_")
+        gcs_path = f"resume_and_job_matching/raw_resume/{item.user_id}/{filename}"
+        content_type = "application/pdf" if filename.lower().endswith(".pdf") else \
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        upload_to_gcs(SimpleNamespace(filename=filename, file=BytesIO(item.data), content_type=content_type), gcs_path)
+        parse_cache.record_upload(item.user_id, item.digest, gcs_path)
+    insert_user_profile(item.user_id, normalize_parsed_data(dict(item.parsed), item.text), gcs_path)
+    return gcs_path
+
+def build_ingest_pipeline() -> IngestPipeline:
+    return IngestPipeline(
+        lookup=parse_cache.get,
+        extract=extract_document,
+        parse=_parse_for_ingest,
+        store=_store_ingested,
+    )
+
+ingest_jobs = {}
+ingest_jobs_lock = threading.Lock()
+
+def _run_ingest_job(source: str, job: IngestJob):
+    try:
+        build_ingest_pipeline().run(source, job)
+    except Exception as e:
+        job.state = "failed"
+        logging.error(f"Ingest job {job.job_id} failed: {e}")
+
+@app.post("/bulk-ingest/")
+async def bulk_ingest(file: UploadFile = File(...), owner_id: str = Form(...)):
+    """
+    Start ingesting a zip of PDF/DOCX resumes on behalf of owner_id, an HR or
+    admin user. Uploading the same archive again resumes the job instead of
+    redoing finished files.
+    """
+    if not file.filename.lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail="Upload a .zip archive of PDF/DOCX resumes")
+    owner = get_user_info(owner_id)
+    if not owner:
+        raise HTTPException(status_code=400, detail=f"Unknown owner_id {owner_id}")
+    if owner["role"] not in ("hr", "admin"):
+        raise HTTPException(status_code=403, detail="Only HR and admin users can run bulk ingestion")
+
+    os.makedirs(INGEST_STATE_DIR, exist_ok=True)
+    # Concurrent requests share the event loop thread, so the name must be unique per upload
+    fd, upload_path = tempfile.mkstemp(prefix="upload_", suffix=".zip", dir=INGEST_STATE_DIR)
+    with os.fdopen(fd, "wb") as handle:
+        while chunk := await file.read(1024 * 1024):
+            handle.write(chunk)
+    job_id = job_id_for(upload_path)
+    source = os.path.join(INGEST_STATE_DIR, f"{job_id}.zip")
+    os.replace(upload_path, source)
+
+    with ingest_jobs_lock:
+        job = ingest_jobs.get(job_id)
+        if job and job.state == "running":
+            return job.report()
+        job = IngestJob(job_id, owner=owner_id)
+        job.state = "running"
+        ingest_jobs[job_id] = job
+    threading.Thread(target=_run_ingest_job, args=(source, job), name=f"ingest-{job_id}", daemon=True).start()
+    return {"job_id": job_id, "state": job.state, "status_url": f"/bulk-ingest/{job_id}"}
+
+@app.get("/bulk-ingest/{job_id}")
+async def bulk_ingest_status(job_id: str, include_files: bool = True):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        if not os.path.exists(os.path.join(INGEST_STATE_DIR, f"{job_id}.jsonl")):
+            raise HTTPException(status_code=404, detail=f"Ingest job {job_id} not found")
+        job = IngestJob(job_id)
+        job.state = "stopped"
+    report = job.report()
+    if not include_files:
+        report.pop("files")
+    return report
+
 @app.get("/health")
 async def health_check():
     """
@@ -0,0 +1,122 @@
+"""
+Content-addressed cache of resume parses.
+
+A parse is keyed by the SHA-256 of the uploaded file's bytes plus the parser
+version (model name and prompt hash), so re-uploading the same resume skips
+text extraction and the LLM call, while changing the prompt or model quietly
+starts a fresh cache. Parses live in resume_parse_cache, shared by every
+replica, with a small in-process LRU in front. resume_uploads remembers
+where each user's copy of a file was stored, so a duplicate upload by the
+same user skips the GCS upload as well.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "256"))
+
+PARSE_CACHE_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS resume_parse_cache (
+        content_hash CHAR(64) NOT NULL,
+        parser_version VARCHAR(100) NOT NULL,
+        extracted_text TEXT NOT NULL,
+        parsed_json JSONB NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (content_hash, parser_version)
+    );
+    CREATE TABLE IF NOT EXISTS resume_uploads (
+        user_id VARCHAR(255) NOT NULL,
+        content_hash CHAR(64) NOT NULL,
+        gcs_path TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, content_hash)
+    );
+"""
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, connect: Callable, parser_version: str, maxsize: int = PARSE_CACHE_SIZE):
+        self._connect = connect
+        self.parser_version = parser_version
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, params: tuple, fetch: bool = False, commit: bool = False):
+        conn = cur = None
+        try:
+            conn = self._connect()
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            row = cur.fetchone() if fetch else None
+            if commit:
+                conn.commit()
+            return row
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logging.error(f"Resume parse cache query failed: {e}")
+            return None
+        finally:
+            if cur: cur.close()
+            if conn: conn.close()
+
+    def install(self):
+        self._execute(PARSE_CACHE_SCHEMA_SQL, (), commit=True)
+
+    def _remember(self, digest: str, entry: Tuple[str, dict]):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, digest: str) -> Optional[Tuple[str, dict]]:
+        """(extracted_text, parsed) for this file under the current parser version"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                return entry[0], dict(entry[1])
+        row = self._execute(
+            "SELECT extracted_text, parsed_json FROM resume_parse_cache WHERE content_hash = %s AND parser_version = %s",
+            (digest, self.parser_version), fetch=True,
+        )
+        if not row:
+            return None
+        parsed = row[1] if isinstance(row[1], dict) else json.loads(row[1])
+        self._remember(digest, (row[0], parsed))
+        return row[0], dict(parsed)
+
+    def put(self, digest: str, extracted_text: str, parsed: dict):
+        """Store a successful parse (error results are never cached)"""
+        if "error" in parsed:
+            return
+        self._remember(digest, (extracted_text, dict(parsed)))
+        self._execute("""
+            INSERT INTO resume_parse_cache (content_hash, parser_version, extracted_text, parsed_json)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (content_hash, parser_version) DO NOTHING
+        """, (digest, self.parser_version, extracted_text, json.dumps(parsed)), commit=True)
+
+    def upload_path(self, user_id: str, digest: str) -> Optional[str]:
+        row = self._execute(
+            "SELECT gcs_path FROM resume_uploads WHERE user_id = %s AND content_hash = %s",
+            (user_id, digest), fetch=True,
+        )
+        return row[0] if row else None
+
+    def record_upload(self, user_id: str, digest: str, gcs_path: str):
+        self._execute("""
+            INSERT INTO resume_uploads (user_id, content_hash, gcs_path)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (user_id, content_hash) DO UPDATE SET gcs_path = EXCLUDED.gcs_path
+        """, (user_id, digest, gcs_path), commit=True)
@@ -4,15 +4,15 @@ from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import PromptTemplate
-from pypdf import PdfReader
 from docx import Document
+import hashlib
 import json
+from io import BytesIO
 import re
 import logging
 from fastapi import UploadFile
-from pdf2image import convert_from_bytes
-import pytesseract
-from PIL import Image
+from pdf_extraction import extract_pdf
+from resume_rules import RULES_VERSION, pre_parse
 
 # Configure logging for the parser
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,6 +20,78 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+RULE_PREPARSE = os.getenv("RULE_PREPARSE", "true").lower() in ("1", "true", "yes")
+
+MODEL_NAME = "gemini-2.0-flash"
+
+RESUME_PARSE_PROMPT = """
+You are an expert resume parser. Extract the following fields from the provided resume text and return a valid JSON object with these exact keys:
+["name", "email", "phone", "location", "summary", "education", "skills", "projects", "experience", "achievements", "societies", "links", "currentCompany"]
+
+- "summary": A 2-3 sentence professional summary or objective. If not present, generate one based on the candidate's experience and education.
+- "experience": An array of objects, each with "title", "company", "period", and "description". If you cannot find all fields, fill what you can, but always return an array of objects (never an array of strings or a string).
+- "education": An array of objects, each with "degree", "school", "year", and "gpa" (if available). If you cannot find all fields, fill what you can, but always return an array of objects (never an array of strings or a string).
+- "skills": An array of strings.
+- "projects": An array of objects, each with "title", "description", and "link" (if available). If you cannot find all fields, fill what you can, but always return an array of objects (never an array of strings or a string).
+- "achievements": An array of objects, each with "name", "issuer", and "year" (if available). Treat these as certifications, awards, or honors. If you cannot find all fields, fill what you can, but always return an array of objects.
+- "societies": An array of strings.
+- "links": An array of URLs as strings.
+- "currentCompany": If the most recent experience period contains 'Present' or 'Current', set to that company. If the most recent experience title contains 'intern', set to 'Ex-Intern at {{company}}'. If no experience, set to 'Student' or 'Fresher'. Otherwise, set to 'Ex-Employee at {{company}}'.
+
+If a field is missing, use an empty string or empty array as appropriate.
+**Do NOT return experience, education, projects, or achievements as plain strings or arrays of strings. Always return arrays of objects for these fields.**
+The output must be valid JSON, with all fields present and correctly typed.
+
+Example output:
+{{
+  "name": "Jane Doe",
+  "email": "jane.doe@email.com",
+  "phone": "+1-555-123-4567",
+  "location": "New York, NY",
+  "summary": "Experienced software engineer with a passion for building scalable web applications...",
+  "education": [
+    {{ "degree": "B.Sc. in Computer Science", "school": "NYU", "year": "2020", "gpa": "3.8" }},
+    {{ "degree": "High School Diploma", "school": "Central High", "year": "2016", "gpa": "" }}
+  ],
+  "skills": ["Python", "JavaScript", "SQL"],
+  "projects": [
+    {{
+      "title": "E-commerce Platform",
+      "description": "Built a full-stack e-commerce platform using React and Node.js",
+      "link": "https://github.com/janedoe/ecommerce"
+    }},
+    {{
+      "title": "Task Management App",
+      "description": "Developed a collaborative task management application with real-time updates",
+      "link": ""
+    }}
+  ],
+  "experience": [
+    {{
+      "title": "Software Engineer",
+      "company": "XYZ Corp",
+      "period": "2020-2022",
+      "description": "Worked on backend APIs and frontend features."
+    }},
+    {{
+      "title": "Intern",
+      "company": "ABC Inc.",
+      "period": "2019",
+      "description": "Assisted with web development projects."
+    }}
+  ],
+  "achievements": [
+    {{ "name": "Dean's List", "issuer": "NYU", "year": "2020" }},
+    {{ "name": "Hackathon Winner", "issuer": "ABC Hackathon", "year": "2019" }}
+  ],
+  "societies": ["ACM", "Chess Club"],
+  "links": ["https://linkedin.com/in/janedoe", "https://github.com/janedoe"],
+  "currentCompany": "XYZ Corp"
+}}
+
+Resume text:
+{text}
+"""
 
 # Initialize Gemini 2.0 Flash model
 if not GOOGLE_API_KEY:
@@ -27,7 +99,7 @@ if not GOOGLE_API_KEY:
     model = None
 else:
     try:
-        model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GOOGLE_API_KEY)
+        model = ChatGoogleGenerativeAI(model=MODEL_NAME, google_api_key=GOOGLE_API_KEY)
         logging.info("Successfully initialized Gemini model.")
     except Exception as e:
         logging.error(f"Failed to initialize Gemini model: {e}")
@@ -37,7 +109,7 @@ def extract_text(file: UploadFile) -> str:
     """
     Extracts text content and embedded hyperlinks from PDF or DOCX files.
     Filters links to include only potential social media profiles (e.g., LinkedIn, GitHub).
-    Uses OCR for image-based PDFs if no text is found.
+    Pages of a PDF without a text layer are OCR'd (see pdf_extraction).
     """
     logging.info(f"Attempting to extract text from: {file.filename}")
     
@@ -48,6 +120,12 @@ def extract_text(file: UploadFile) -> str:
     if size > max_file_size:
         raise ValueError("File size exceeds 10 MB limit.")
 
+    return extract_document(file.filename, file.file.read())
+
+def extract_document(filename: str, data: bytes) -> str:
+    """
+    extract_text for a file already in memory (used by bulk ingestion).
+    """
     extracted_text = ""
     links = []
 
@@ -64,35 +142,18 @@ def extract_text(file: UploadFile) -> str:
     ]
     social_media_pattern = "|".join(re.escape(domain) for domain in social_media_domains)
 
-    if file.filename.endswith(".pdf"):
+    if filename.lower().endswith(".pdf"):
         try:
-            reader = PdfReader(file.file)
-            for page in reader.pages:
-                if page.extract_text():
-                    extracted_text += page.extract_text() + "\n"
-            # If no text was extracted, try OCR
-            if not extracted_text.strip():
-                file.file.seek(0)
-                images = convert_from_bytes(file.file.read())
-                for image in images:
-                    extracted_text += pytesseract.image_to_string(image) + "\n"
-            # Extract links (annotations)
-            for page in reader.pages:
-                if "/Annots" in page:
-                    for annot in page["/Annots"]:
-                        annot_obj = annot.get_object()
-                        if "/A" in annot_obj and "/URI" in annot_obj["/A"]:
-                            uri = str(annot_obj["/A"]["/URI"])
-                            if re.search(social_media_pattern, uri, re.IGNORECASE):
-                                links.append(uri)
+            extracted_text, pdf_links = extract_pdf(data)
+            links = [uri for uri in pdf_links if re.search(social_media_pattern, uri, re.IGNORECASE)]
             logging.info(f"Successfully extracted text and {len(links)} social media links from PDF.")
         except Exception as e:
             logging.error(f"Error extracting text/links from PDF: {e}")
             raise ValueError(f"Failed to extract from PDF: {e}")
 
-    elif file.filename.endswith(".docx"):
+    elif filename.lower().endswith(".docx"):
         try:
-            doc = Document(file.file)
+            doc = Document(BytesIO(data))
             extracted_text = "\n".join(p.text for p in doc.paragraphs)
 
             # Extract hyperlinks from .docx XML parts
@@ -109,7 +170,7 @@ def extract_text(file: UploadFile) -> str:
             raise ValueError(f"Failed to extract from DOCX: {e}")
 
     else:
-        logging.warning(f"Unsupported file format for extraction: {file.filename}")
+        logging.warning(f"Unsupported file format for extraction: {filename}")
         raise ValueError("Unsupported file format. Only PDF and DOCX are supported.")
 
     # Append the links at the end of the extracted text to feed into the LLM
@@ -118,92 +179,52 @@ def extract_text(file: UploadFile) -> str:
 
     return extracted_text
 
-def parse_resume_with_gpt(text: str) -> dict:
-    """
-    Parses resume text using a Google Gemini AI model to extract structured information.
-    """
-    if not model:
-        logging.error("Gemini model not initialized. Cannot parse resume.")
-        return {"error": "AI model not available. Ensure GOOGLE_API_KEY is set correctly."}
+RESUME_FOCUSED_PROMPT = """
+You are an expert resume parser. Contact details and skills have already been extracted from this resume.
+From the resume sections below, return a valid JSON object with exactly these keys:
+{keys}
 
-    if not text.strip():
-        logging.warning("Empty resume text provided.")
-        return {
-            "error": "Empty resume text",
-            "details": "The provided resume text is empty or contains only whitespace."
-        }
+{instructions}
 
-    prompt_template = PromptTemplate.from_template("""
-You are an expert resume parser. Extract the following fields from the provided resume text and return a valid JSON object with these exact keys:
-["name", "email", "phone", "location", "summary", "education", "skills", "projects", "experience", "achievements", "societies", "links", "currentCompany"]
+If a field is missing, use an empty string or empty array as appropriate.
+The output must be valid JSON, with all requested fields present and correctly typed.
 
-- "summary": A 2-3 sentence professional summary or objective. If not present, generate one based on the candidate's experience and education.
-- "experience": An array of objects, each with "title", "company", "period", and "description". If you cannot find all fields, fill what you can, but always return an array of objects (never an array of strings or a string).
-- "education": An array of objects, each with "degree", "school", "year", and "gpa" (if available). If you cannot find all fields, fill what you can, but always return an array of objects (never an array of strings or a string).
-- "skills": An array of strings.
-- "projects": An array of objects, each with "title", "description", and "link" (if available). If you cannot find all fields, fill what you can, but always return an array of objects (never an array of strings or a string).
-- "achievements": An array of objects, each with "name", "issuer", and "year" (if available). Treat these as certifications, awards, or honors. If you cannot find all fields, fill what you can, but always return an array of objects.
-- "societies": An array of strings.
-- "links": An array of URLs as strings.
-- "currentCompany": If the most recent experience period contains 'Present' or 'Current', set to that company. If the most recent experience title contains 'intern', set to 'Ex-Intern at {{company}}'. If no experience, set to 'Student' or 'Fresher'. Otherwise, set to 'Ex-Employee at {{company}}'.
+Resume sections:
+{text}
+"""
 
-If a field is missing, use an empty string or empty array as appropriate.
-**Do NOT return experience, education, projects, or achievements as plain strings or arrays of strings. Always return arrays of objects for these fields.**
-The output must be valid JSON, with all fields present and correctly typed.
+# Per-field instructions for the focused prompt (same rules as RESUME_PARSE_PROMPT)
+FIELD_INSTRUCTIONS = {
+    "name": '- "name": The candidate\'s full name.',
+    "location": '- "location": City and country/state, if given.',
+    "summary": '- "summary": A 2-3 sentence professional summary or objective. If not present, generate one based on the candidate\'s experience and education.',
+    "experience": '- "experience": An array of objects, each with "title", "company", "period", and "description". Never return strings.',
+    "education": '- "education": An array of objects, each with "degree", "school", "year", and "gpa" (if available). Never return strings.',
+    "skills": '- "skills": An array of strings.',
+    "projects": '- "projects": An array of objects, each with "title", "description", and "link" (if available). Never return strings.',
+    "achievements": '- "achievements": An array of objects, each with "name", "issuer", and "year" (if available). Treat these as certifications, awards, or honors.',
+    "societies": '- "societies": An array of strings.',
+    "currentCompany": '- "currentCompany": If the most recent experience period contains \'Present\' or \'Current\', set to that company. If the most recent experience title contains \'intern\', set to \'Ex-Intern at {company}\'. If no experience, set to \'Student\' or \'Fresher\'. Otherwise, set to \'Ex-Employee at {company}\'.',
+}
 
-Example output:
-{{
-  "name": "Jane Doe",
-  "email": "jane.doe@email.com",
-  "phone": "+1-555-123-4567",
-  "location": "New York, NY",
-  "summary": "Experienced software engineer with a passion for building scalable web applications...",
-  "education": [
-    {{ "degree": "B.Sc. in Computer Science", "school": "NYU", "year": "2020", "gpa": "3.8" }},
-    {{ "degree": "High School Diploma", "school": "Central High", "year": "2016", "gpa": "" }}
-  ],
-  "skills": ["Python", "JavaScript", "SQL"],
-  "projects": [
-    {{
-      "title": "E-commerce Platform",
-      "description": "Built a full-stack e-commerce platform using React and Node.js",
-      "link": "https://github.com/janedoe/ecommerce"
-    }},
-    {{
-      "title": "Task Management App",
-      "description": "Developed a collaborative task management application with real-time updates",
-      "link": ""
-    }}
-  ],
-  "experience": [
-    {{
-      "title": "Software Engineer",
-      "company": "XYZ Corp",
-      "period": "2020-2022",
-      "description": "Worked on backend APIs and frontend features."
-    }},
-    {{
-      "title": "Intern",
-      "company": "ABC Inc.",
-      "period": "2019",
-      "description": "Assisted with web development projects."
-    }}
-  ],
-  "achievements": [
-    {{ "name": "Dean's List", "issuer": "NYU", "year": "2020" }},
-    {{ "name": "Hackathon Winner", "issuer": "ABC Hackathon", "year": "2019" }}
-  ],
-  "societies": ["ACM", "Chess Club"],
-  "links": ["https://linkedin.com/in/janedoe", "https://github.com/janedoe"],
-  "currentCompany": "XYZ Corp"
-}}
+REQUIRED_FIELDS = [
+    "name", "email", "phone", "location", "summary", "education",
+    "skills", "projects", "experience", "achievements",
+    "societies", "links", "currentCompany"
+]
+LIST_FIELDS = ["education", "skills", "projects", "experience", "achievements", "societies", "links"]
 
-Resume text:
-{text}
-""")
+# Identifies the prompts, model and pre-parser rules; cached parses from another version are not reused
+_PROMPT_FINGERPRINT = "\n".join([
+    RESUME_PARSE_PROMPT, RESUME_FOCUSED_PROMPT, *FIELD_INSTRUCTIONS.values(),
+    f"rules={RULES_VERSION if RULE_PREPARSE else 'off'}",
+])
+PARSER_VERSION = f"{MODEL_NAME}:{hashlib.sha256(_PROMPT_FINGERPRINT.encode('utf-8')).hexdigest()[:12]}"
 
-    formatted_prompt = prompt_template.format(text=text)
-    logging.info("Sending formatted prompt to LLM...")
+
+def _invoke_for_json(formatted_prompt: str) -> dict:
+    """Send a prompt and pull the JSON object out of the reply (or an error dict)"""
+    logging.info(f"Sending formatted prompt to LLM ({len(formatted_prompt)} chars)...")
     try:
         response = model.invoke([HumanMessage(content=formatted_prompt)])
         raw = response.content.strip()
@@ -214,19 +235,7 @@ Resume text:
         if json_match:
             json_str = json_match.group(0)
             try:
-                parsed_json = json.loads(json_str)
-                # Ensure all required fields are present, even if empty
-                required_fields = [
-                    "name", "email", "phone", "location", "summary", "education",
-                    "skills", "projects", "experience", "achievements",
-                    "societies", "links", "currentCompany"
-                ]
-                for field in required_fields:
-                    if field not in parsed_json:
-                        parsed_json[field] = [] if field in ["education", "skills", "projects", "experience", "achievements", "societies", "links"] else ""
-                        logging.warning(f"Field '{field}' missing in LLM response. Setting to empty value.")
-                logging.info("Successfully parsed JSON from LLM response.")
-                return parsed_json
+                return json.loads(json_str)
             except json.JSONDecodeError as e:
                 logging.error(f"JSON parsing error: {e}. Problematic JSON string: {json_str[:500]}...")
                 return {
@@ -253,7 +262,54 @@ Resume text:
             "details": "Check API key and network connectivity."
         }
 
-import re
+
+def build_prompt(text: str):
+    """(prompt, locally extracted fields) for a resume, using the pre-parser when enabled"""
+    pre = pre_parse(text) if RULE_PREPARSE else None
+    if not pre or not pre.sections:
+        # No recognisable section headings: fall back to the full prompt
+        return PromptTemplate.from_template(RESUME_PARSE_PROMPT).format(text=text), (pre.fields if pre else {})
+    wanted = pre.llm_fields()
+    prompt = RESUME_FOCUSED_PROMPT.format(
+        keys=json.dumps(wanted),
+        instructions="\n".join(FIELD_INSTRUCTIONS[name] for name in wanted),
+        text=pre.llm_text(),
+    )
+    return prompt, pre.fields
+
+
+def parse_resume_with_gpt(text: str) -> dict:
+    """
+    Parses resume text using a Google Gemini AI model to extract structured information.
+    High-confidence fields come from the rule-based pre-parser (resume_rules); the
+    model only sees the sections it has to interpret.
+    """
+    if not model:
+        logging.error("Gemini model not initialized. Cannot parse resume.")
+        return {"error": "AI model not available. Ensure GOOGLE_API_KEY is set correctly."}
+
+    if not text.strip():
+        logging.warning("Empty resume text provided.")
+        return {
+            "error": "Empty resume text",
+            "details": "The provided resume text is empty or contains only whitespace."
+        }
+
+    formatted_prompt, local_fields = build_prompt(text)
+    parsed_json = _invoke_for_json(formatted_prompt)
+    if "error" in parsed_json:
+        return parsed_json
+
+    for name, value in local_fields.items():
+        if value:
+            parsed_json[name] = value
+    # Ensure all required fields are present, even if empty
+    for field in REQUIRED_FIELDS:
+        if field not in parsed_json:
+            parsed_json[field] = [] if field in LIST_FIELDS else ""
+            logging.debug(f"Field '{field}' missing in LLM response. Setting to empty value.")
+    logging.info("Successfully parsed JSON from LLM response.")
+    return parsed_json
 
 def postprocess_parsed_data(parsed_data, raw_text):
     # Fallback for email
@@ -0,0 +1,146 @@
+# pdf_extraction.py
+"""
+Page-level PDF text extraction.
+
+A single pass over the pages collects the text layer and link annotations.
+Only pages without a text layer are OCR'd, each rasterized on its own (at
+OCR_DPI) inside a process pool, so a scanned resume never has all of its
+page images in memory at once and the request thread is not stuck running
+tesseract page after page. PDF_MAX_PAGES, OCR_MAX_PAGES and OCR_TIMEOUT cap
+the work one document can cause.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "10"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "60"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "30"))
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+    return _ocr_pool
+
+
+def _ocr_page(pdf_path: str, page_number: int, dpi: int) -> str:
+    """Rasterize one page (1-based) and OCR it; runs in a pool process"""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    try:
+        return "\n".join(pytesseract.image_to_string(image) for image in images)
+    finally:
+        for image in images:
+            image.close()
+
+
+def _page_links(page) -> List[str]:
+    links = []
+    for annot in page.get("/Annots") or []:
+        annot_obj = annot.get_object()
+        action = annot_obj.get("/A")
+        if action is not None and "/URI" in action:
+            links.append(str(action["/URI"]))
+    return links
+
+
+def _remove_when_done(path: str, futures: List[Future]):
+    """Delete path once every future has finished or been cancelled"""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def release(_future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    for future in futures:
+        future.add_done_callback(release)
+
+
+def ocr_pages(data: bytes, page_numbers: List[int]) -> Dict[int, str]:
+    """
+    OCR the given 0-based pages in the pool; pages that fail or time out come back empty.
+
+    Each page is collected on its own, so one failure does not lose the
+    others. Pages still queued at the deadline are cancelled; ones already
+    running cannot be, so the temporary PDF is deleted only after the last
+    of them finishes rather than from under a worker.
+    """
+    if not page_numbers:
+        return {}
+    results: Dict[int, str] = {}
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(data)
+    pool = _get_ocr_pool()
+    futures: Dict[int, Future] = {}
+    try:
+        for index in page_numbers:
+            futures[index] = pool.submit(_ocr_page, path, index + 1, OCR_DPI)
+    finally:
+        if futures:
+            _remove_when_done(path, list(futures.values()))
+        else:
+            os.remove(path)
+
+    # OCR_TIMEOUT bounds the whole document, not each page
+    deadline = time.monotonic() + OCR_TIMEOUT
+    timed_out = 0
+    for index, future in futures.items():
+        try:
+            results[index] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            timed_out += 1
+            future.cancel()
+        except Exception as e:
+            logging.error(f"OCR failed for page {index + 1}: {e}")
+    if timed_out:
+        logging.warning(f"OCR timed out after {OCR_TIMEOUT}s on {timed_out} of {len(futures)} pages")
+    return results
+
+
+def extract_pdf(data: bytes) -> Tuple[str, List[str]]:
+    """(text, links) for a PDF; text-less pages are OCR'd when OCR is enabled"""
+    reader = PdfReader(BytesIO(data))
+    pages = reader.pages[:PDF_MAX_PAGES]
+    texts: List[str] = []
+    links: List[str] = []
+    missing: List[int] = []
+    for index, page in enumerate(pages):
+        text = page.extract_text() or ""
+        texts.append(text)
+        if not text.strip():
+            missing.append(index)
+        links.extend(_page_links(page))
+
+    if missing and OCR_ENABLED:
+        if len(missing) > OCR_MAX_PAGES:
+            logging.warning(f"{len(missing)} pages need OCR; limiting to the first {OCR_MAX_PAGES}")
+            missing = missing[:OCR_MAX_PAGES]
+        for index, text in ocr_pages(data, missing).items():
+            texts[index] = text
+
+    logging.info(f"Extracted {len(pages)} PDF pages ({len(missing)} via OCR)")
+    return "\n".join(text for text in texts if text.strip()) + "\n", links
@@ -0,0 +1,184 @@
+# resume_rules.py
+"""
+Deterministic pre-parser for resume text.
+
+Fields that patterns extract reliably (email, phone, links, dictionary
+skills) are filled locally, and the text is split into sections by their
+headings. parse_resume_with_gpt then only sends the LLM the sections it
+actually needs to interpret (experience, education, projects, ...) with a
+prompt asking for just those fields.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Bump when the rules change so cached parses made with older rules are not reused
+RULES_VERSION = "1"
+
+EMAIL_RE = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b")
+PHONE_RE = re.compile(r"(?<![\w/])(?:\+|\()?\d[\d \t().-]{7,}\d(?![\w/])")
+URL_RE = re.compile(r"\b(?:https?://|www\.)[^\s<>()\"']+|\b(?:linkedin\.com|github\.com|gitlab\.com|leetcode\.com)/[^\s<>()\"']+", re.IGNORECASE)
+LINKS_MARKER = "[EXTRACTED LINKS]"
+
+# Heading text (lower case, punctuation stripped) -> canonical section
+SECTION_HEADINGS = {
+    "summary": "summary", "professional summary": "summary", "profile": "summary",
+    "objective": "summary", "career objective": "summary", "about me": "summary",
+    "education": "education", "academic background": "education", "academics": "education",
+    "educational qualifications": "education", "qualifications": "education",
+    "experience": "experience", "work experience": "experience", "professional experience": "experience",
+    "employment history": "experience", "internships": "experience", "internship": "experience",
+    "work history": "experience",
+    "projects": "projects", "academic projects": "projects", "personal projects": "projects",
+    "key projects": "projects",
+    "skills": "skills", "technical skills": "skills", "key skills": "skills", "core competencies": "skills",
+    "tools and technologies": "skills", "technologies": "skills",
+    "achievements": "achievements", "awards": "achievements", "certifications": "achievements",
+    "honors and awards": "achievements", "accomplishments": "achievements", "certificates": "achievements",
+    "awards and achievements": "achievements", "certifications and achievements": "achievements",
+    "societies": "societies", "extracurricular activities": "societies", "activities": "societies",
+    "positions of responsibility": "societies", "leadership": "societies", "volunteering": "societies",
+    "clubs": "societies",
+}
+
+# Canonical spelling of skills recognised anywhere in the text
+SKILL_DICTIONARY = [
+    "Python", "Java", "JavaScript", "TypeScript", "C", "C++", "C#", "Go", "Rust", "Kotlin", "Swift",
+    "Ruby", "PHP", "Scala", "R", "MATLAB", "SQL", "HTML", "CSS", "Bash",
+    "React", "Angular", "Vue", "Next.js", "Node.js", "Express", "Django", "Flask", "FastAPI",
+    "Spring Boot", "Spring", ".NET", "jQuery", "Tailwind CSS", "Bootstrap",
+    "PostgreSQL", "MySQL", "MongoDB", "Redis", "SQLite", "Oracle", "Cassandra", "Elasticsearch", "Firebase",
+    "AWS", "Azure", "GCP", "Google Cloud", "Docker", "Kubernetes", "Terraform", "Jenkins", "Git",
+    "GitHub Actions", "CI/CD", "Linux", "REST", "GraphQL", "gRPC", "Kafka", "RabbitMQ", "Spark", "Hadoop",
+    "Machine Learning", "Deep Learning", "NLP", "Computer Vision", "TensorFlow", "PyTorch", "Keras",
+    "scikit-learn", "Pandas", "NumPy", "OpenCV", "LangChain", "Power BI", "Tableau", "Excel",
+    "Figma", "Agile", "Scrum", "Jira", "Selenium", "Android", "iOS", "Flutter", "React Native",
+]
+
+# Single letters and very common words only count inside a skills section
+_AMBIGUOUS_SKILLS = {"C", "R", "Go", "Spring", "Express", "REST", "Excel"}
+
+_SKILL_PATTERNS = [
+    (skill, re.compile(r"(?<![\w+#.])" + re.escape(skill) + r"(?![\w+#])", 0 if skill in _AMBIGUOUS_SKILLS else re.IGNORECASE))
+    for skill in SKILL_DICTIONARY
+]
+
+# Fields left to the LLM unless the rules filled them
+LLM_FIELDS = ["name", "location", "summary", "education", "skills", "projects", "experience",
+              "achievements", "societies", "currentCompany"]
+# Sections the LLM is shown, in this order; contact lines stay in the header
+LLM_SECTIONS = ["summary", "experience", "education", "projects", "achievements", "societies"]
+
+
+@dataclass
+class PreParse:
+    fields: Dict[str, object] = field(default_factory=dict)
+    sections: Dict[str, str] = field(default_factory=dict)
+    header: str = ""
+
+    def llm_fields(self) -> List[str]:
+        """Fields still needing the LLM, in prompt order"""
+        # Asking for a field costs one instruction line; content under an
+        # unrecognised heading ends up in the previous section, so keep asking
+        return [name for name in LLM_FIELDS if not self.fields.get(name)]
+
+    def llm_text(self) -> str:
+        """The header lines plus the sections the LLM has to interpret (not skills)"""
+        parts = [self.header.strip()]
+        for section in LLM_SECTIONS:
+            if section in self.sections:
+                parts.append(f"{section.upper()}\n{self.sections[section].strip()}")
+        return "\n\n".join(part for part in parts if part)
+
+
+def _heading(line: str) -> Optional[str]:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 45:
+        return None
+    key = re.sub(r"[^a-z& ]", "", stripped.lower().replace("&", "and")).strip()
+    key = re.sub(r"\s+", " ", key)
+    return SECTION_HEADINGS.get(key)
+
+
+def split_sections(text: str):
+    """(header, {section: text}); text before the first heading is the header"""
+    header: List[str] = []
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in text.splitlines():
+        section = _heading(line)
+        if section:
+            current = section
+            sections.setdefault(section, [])
+            continue
+        (sections[current] if current else header).append(line)
+    return "\n".join(header), {name: "\n".join(lines).strip() for name, lines in sections.items() if "".join(lines).strip()}
+
+
+def extract_links(text: str) -> List[str]:
+    links: List[str] = []
+    for match in URL_RE.finditer(text):
+        url = match.group(0).rstrip(".,;")
+        if url not in links:
+            links.append(url)
+    return links
+
+
+def extract_phone(text: str) -> str:
+    for match in PHONE_RE.finditer(text):
+        candidate = match.group(0).strip()
+        digits = re.sub(r"\D", "", candidate)
+        # Years and date ranges are the usual false positives
+        if 10 <= len(digits) <= 15 and not re.fullmatch(r"(19|20)\d{2}[\s.-]*(19|20)\d{2}", candidate):
+            return candidate
+    return ""
+
+
+def extract_name(header: str) -> str:
+    for line in header.splitlines()[:5]:
+        line = line.strip()
+        if not line or EMAIL_RE.search(line) or URL_RE.search(line) or re.search(r"\d", line):
+            continue
+        words = line.replace("|", " ").split()
+        if 2 <= len(words) <= 4 and all(word[:1].isupper() for word in words):
+            return " ".join(words)
+        return ""
+    return ""
+
+
+def extract_skills(text: str, skills_section: Optional[str]) -> List[str]:
+    found = []
+    for skill, pattern in _SKILL_PATTERNS:
+        scope = skills_section if skill in _AMBIGUOUS_SKILLS else text
+        if scope and pattern.search(scope):
+            found.append(skill)
+    if skills_section:
+        # Keep section entries the dictionary does not know ("Category: a, b, c" lines included)
+        known = {skill.lower() for skill in found}
+        for line in skills_section.splitlines():
+            line = line.split(":", 1)[1] if ":" in line else line
+            for item in re.split(r"[,;|•·▪]|\s{2,}", line):
+                item = item.strip(" -*\t")
+                if 1 < len(item) <= 40 and item.lower() not in known and not re.search(r"[.!?]$", item):
+                    known.add(item.lower())
+                    found.append(item)
+    return found
+
+
+def pre_parse(text: str) -> PreParse:
+    body, _, link_block = text.partition(LINKS_MARKER)
+    header, sections = split_sections(body)
+    result = PreParse(sections=sections, header=header)
+
+    email = EMAIL_RE.search(body)
+    result.fields["email"] = email.group(0) if email else ""
+    result.fields["phone"] = extract_phone(header or body)
+    result.fields["links"] = extract_links(link_block) + [
+        url for url in extract_links(body) if url not in link_block
+    ]
+    name = extract_name(header)
+    if name:
+        result.fields["name"] = name
+    if "skills" in sections:
+        result.fields["skills"] = extract_skills(body, sections["skills"])
+    return result
@@ -1,7 +1,14 @@
+import logging
+import os
+import queue
 import smtplib
-from email.mime.text import MIMEText
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
-import os
+from email.mime.text import MIMEText
+from string import Template
+from typing import Iterable, List, Optional, Tuple
+
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
@@ -10,158 +17,254 @@ load_dotenv()  # Load environment variables from .env file
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_EMAIL_PASSWORD = os.getenv("SENDER_EMAIL_PASSWORD")
 
-# --- Function to Send Admin Welcome Email ---
-async def send_admin_welcome_email(recipient_email: str, username: str, admin_id: str):
-    """
-    Sends a welcome email to a new admin with their unique Admin ID.
-    """
-    if not SENDER_EMAIL or not SENDER_EMAIL_PASSWORD:
-        print("\n--- WARNING: Email sender credentials not set. Skipping admin welcome email. ---")
-        return
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# Messages sent over one SMTP session before the worker goes back to the queue
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+# Sessions idle longer than this are closed rather than reused (servers drop them)
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = "Welcome! Your Admin Account is Ready"
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = recipient_email
 
-    text_content = f"""
-    Hi {username},
+# --- Templates (compiled once at import) ---
+PASSWORD_LOGIN_LINE = "You can now log in using your email ($email) and the password you created."
+# Accounts created for the user (bulk import) without a password
+SET_PASSWORD_LINE = "To log in, first set a password for your email ($email) using this link: $reset_link"
 
-    Welcome aboard! Your administrator account has been successfully created.
 
-    Your unique Admin ID is: {admin_id}
+def _welcome_template(subject: str, greeting: str, intro: str, id_label: str, team: str,
+                      login_line: str = PASSWORD_LOGIN_LINE):
+    text = Template(f"""
+    {greeting} $name,
 
-    You can now log in using your email ({recipient_email}) and the password you created.
+    {intro}
+
+    Your unique {id_label} is: $user_id
+
+    {login_line}
 
     Best regards,
-    The Support Team
+    {team}
     AIPlanetech CareerMatch
-    """
-
-    html_content = f"""
+    """)
+    html = Template(f"""
     <html>
         <body>
-            <p>Hi {username},</p>
-            <p>Welcome aboard! Your administrator account has been successfully created.</p>
-            <p>Your unique <strong>Admin ID</strong> is: <code>{admin_id}</code></p>
-            <p>You can now log in using your email ({recipient_email}) and the password you created.</p>
-            <p>Best regards,<br>The Support Team<br>
+            <p>{greeting} $name,</p>
+            <p>{intro}</p>
+            <p>Your unique <strong>{id_label}</strong> is: <code>$user_id</code></p>
+            <p>{login_line}</p>
+            <p>Best regards,<br>{team}<br>
             <strong>AIPlanetech CareerMatch</strong></p>
         </body>
     </html>
-    """
-
-    msg.attach(MIMEText(text_content, "plain"))
-    msg.attach(MIMEText(html_content, "html"))
-
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
-            server.sendmail(SENDER_EMAIL, recipient_email, msg.as_string())
-        print(f"Admin welcome email sent successfully to {recipient_email}")
-    except Exception as e:
-        print(f"Failed to send admin welcome email to {recipient_email}: {e}")
-
-# --- Function to Send HR Welcome Email ---
-async def send_hr_welcome_email(recipient_email: str, hr_name: str, hr_id: str):
-    """
-    Sends a welcome email to a new HR with their unique HR ID.
-    """
-    if not SENDER_EMAIL or not SENDER_EMAIL_PASSWORD:
-        print("\n--- WARNING: Email sender credentials not set. Skipping HR welcome email. ---")
-        return
-
+    """)
+    return subject, text, html
+
+
+WELCOME_EMAILS = {
+    "admin": ("Welcome! Your Admin Account is Ready", "Hi",
+              "Welcome aboard! Your administrator account has been successfully created.",
+              "Admin ID", "The Support Team"),
+    "hr": ("Welcome! Your HR Account is Ready", "Hi",
+           "Welcome! Your HR account has been successfully created.",
+           "HR ID", "The Admin Team"),
+    "applicant": ("Welcome! Your Applicant Account is Ready", "Dear",
+                  "Congratulations! Your applicant account has been successfully registered.",
+                  "Applicant ID", "The Registration Team"),
+}
+WELCOME_TEMPLATES = {role: _welcome_template(*parts) for role, parts in WELCOME_EMAILS.items()}
+SET_PASSWORD_TEMPLATES = {
+    role: _welcome_template(*parts, login_line=SET_PASSWORD_LINE) for role, parts in WELCOME_EMAILS.items()
+}
+
+
+def render_welcome_email(role: str, recipient_email: str, name: str, user_id: str,
+                         reset_link: Optional[str] = None) -> MIMEMultipart:
+    """The welcome email; with a reset_link, the variant asking the user to set a password first"""
+    subject, text, html = (SET_PASSWORD_TEMPLATES if reset_link else WELCOME_TEMPLATES)[role]
+    values = {"name": name, "email": recipient_email, "user_id": user_id, "reset_link": reset_link or ""}
     msg = MIMEMultipart("alternative")
-    msg["Subject"] = "Welcome! Your HR Account is Ready"
+    msg["Subject"] = subject
     msg["From"] = SENDER_EMAIL
     msg["To"] = recipient_email
+    msg.attach(MIMEText(text.substitute(values), "plain"))
+    msg.attach(MIMEText(html.substitute(values), "html"))
+    return msg
+
+
+# --- SMTP session pool ---
+class SMTPSessionPool:
+    """Logged-in SMTP_SSL sessions reused across messages"""
+
+    def __init__(self, size: int = SMTP_POOL_SIZE):
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP_SSL, float]]" = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> smtplib.SMTP_SSL:
+        server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30)
+        server.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
+        return server
+
+    def acquire(self) -> smtplib.SMTP_SSL:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < SMTP_IDLE_SECONDS:
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except smtplib.SMTPException:
+                    pass
+            self.discard(server)
+
+    def release(self, server: smtplib.SMTP_SSL):
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self.discard(server)
+
+    @staticmethod
+    def discard(server: smtplib.SMTP_SSL):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(server)
+
+
+# --- Background dispatcher ---
+class EmailDispatcher:
+    """
+    Sends queued emails from worker threads, so request handlers never wait on
+    SMTP. Each worker drains up to EMAIL_BATCH_SIZE messages over one pooled
+    session; failed messages are requeued with backoff up to EMAIL_MAX_RETRIES.
+    """
 
-    text_content = f"""
-    Hi {hr_name},
+    def __init__(self, workers: int = SMTP_POOL_SIZE):
+        self._queue: "queue.Queue[Optional[Tuple[MIMEMultipart, int]]]" = queue.Queue()
+        self._pool = SMTPSessionPool(workers)
+        self._workers = workers
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self._workers):
+                thread = threading.Thread(target=self._run, name=f"email-dispatcher-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        """Send what is queued, then stop the workers"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+        self._pool.close()
+
+    def enqueue(self, msg: MIMEMultipart, attempt: int = 0):
+        if not SENDER_EMAIL or not SENDER_EMAIL_PASSWORD:
+            logging.warning(f"Email sender credentials not set. Skipping email to {msg['To']}.")
+            return
+        self.start()
+        self._queue.put((msg, attempt))
+
+    def _next_batch(self) -> Tuple[List[Tuple[MIMEMultipart, int]], bool]:
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        while len(batch) < EMAIL_BATCH_SIZE:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._send_batch(batch)
+            if stopping:
+                return
+
+    def _send_batch(self, batch: List[Tuple[MIMEMultipart, int]]):
+        server = None
+        for index, (msg, attempt) in enumerate(batch):
+            try:
+                if server is None:
+                    server = self._pool.acquire()
+                server.sendmail(SENDER_EMAIL, msg["To"], msg.as_string())
+                logging.info(f"{msg['Subject']!r} email sent to {msg['To']}")
+            except Exception as e:
+                if server is not None:
+                    self._pool.discard(server)
+                    server = None
+                self._retry(msg, attempt, e)
+        if server is not None:
+            self._pool.release(server)
+
+    def _retry(self, msg: MIMEMultipart, attempt: int, error: Exception):
+        if attempt + 1 >= EMAIL_MAX_RETRIES:
+            logging.error(f"Failed to send email to {msg['To']} after {attempt + 1} attempts: {error}")
+            return
+        delay = 2 ** attempt
+        logging.warning(f"Email to {msg['To']} failed ({error}); retrying in {delay}s")
+        timer = threading.Timer(delay, self._queue.put, args=((msg, attempt + 1),))
+        timer.daemon = True
+        timer.start()
+
+
+email_dispatcher = EmailDispatcher()
+
+
+def queue_welcome_email(role: str, recipient_email: str, name: str, user_id: str, reset_link: Optional[str] = None):
+    """Render and enqueue a welcome email; returns immediately"""
+    if role not in WELCOME_TEMPLATES:
+        logging.warning(f"No welcome email template for role {role!r}")
+        return
+    email_dispatcher.enqueue(render_welcome_email(role, recipient_email, name, user_id, reset_link))
 
-    Welcome! Your HR account has been successfully created.
 
-    Your unique HR ID is: {hr_id}
+def queue_welcome_emails(recipients: Iterable[Tuple[str, str, str, str, Optional[str]]]):
+    """Bulk form of queue_welcome_email for (role, email, name, user_id, reset_link) tuples"""
+    for role, recipient_email, name, user_id, reset_link in recipients:
+        queue_welcome_email(role, recipient_email, name, user_id, reset_link)
 
-    You can now log in using your email ({recipient_email}) and the password you created.
 
-    Best regards,
-    The Admin Team
-    AIPlanetech CareerMatch
+# --- Per-role helpers (kept for existing callers; they only enqueue) ---
+async def send_admin_welcome_email(recipient_email: str, username: str, admin_id: str):
     """
-
-    html_content = f"""
-    <html>
-        <body>
-            <p>Hi {hr_name},</p>
-            <p>Welcome! Your HR account has been successfully created.</p>
-            <p>Your unique <strong>HR ID</strong> is: <code>{hr_id}</code></p>
-            <p>You can now log in using your email ({recipient_email}) and the password you created.</p>
-            <p>Best regards,<br>The Admin Team<br>
-            <strong>AIPlanetech CareerMatch</strong></p>
-        </body>
-    </html>
+    Queues a welcome email to a new admin with their unique Admin ID.
     """
+    queue_welcome_email("admin", recipient_email, username, admin_id)
 
-    msg.attach(MIMEText(text_content, "plain"))
-    msg.attach(MIMEText(html_content, "html"))
-
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
-            server.sendmail(SENDER_EMAIL, recipient_email, msg.as_string())
-        print(f"HR welcome email sent successfully to {recipient_email}")
-    except Exception as e:
-        print(f"Failed to send HR welcome email to {recipient_email}: {e}")
-
-# --- Function to Send Applicant Welcome Email ---
-async def send_applicant_welcome_email(recipient_email: str, applicant_name: str, applicant_id: str):
+async def send_hr_welcome_email(recipient_email: str, hr_name: str, hr_id: str):
     """
-    Sends a welcome email to a new applicant with their unique Applicant ID.
+    Queues a welcome email to a new HR with their unique HR ID.
     """
-    if not SENDER_EMAIL or not SENDER_EMAIL_PASSWORD:
-        print("\n--- WARNING: Email sender credentials not set. Skipping applicant welcome email. ---")
-        return
-
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = "Welcome! Your Applicant Account is Ready"
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = recipient_email
+    queue_welcome_email("hr", recipient_email, hr_name, hr_id)
 
-    text_content = f"""
-    Dear {applicant_name},
-
-    Congratulations! Your applicant account has been successfully registered.
-
-    Your unique Applicant ID is: {applicant_id}
-
-    You can now log in using your email ({recipient_email}) and the password you created.
-
-    Best regards,
-    The Registration Team
-    AIPlanetech CareerMatch
+async def send_applicant_welcome_email(recipient_email: str, applicant_name: str, applicant_id: str):
     """
-
-    html_content = f"""
-    <html>
-        <body>
-            <p>Dear {applicant_name},</p>
-            <p>Congratulations! Your applicant account has been successfully registered.</p>
-            <p>Your unique <strong>Applicant ID</strong> is: <code>{applicant_id}</code></p>
-            <p>You can now log in using your email ({recipient_email}) and the password you created.</p>
-            <p>Best regards,<br>The Registration Team<br>
-            <strong>AIPlanetech CareerMatch</strong></p>
-        </body>
-    </html>
+    Queues a welcome email to a new applicant with their unique Applicant ID.
     """
-
-    msg.attach(MIMEText(text_content, "plain"))
-    msg.attach(MIMEText(html_content, "html"))
-
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(SENDER_EMAIL, SENDER_EMAIL_PASSWORD)
-            server.sendmail(SENDER_EMAIL, recipient_email, msg.as_string())
-        print(f"Applicant welcome email sent successfully to {recipient_email}")
-    except Exception as e:
-        print(f"Failed to send applicant welcome email to {recipient_email}: {e}")
+    queue_welcome_email("applicant", recipient_email, applicant_name, applicant_id)
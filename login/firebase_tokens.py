@@ -0,0 +1,145 @@
+"""
+Local verification of Firebase ID tokens.
+
+Firebase signs ID tokens with RS256 keys whose x509 certificates Google
+publishes at FIREBASE_CERTS_URL. The certificates are fetched once and kept
+for the max-age the endpoint sends in Cache-Control (they rotate every few
+hours), so verifying a token is a local signature check with no outbound call.
+If a refresh fails the last good certificates stay in use and the next
+attempt backs off; only when no certificate was ever loaded does verify()
+raise CertsUnavailable, which callers should report as a 503.
+
+FirebaseTokenVerifier takes the certificate source as a callable returning
+({kid: pem_certificate}, max_age_seconds), which lets tests sign tokens with a
+local key pair and hand the verifier the matching certificate.
+"""
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, Optional, Tuple
+
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+DEFAULT_CERTS_MAX_AGE = 3600
+# Tokens with an unknown kid trigger a refetch at most this often
+MIN_REFETCH_SECONDS = 60
+# After a failed fetch, wait this long before the next one, doubling per failure
+REFETCH_BACKOFF_SECONDS = 5
+MAX_REFETCH_BACKOFF_SECONDS = 300
+CLOCK_SKEW_SECONDS = 60
+
+CertSource = Callable[[], Tuple[Dict[str, str], float]]
+
+
+class InvalidIdToken(Exception):
+    pass
+
+
+class CertsUnavailable(Exception):
+    """No signing certificates could be loaded, so no token can be checked"""
+
+
+def fetch_google_certs(url: str = FIREBASE_CERTS_URL, timeout: float = 5.0) -> Tuple[Dict[str, str], float]:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        certs = json.loads(response.read().decode("utf-8"))
+        cache_control = response.headers.get("Cache-Control", "")
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return certs, float(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+
+
+class CertCache:
+    """
+    Public keys by kid, refreshed when the Cache-Control max-age runs out.
+
+    An unknown kid refetches early, but no more than once per
+    min_refetch_seconds, so tokens with made-up kids cannot turn every
+    request into a certificate download. A failed fetch keeps the previous
+    keys and holds off further fetches with an exponential backoff.
+    """
+
+    def __init__(self, source: CertSource = fetch_google_certs, min_refetch_seconds: float = MIN_REFETCH_SECONDS):
+        self._source = source
+        self._min_refetch_seconds = min_refetch_seconds
+        self._keys: Dict[str, object] = {}
+        self._expires_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            certs, max_age = self._source()
+            keys = {
+                kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+                for kid, pem in certs.items()
+            }
+        except Exception as e:
+            self._failures += 1
+            backoff = min(REFETCH_BACKOFF_SECONDS * 2 ** (self._failures - 1), MAX_REFETCH_BACKOFF_SECONDS)
+            self._retry_at = time.monotonic() + backoff
+            logging.warning("Fetching Firebase signing certificates failed (retry in %ds): %s", int(backoff), e)
+            return
+        self._keys = keys
+        self._failures = 0
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+        logging.info("Loaded %d Firebase signing certificates (max-age %ds)", len(keys), int(max_age))
+
+    def key_for(self, kid: str):
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires_at and now >= self._retry_at:
+                self._refresh()
+            if not self._keys:
+                raise CertsUnavailable("Firebase signing certificates are unavailable")
+            key = self._keys.get(kid)
+            if (key is None and now >= self._retry_at
+                    and now - self._fetched_at >= self._min_refetch_seconds):
+                # A kid we have not seen yet may mean the keys rotated early
+                self._refresh()
+                key = self._keys.get(kid)
+        return key
+
+
+class FirebaseTokenVerifier:
+    """Checks signature and the claims Firebase documents for ID tokens"""
+
+    def __init__(self, project_id: str, certs: Optional[CertCache] = None):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.certs = certs or CertCache()
+
+    def verify(self, id_token: str) -> dict:
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as e:
+            raise InvalidIdToken(f"Malformed ID token: {e}")
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise InvalidIdToken("ID token has an unexpected algorithm or no key id")
+
+        key = self.certs.key_for(header["kid"])
+        if key is None:
+            raise InvalidIdToken("ID token signed with an unknown key")
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=self.issuer,
+                leeway=CLOCK_SKEW_SECONDS,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidIdToken(f"ID token rejected: {e}")
+
+        if not claims["sub"] or claims.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+            raise InvalidIdToken("ID token has an invalid subject or auth_time")
+        claims["uid"] = claims["sub"]
+        return claims
@@ -1,27 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from fastapi.concurrency import run_in_threadpool
 from firebase import auth
 from dotenv import load_dotenv
 import os
 import jwt
 from datetime import datetime, timedelta
 import logging
+import threading
+import asyncio
+import csv
+import io
+import json
+from contextlib import contextmanager
+from typing import List, Optional
+from structured_logging import RequestLoggingMiddleware, configure_logging
+from token_auth import TokenVerifier
+from firebase_tokens import CertsUnavailable, FirebaseTokenVerifier, InvalidIdToken
 
 # Import email services
-from email_service import (
-    send_admin_welcome_email,
-    send_hr_welcome_email,
-    send_applicant_welcome_email,
-)
+from email_service import email_dispatcher, queue_welcome_email, queue_welcome_emails
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (LOG_LEVEL / LOG_LEVELS / LOG_FORMAT, see structured_logging.py)
+configure_logging()
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -34,6 +43,18 @@ SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-here")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRY_MINUTES", "30"))
 
+token_verifier = TokenVerifier(SECRET_KEY, [ALGORITHM])
+id_token_verifier = FirebaseTokenVerifier(os.getenv("FIREBASE_PROJECT_ID", ""))
+
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_WAIT_SECONDS = float(os.getenv("DB_POOL_WAIT_SECONDS", "30"))
+LAST_LOGIN_FLUSH_SECONDS = float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "5"))
+
+# Bulk import: concurrent Firebase calls, rows per DB batch, rows per request
+BULK_IMPORT_CONCURRENCY = int(os.getenv("BULK_IMPORT_CONCURRENCY", "8"))
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "200"))
+BULK_IMPORT_MAX_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", "5000"))
+
 # App instance
 app = FastAPI(title="Login Service", version="1.0.0")
 
@@ -43,7 +64,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 # Role mapping
 ROLE_MAP = {"applicant": "applicant", "hr": "hr", "admin": "admin"}
@@ -59,6 +82,43 @@ def get_db_connection():
         logging.error(f"Database connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
+_db_pool = None
+_db_pool_lock = threading.Lock()
+_db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+@contextmanager
+def pooled_connection():
+    """Borrow a connection from the shared pool (created on first use)"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                try:
+                    _db_pool = ThreadedConnectionPool(1, DB_POOL_MAX, DATABASE_URL)
+                except Exception as e:
+                    logging.error(f"Database connection error: {e}")
+                    raise HTTPException(status_code=500, detail="Database connection failed")
+    # The pool raises PoolError when exhausted; wait for a free slot instead
+    if not _db_pool_slots.acquire(timeout=DB_POOL_WAIT_SECONDS):
+        raise HTTPException(status_code=503, detail="Database busy, try again")
+    try:
+        conn = _db_pool.getconn()
+    except Exception as e:
+        _db_pool_slots.release()
+        logging.error(f"Database connection error: {e}")
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    broken = False
+    try:
+        yield conn
+    finally:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+        finally:
+            _db_pool.putconn(conn, close=broken or bool(conn.closed))
+            _db_pool_slots.release()
+
 def create_user_in_db(uid: str, email: str, name: str, role: str, organization: str = None):
     conn = None
     try:
@@ -94,34 +154,94 @@ def create_user_in_db(uid: str, email: str, name: str, role: str, organization:
         if cur: cur.close()
         if conn: conn.close()
 
+def create_users_in_db(users: List[dict]) -> set:
+    """Upsert many users in one multi-row INSERT; returns the uids written"""
+    with pooled_connection() as conn, conn.cursor() as cur:
+        rows = execute_values(cur, """
+            INSERT INTO users (uid, email, role, organization, created_at, updated_at)
+            VALUES %s
+            ON CONFLICT (uid) DO UPDATE SET
+                email = EXCLUDED.email,
+                role = EXCLUDED.role,
+                organization = EXCLUDED.organization,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING uid
+        """, [(u["uid"], u["email"], u["role"], u["organization"]) for u in users],
+            template="(%s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)", fetch=True)
+        conn.commit()
+        return {row[0] for row in rows}
+
 def get_user_from_db(email: str):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT uid, email, role, organization, created_at, updated_at FROM users WHERE email = %s", (email,))
-        return cur.fetchone()
+        with pooled_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT uid, email, role, organization, created_at, updated_at FROM users WHERE email = %s", (email,))
+            return cur.fetchone()
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error fetching user from database: {e}")
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        if cur: cur.close()
-        if conn: conn.close()
 
-def update_user_last_login(uid: str):
-    conn = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP WHERE uid = %s", (uid,))
-        conn.commit()
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        logging.error(f"Error updating last login: {e}")
-    finally:
-        if cur: cur.close()
-        if conn: conn.close()
+class LastLoginWriter:
+    """
+    Write-behind for users.last_login.
+
+    Logins only record the timestamp in memory; a daemon thread writes all
+    pending timestamps in one UPDATE every LAST_LOGIN_FLUSH_SECONDS.
+    """
+
+    def __init__(self, interval: float = LAST_LOGIN_FLUSH_SECONDS):
+        self._interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, uid: str):
+        with self._lock:
+            self._pending[uid] = datetime.utcnow()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="last-login-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with pooled_connection() as conn, conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE users SET last_login = v.ts, updated_at = CURRENT_TIMESTAMP
+                    FROM (VALUES %s) AS v(uid, ts)
+                    WHERE users.uid = v.uid
+                """, list(pending.items()), template="(%s, %s::timestamp)")
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error updating last login: {e}")
+            with self._lock:
+                for uid, ts in pending.items():
+                    self._pending.setdefault(uid, ts)
+
+last_login_writer = LastLoginWriter()
+
+@app.on_event("shutdown")
+def flush_last_logins():
+    last_login_writer.flush()
+
+@app.on_event("startup")
+def start_email_dispatcher():
+    email_dispatcher.start()
+
+@app.on_event("shutdown")
+def stop_email_dispatcher():
+    email_dispatcher.stop()
 
 
 # -------------------- Auth --------------------
@@ -133,12 +253,7 @@ def create_jwt_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_jwt_token(token: str):
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    return token_verifier.verify(token)
 
 
 # -------------------- Models --------------------
@@ -151,8 +266,10 @@ class SignupRequest(BaseModel):
 
 class LoginRequest(BaseModel):
     email: EmailStr
-    password: str
+    password: str = ""
     role: str
+    # Firebase ID token from the client SDK; verified locally when present
+    id_token: Optional[str] = None
 
 class UserResponse(BaseModel):
     uid: str
@@ -185,19 +302,11 @@ async def signup(data: SignupRequest):
             role=data.role.lower()
         )
 
-        # Send email
+        # Welcome email goes out from the background dispatcher
         try:
-            if data.role.lower() == "admin":
-                logging.info("Sending admin welcome email...")
-                await send_admin_welcome_email(data.email, data.name, user_record.uid)
-            elif data.role.lower() == "hr":
-                logging.info("Sending HR welcome email...")
-                await send_hr_welcome_email(data.email, data.name, user_record.uid)
-            elif data.role.lower() == "applicant":
-                logging.info("Sending applicant welcome email...")
-                await send_applicant_welcome_email(data.email, data.name, user_record.uid)
+            queue_welcome_email(data.role.lower(), data.email, data.name, user_record.uid)
         except Exception as e:
-            logging.error(f"Email sending failed: {e}")
+            logging.error(f"Email queueing failed: {e}")
 
         # JWT
         token = create_jwt_token({
@@ -230,18 +339,210 @@ async def signup(data: SignupRequest):
             raise HTTPException(status_code=500, detail="Signup failed")
 
 
+class BulkUserRow(BaseModel):
+    email: EmailStr
+    name: str
+    role: str
+    password: Optional[str] = None
+    organization: Optional[str] = None
+
+
+def parse_bulk_rows(body: bytes, content_type: str) -> List[dict]:
+    """CSV (with a header row) or NDJSON, one user per row/line"""
+    text = body.decode("utf-8-sig")
+    if "json" in content_type:
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line_no}")
+        return rows
+    return [
+        {key.strip().lower(): (value or "").strip() or None for key, value in row.items() if key}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+async def import_user_batch(batch: List[tuple], semaphore: asyncio.Semaphore):
+    """
+    Create Firebase accounts for a batch, insert their rows, queue emails; yields per-row results.
+
+    Accounts imported without a password get a password reset link in their
+    welcome email instead of being told to use a password they never chose.
+    If the database insert fails, the Firebase accounts just created are
+    deleted again so the rows can be re-imported as they are.
+    """
+
+    async def create_account(row: BulkUserRow):
+        async with semaphore:
+            record = await run_in_threadpool(
+                auth.create_user,
+                email=row.email,
+                password=row.password or None,
+                display_name=row.name,
+            )
+            if row.password:
+                return record, None
+            try:
+                return record, await run_in_threadpool(auth.generate_password_reset_link, row.email)
+            except Exception as e:
+                logging.warning(f"Could not generate a password setup link for {row.email}: {e}")
+                return record, ""
+
+    async def delete_account(uid: str) -> bool:
+        async with semaphore:
+            try:
+                await run_in_threadpool(auth.delete_user, uid)
+                return True
+            except Exception as e:
+                logging.error(f"Could not delete orphaned Firebase account {uid}: {e}")
+                return False
+
+    created = await asyncio.gather(*(create_account(row) for _, row in batch), return_exceptions=True)
+    results, users = [], []
+    for (line, row), outcome in zip(batch, created):
+        if isinstance(outcome, Exception):
+            error = "Email already exists" if "EMAIL_EXISTS" in str(outcome) else str(outcome)
+            results.append({"row": line, "email": row.email, "status": "error", "error": error})
+            continue
+        record, reset_link = outcome
+        user = {
+            "uid": record.uid,
+            "email": row.email,
+            "name": row.name,
+            "role": row.role.lower(),
+            "organization": row.organization,
+            "reset_link": reset_link,
+        }
+        users.append(user)
+        result = {"row": line, "email": row.email, "status": "created", "uid": record.uid, "_user": user}
+        if reset_link == "":
+            result["warning"] = "No password setup link could be generated; no welcome email sent"
+        results.append(result)
+
+    written = set()
+    if users:
+        try:
+            written = await run_in_threadpool(create_users_in_db, users)
+        except Exception as e:
+            logging.error(f"Bulk import database error: {e}")
+    orphans = [user["uid"] for user in users if user["uid"] not in written]
+    deleted = await asyncio.gather(*(delete_account(uid) for uid in orphans))
+    removed = {uid for uid, ok in zip(orphans, deleted) if ok}
+    queue_welcome_emails(
+        (user["role"], user["email"], user["name"], user["uid"], user["reset_link"])
+        for user in users if user["uid"] in written and user["reset_link"] != ""
+    )
+
+    for result in results:
+        user = result.pop("_user", None)
+        if user and user["uid"] not in written:
+            result.pop("warning", None)
+            if user["uid"] in removed:
+                result.pop("uid")
+                result.update(status="error", error="Database insert failed; no account was created")
+            else:
+                result.update(status="error", error="Firebase account created but database insert failed")
+        yield result
+
+
+@app.post("/users/bulk-import")
+async def bulk_import_users(request: Request, token: str):
+    """
+    Create many users from a CSV (text/csv) or NDJSON (application/x-ndjson) body.
+
+    Columns/keys: email, name, role, and optionally password and organization.
+    Only admins choose the organization per row; users imported by HR always
+    join the caller's organization, and rows naming another one are rejected.
+    The response streams one NDJSON result per input row as batches finish.
+    """
+    caller = verify_jwt_token(token)
+    if caller.get("role") not in ("hr", "admin"):
+        raise HTTPException(status_code=403, detail="Only HR and admin users can import users")
+
+    raw_rows = parse_bulk_rows(await request.body(), request.headers.get("content-type", ""))
+    if len(raw_rows) > BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_IMPORT_MAX_ROWS} rows per import")
+
+    # HR may onboard applicants and recruiters, only admins may create admins
+    allowed_roles = set(ROLE_MAP) if caller["role"] == "admin" else {"applicant", "hr"}
+    default_org = None
+    if caller["role"] == "hr":
+        db_caller = await run_in_threadpool(get_user_from_db, caller.get("email", ""))
+        default_org = db_caller["organization"] if db_caller else None
+
+    async def report():
+        semaphore = asyncio.Semaphore(BULK_IMPORT_CONCURRENCY)
+        batch, seen = [], set()
+        summary = {"created": 0, "errors": 0}
+        for line, raw in enumerate(raw_rows, start=1):
+            try:
+                row = BulkUserRow(**raw)
+                error = None
+                if row.role.lower() not in allowed_roles:
+                    error = f"Role must be one of: {', '.join(sorted(allowed_roles))}"
+                elif row.email.lower() in seen:
+                    error = "Duplicate email in import"
+                elif caller["role"] == "hr":
+                    if row.organization and row.organization != default_org:
+                        error = "HR users can only import users into their own organization"
+                    row.organization = default_org
+            except Exception as e:
+                row, error = None, str(e).splitlines()[0]
+            if error:
+                summary["errors"] += 1
+                email = raw.get("email") if isinstance(raw, dict) else None
+                yield json.dumps({"row": line, "email": email, "status": "error", "error": error}) + "\n"
+                continue
+            seen.add(row.email.lower())
+            batch.append((line, row))
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                async for result in import_user_batch(batch, semaphore):
+                    summary["created" if result["status"] == "created" else "errors"] += 1
+                    yield json.dumps(result) + "\n"
+                batch = []
+        if batch:
+            async for result in import_user_batch(batch, semaphore):
+                summary["created" if result["status"] == "created" else "errors"] += 1
+                yield json.dumps(result) + "\n"
+        logging.info(f"Bulk import by {caller.get('uid')}: {summary['created']} created, {summary['errors']} failed")
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(report(), media_type="application/x-ndjson")
+
+
 @app.post("/login", response_model=dict)
 async def login(data: LoginRequest):
     try:
-        user = auth.get_user_by_email(data.email)
-        db_user = get_user_from_db(data.email)
+        if data.id_token:
+            try:
+                # May download certificates, so keep it off the event loop
+                claims = await run_in_threadpool(id_token_verifier.verify, data.id_token)
+            except InvalidIdToken as e:
+                logging.warning(f"Login rejected: {e}")
+                raise HTTPException(status_code=401, detail="Invalid credentials")
+            except CertsUnavailable as e:
+                logging.error(f"Login unavailable: {e}")
+                raise HTTPException(status_code=503, detail="Sign-in is temporarily unavailable")
+            if (claims.get("email") or "").lower() != data.email.lower():
+                raise HTTPException(status_code=401, detail="Invalid credentials")
+        else:
+            # Legacy clients without an ID token: look the account up in Firebase
+            await run_in_threadpool(auth.get_user_by_email, data.email)
+
+        db_user = await run_in_threadpool(get_user_from_db, data.email)
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
 
+        if data.id_token and claims["uid"] != db_user["uid"]:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
         if data.role.lower() != db_user["role"]:
             raise HTTPException(status_code=403, detail=f"Role mismatch. Expected: {data.role.lower()}, Found: {db_user['role']}")
 
-        update_user_last_login(db_user["uid"])
+        last_login_writer.record(db_user["uid"])
 
         token = create_jwt_token({
             "uid": db_user["uid"],
@@ -347,6 +648,9 @@ async def health_check():
 
 @app.delete("/logout")
 async def logout(token: str):
+    payload = token_verifier.revoke(token)
+    if payload is not None:
+        logging.info(f"User {payload.get('uid')} logged out")
     return {"message": "Logout successful"}
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""
+FirebaseTokenVerifier against a local key pair.
+
+The fixture signs ID tokens with a freshly generated RSA key and serves the
+matching self-signed certificate through the CertCache source, so no call
+goes to Google. Run from the login directory:
+
+    python -m unittest discover tests
+"""
+import datetime
+import os
+import sys
+import time
+import unittest
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firebase_tokens import CertCache, CertsUnavailable, FirebaseTokenVerifier, InvalidIdToken  # noqa: E402
+
+PROJECT_ID = "test-project"
+KID = "test-kid"
+
+
+class LocalSigner:
+    """An RSA key, its self-signed certificate and a counting cert source"""
+
+    def __init__(self):
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self.key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(self.key, hashes.SHA256())
+        )
+        self.pem = cert.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+        self.fetches = 0
+
+    def certs(self):
+        self.fetches += 1
+        return {KID: self.pem}, 3600
+
+    def token(self, kid=KID, **overrides):
+        now = int(time.time())
+        claims = {
+            "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+            "aud": PROJECT_ID,
+            "sub": "user-123",
+            "iat": now,
+            "exp": now + 3600,
+            "auth_time": now,
+        }
+        claims.update(overrides)
+        return jwt.encode(claims, self.key, algorithm="RS256", headers={"kid": kid})
+
+
+class FirebaseTokenVerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.signer = LocalSigner()
+        self.verifier = FirebaseTokenVerifier(PROJECT_ID, CertCache(self.signer.certs))
+
+    def test_valid_token(self):
+        claims = self.verifier.verify(self.signer.token())
+        self.assertEqual(claims["uid"], "user-123")
+
+    def test_certificates_are_fetched_once(self):
+        self.verifier.verify(self.signer.token())
+        self.verifier.verify(self.signer.token())
+        self.assertEqual(self.signer.fetches, 1)
+
+    def test_wrong_audience(self):
+        with self.assertRaises(InvalidIdToken):
+            self.verifier.verify(self.signer.token(aud="other-project"))
+
+    def test_wrong_issuer(self):
+        with self.assertRaises(InvalidIdToken):
+            self.verifier.verify(self.signer.token(iss="https://securetoken.google.com/other-project"))
+
+    def test_expired(self):
+        with self.assertRaises(InvalidIdToken):
+            self.verifier.verify(self.signer.token(exp=int(time.time()) - 3600))
+
+    def test_signed_by_another_key(self):
+        other = LocalSigner()
+        with self.assertRaises(InvalidIdToken):
+            self.verifier.verify(other.token())
+
+    def test_unknown_kid_refetches_at_most_once_per_interval(self):
+        self.verifier.verify(self.signer.token())
+        for _ in range(5):
+            with self.assertRaises(InvalidIdToken):
+                self.verifier.verify(self.signer.token(kid="unknown"))
+        self.assertEqual(self.signer.fetches, 1)
+
+    def test_unknown_kid_refetches_after_interval(self):
+        verifier = FirebaseTokenVerifier(PROJECT_ID, CertCache(self.signer.certs, min_refetch_seconds=0))
+        verifier.verify(self.signer.token())
+        with self.assertRaises(InvalidIdToken):
+            verifier.verify(self.signer.token(kid="unknown"))
+        self.assertEqual(self.signer.fetches, 2)
+
+    def test_failed_refresh_keeps_last_good_keys(self):
+        fetched = []
+
+        def source():
+            if fetched:
+                raise OSError("certificate endpoint unreachable")
+            fetched.append(1)
+            return {KID: self.signer.pem}, 0  # expired at once, so the next verify refreshes
+
+        verifier = FirebaseTokenVerifier(PROJECT_ID, CertCache(source))
+        verifier.verify(self.signer.token())
+        claims = verifier.verify(self.signer.token())
+        self.assertEqual(claims["uid"], "user-123")
+
+    def test_unavailable_certs_back_off(self):
+        attempts = []
+
+        def source():
+            attempts.append(1)
+            raise OSError("certificate endpoint unreachable")
+
+        verifier = FirebaseTokenVerifier(PROJECT_ID, CertCache(source))
+        for _ in range(5):
+            with self.assertRaises(CertsUnavailable):
+                verifier.verify(self.signer.token())
+        self.assertEqual(len(attempts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
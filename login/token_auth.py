@@ -0,0 +1,140 @@
+"""
+Cached JWT verification with revocation.
+
+Verifying a token costs an HMAC plus JSON decoding, and the dashboard flows
+present the same token many times a minute. TokenVerifier keeps a bounded
+LRU of verified tokens keyed by their SHA-256 digest; an entry never
+outlives the token's own exp claim, so a cache hit is exactly as strict as
+a fresh decode. revoke() (used by /logout) records the digest until the
+token would have expired anyway.
+
+Revocations are held in-process by default, which only covers the process
+that served /logout: every other service and replica keeps accepting the
+token until its exp claim (or AUTH_CACHE_TTL for tokens without one). Set
+AUTH_REVOCATION_REDIS_URL (needs the `redis` package) to share revocations
+so logout takes effect everywhere at once; deployments running more than
+the login service must set it.
+
+The same file is shipped in every service that verifies tokens, so keep the
+copies identical.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+
+import jwt
+from fastapi import HTTPException
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Upper bound for tokens issued without an exp claim
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "900"))
+AUTH_REVOCATION_REDIS_URL = os.getenv("AUTH_REVOCATION_REDIS_URL")
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class LocalRevocations:
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, digest: str, expires_at: float):
+        now = time.time()
+        with self._lock:
+            self._revoked[digest] = expires_at
+            # Entries past their token's expiry can never match a valid token again
+            for key in [key for key, until in self._revoked.items() if until <= now]:
+                del self._revoked[key]
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            return digest in self._revoked
+
+
+class RedisRevocations:
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed when AUTH_REVOCATION_REDIS_URL is set
+        self._redis = redis.Redis.from_url(url)
+
+    def add(self, digest: str, expires_at: float):
+        self._redis.set(f"auth:revoked:{digest}", 1, ex=max(1, int(expires_at - time.time())))
+
+    def __contains__(self, digest: str) -> bool:
+        return bool(self._redis.exists(f"auth:revoked:{digest}"))
+
+
+class TokenVerifier:
+    """jwt.decode with an LRU of verified tokens and a revocation set"""
+
+    def __init__(self, secret: str, algorithms: Sequence[str], maxsize: int = AUTH_CACHE_SIZE):
+        self._secret = secret
+        self._algorithms = list(algorithms)
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.revocations = self._default_revocations()
+
+    @staticmethod
+    def _default_revocations():
+        if AUTH_REVOCATION_REDIS_URL:
+            try:
+                return RedisRevocations(AUTH_REVOCATION_REDIS_URL)
+            except Exception as e:
+                logging.error("Redis revocation store unavailable, using in-process set: %s", e)
+        else:
+            logging.warning("AUTH_REVOCATION_REDIS_URL not set: logout only revokes tokens in this process; "
+                            "other services accept them until they expire")
+        return LocalRevocations()
+
+    def _decode(self, token: str) -> dict:
+        try:
+            return jwt.decode(token, self._secret, algorithms=self._algorithms)
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.PyJWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+    def verify(self, token: str) -> dict:
+        """Verified claims (a fresh copy the caller may modify); raises HTTPException(401)"""
+        digest = token_digest(token)
+        if digest in self.revocations:
+            raise HTTPException(status_code=401, detail="Token revoked")
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                payload, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(digest)
+                    return dict(payload)
+                del self._entries[digest]
+                if "exp" in payload:
+                    raise HTTPException(status_code=401, detail="Token expired")
+
+        payload = self._decode(token)
+        expires_at = float(payload["exp"]) if "exp" in payload else now + AUTH_CACHE_TTL
+        with self._lock:
+            self._entries[digest] = (payload, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return dict(payload)
+
+    def revoke(self, token: str) -> Optional[dict]:
+        """Revoke a token until its expiry; returns its claims, or None if it was not valid"""
+        try:
+            payload = self.verify(token)
+        except HTTPException:
+            return None
+        digest = token_digest(token)
+        self.revocations.add(digest, float(payload.get("exp", time.time() + AUTH_CACHE_TTL)))
+        with self._lock:
+            self._entries.pop(digest, None)
+        return payload
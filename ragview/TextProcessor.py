@@ -1,21 +1,70 @@
 import os
 import re
 import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import fitz
-import requests
 from docx import Document
 from bs4 import BeautifulSoup
-from uploadValidification import detect_input_type  
+from uploadValidification import detect_input_type
+from url_fetcher import get_fetcher
+
+PDF_WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("RAG_PDF_PAGES_PER_TASK", "16"))
+
+
+class ConversionError(Exception):
+    pass
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _pdf_executor():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pdf_pool
+
+
+def _extract_page_range(path, start, stop):
+    # Runs in a worker process: PyMuPDF documents cannot be shared, so each task opens its own
+    doc = fitz.open(path)
+    try:
+        return "".join(doc[number].get_text() for number in range(start, stop))
+    finally:
+        doc.close()
+
+
+def html_to_text(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    [elem.decompose() for elem in soup(["script", "style"])]
+    return ' '.join(chunk.strip() for chunk in soup.get_text(separator=' ').split() if chunk).strip()
+
+
+def convert_urls(urls):
+    """(url, text or exception) for each URL, fetched concurrently"""
+    results = []
+    for url, html in zip(urls, get_fetcher().fetch_many(urls)):
+        if isinstance(html, Exception):
+            results.append((url, ConversionError(f"Error fetching URL: {html}")))
+        else:
+            results.append((url, html_to_text(html)))
+    return results
+
 
 class FileConverter:
-    def __init__(self, input_data):
+    def __init__(self, input_data, output_text_file="output.txt"):
         if isinstance(input_data, str):
             input_data = input_data.strip().strip('"')
         self.input_data = input_data
         self.input_type = detect_input_type(input_data)
-        self.output_text_file = "output.txt"  # output file path for text
+        self.output_text_file = output_text_file  # output file path for text
 
-    def convert(self):
+    def to_text(self):
+        """The converted text, without writing any file; raises ConversionError"""
         converters = {
             'pdf': self._convert_pdf,
             'docx': self._convert_docx,
@@ -25,25 +74,49 @@ class FileConverter:
         }
 
         if self.input_type not in converters:
-            return f"Unsupported input type: {self.input_type}"
+            raise ConversionError(f"Unsupported input type: {self.input_type}")
 
         text = converters[self.input_type]()
+        if text.startswith("Error") or text.startswith("Conversion error"):
+            raise ConversionError(text)
+        return text
+
+    def convert(self):
+        try:
+            text = self.to_text()
+        except ConversionError as e:
+            return str(e)
 
         # Save text to file if conversion succeeded
-        if not text.startswith("Error") and not text.startswith("Conversion error"):
-            with open(self.output_text_file, "w", encoding="utf-8") as f:
-                f.write(text)
-            return self.output_text_file  # Return path to text file
-        else:
-            return text
+        with open(self.output_text_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        return self.output_text_file  # Return path to text file
+
+    def iter_text(self):
+        """Yield the text in pieces as it is converted (page ranges for PDFs); raises ConversionError"""
+        if self.input_type != 'pdf':
+            yield self.to_text()
+            return
+        try:
+            yield from self._iter_pdf()
+        except Exception as e:
+            raise ConversionError(f"Error reading PDF: {e}")
+
+    def _iter_pdf(self):
+        with fitz.open(self.input_data) as doc:
+            page_count = doc.page_count
+            if page_count <= PDF_PAGES_PER_TASK or PDF_WORKERS <= 1:
+                for page in doc:
+                    yield page.get_text()
+                return
+        starts = list(range(0, page_count, PDF_PAGES_PER_TASK))
+        stops = [min(start + PDF_PAGES_PER_TASK, page_count) for start in starts]
+        # map() yields in page order as soon as each range is done
+        yield from _pdf_executor().map(_extract_page_range, [self.input_data] * len(starts), starts, stops)
 
     def _convert_pdf(self):
         try:
-            doc = fitz.open(self.input_data)
-            full_text = ""
-            for page in doc:
-                full_text += page.get_text()
-            return full_text.strip()
+            return "".join(self._iter_pdf()).strip()
         except Exception as e:
             return f"Error reading PDF: {e}"
 
@@ -57,12 +130,7 @@ class FileConverter:
 
     def _convert_url(self):
         try:
-            response = requests.get(self.input_data, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            [elem.decompose() for elem in soup(["script", "style"])]
-            text = ' '.join(chunk.strip() for chunk in soup.get_text(separator=' ').split() if chunk)
-            return text.strip()
+            return html_to_text(get_fetcher().fetch(self.input_data))
         except Exception as e:
             return f"Error fetching URL: {e}"
 
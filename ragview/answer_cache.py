@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256"))  # per namespace
+# Cosine similarity above which a differently worded question reuses an answer; 0 disables semantic lookup
+ANSWER_CACHE_SIMILARITY = float(os.getenv("RAG_ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s+#]", " ", question.lower())).strip()
+
+
+class _Entry:
+    __slots__ = ("answer", "vector", "expires")
+
+    def __init__(self, answer, vector, expires):
+        self.answer = answer
+        self.vector = vector
+        self.expires = expires
+
+
+class AnswerCache:
+    """
+    Answers keyed by (namespace, index version, normalized question).
+
+    A namespace's entries are dropped as soon as it is asked about with a
+    newer index version, i.e. after anything was ingested into it; lookups
+    and stores for an older version (a turn that started before the ingest)
+    neither hit nor touch the newer entries.
+    On an exact miss, the question embedding is compared with the cached
+    questions of the namespace and an answer is reused above the
+    similarity threshold. The embedding is only computed when there are
+    cached vectors to compare with and the caller allows it (semantic=False
+    for questions whose retrieval would not embed either); lookup() hands
+    it back so retrieval can reuse it, and store() keeps whatever vector
+    the caller already has rather than embedding again. Entries expire
+    after ttl seconds and each namespace keeps at most max_entries, least
+    recently used first out.
+    """
+
+    def __init__(self, embed=None, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_SIZE,
+                 similarity=ANSWER_CACHE_SIMILARITY):
+        self.embed = embed
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.similarity = similarity
+        self._namespaces = {}  # namespace -> (version, OrderedDict[normalized question, _Entry])
+        self._lock = threading.Lock()
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+    def _entries(self, namespace, version):
+        """The namespace's entries for version, or None if version is older than the cached one"""
+        current = self._namespaces.get(namespace)
+        if current is not None and version < current[0]:
+            return None
+        if current is None or current[0] != version:
+            current = (version, OrderedDict())
+            self._namespaces[namespace] = current
+        return current[1]
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, namespace, version, question, semantic=True):
+        """(answer or None, the raw question embedding if one was computed, for retrieval and store())"""
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries(namespace, version)
+            if entries is None:
+                self.misses += 1
+                return None, None
+            entry = entries.get(key)
+            if entry is not None and entry.expires > now:
+                entries.move_to_end(key)
+                self.hits["exact"] += 1
+                return entry.answer, None
+            candidates = [(k, e) for k, e in entries.items() if e.vector is not None and e.expires > now]
+        if not semantic or not candidates or not self.embed or self.similarity <= 0:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        vector = self.embed(question)
+        unit = self._unit(vector)
+        if unit is not None:
+            scores = np.stack([e.vector for _, e in candidates]) @ unit
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                with self._lock:
+                    self.hits["semantic"] += 1
+                return candidates[best][1].answer, vector
+        with self._lock:
+            self.misses += 1
+        return None, vector
+
+    def store(self, namespace, version, question, answer, vector=None):
+        """Without a vector (e.g. a keyword-only query) the entry only serves exact matches"""
+        vector = self._unit(vector) if self.similarity > 0 else None
+        key = normalize_question(question)
+        with self._lock:
+            entries = self._entries(namespace, version)
+            if entries is None:
+                return
+            entries[key] = _Entry(answer, vector, time.monotonic() + self.ttl)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def report(self):
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "entries": sum(len(entries) for _, entries in self._namespaces.values()),
+            }
@@ -1,101 +1,239 @@
+import json
 import os
-from flask import Flask, request, jsonify, send_from_directory
-from werkzeug.utils import secure_filename
-from TextProcessor import FileConverter
-from uploadValidification import detect_input_type
-from flask_cors import CORS
-from rag import RAG
-
-app = Flask(__name__, static_folder='ui', static_url_path='')
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-
-Upload_Folder = "uploads"
-os.makedirs(Upload_Folder, exist_ok=True)
-app.config['Upload_Folder'] = Upload_Folder
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+
+from TextProcessor import ConversionError, FileConverter, convert_urls
+from rag_engine import get_engine
+from upload_store import UploadStore
+from namespaces import InvalidNamespace, normalize_namespace
+
+app = FastAPI()
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Stored under RAG_UPLOAD_ROOT ("uploads" by default), see upload_store.py
+uploads = UploadStore()
+
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "2"))
+JOB_RETENTION_SECONDS = 24 * 3600
+
+# Built once at start-up; requests only ingest into it or query it
+engine = get_engine()
 
 ALLOWED_FILE = {'pdf', 'docx', 'json', 'txt'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_FILE
 
-# ------------------------ Serve Frontend UI ------------------------
+def secure_filename(filename):
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", os.path.basename(filename.replace("\\", "/")))
+    return name.lstrip(".") or "upload"
+
+def request_namespace(request, value=None):
+    """Namespace from the body/form field or the X-Namespace header, "default" when absent"""
+    try:
+        return normalize_namespace(value or request.headers.get('X-Namespace'))
+    except InvalidNamespace as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class IngestJobs:
+    """
+    Ingestion runs on a small thread pool; requests get a job id back
+    straight away and poll GET /jobs/{job_id}. Jobs are kept in memory for
+    a day, so run a single worker process.
+    """
+
+    def __init__(self, workers=INGEST_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, namespace, source, work):
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "state": "queued", "namespace": namespace, "source": source,
+               "embedded": 0, "to_embed": 0, "created": time.time()}
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["created"] < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job, work):
+        def progress(done, total):
+            job["embedded"], job["to_embed"] = done, total
+
+        job["state"] = "running"
+        try:
+            job.update(work(progress))
+            job["state"] = "done"
+        except ConversionError as e:
+            job.update(state="failed", detail=f"Conversion failed or error: {e}")
+        except Exception as e:
+            job.update(state="failed", detail=f"Error processing {job['source']}: {str(e)}")
+        job["finished"] = time.time()
 
-@app.route('/')
-def serve_index():
-    return send_from_directory(app.static_folder, 'index.html')
 
-@app.route('/<path:path>')
-def serve_static_file(path):
-    return send_from_directory(app.static_folder, path)
+jobs = IngestJobs()
 
 # ------------------------ Backend API Endpoints ------------------------
 
-@app.route('/ingest_url', methods=["POST"])
-def ingest_url():
-    data = request.get_json()
-    if not data or 'url' not in data:
-        return jsonify({"detail": "No URL provided"}), 400
+class IngestUrlRequest(BaseModel):
+    url: str | None = None
+    urls: list[str] | None = None
+    namespace: str | None = None
+
+class RagRequest(BaseModel):
+    query: str
+    is_first_message: bool = False
+    is_conversation_end: bool = False
+    namespace: str | None = None
+    conversation_id: str | None = None
+    stream: bool = False
+
+
+@app.post("/ingest_url", status_code=202)
+async def ingest_url(request: Request, data: IngestUrlRequest):
+    namespace = request_namespace(request, data.namespace)
+    urls = [url for url in (data.urls or [data.url]) if url]
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URL provided")
+
+    def work(progress):
+        # Fetched concurrently, then ingested one after the other
+        results = []
+        for url, text in convert_urls(urls):
+            if isinstance(text, Exception):
+                results.append({"url": url, "detail": str(text)})
+                continue
+            added = engine.ingest_text(text, source=url, namespace=namespace, progress=progress)
+            results.append({"url": url, "chunks_added": added})
+        return {"results": results, "chunks_added": sum(result.get("chunks_added", 0) for result in results)}
+
+    job = jobs.submit(namespace, ", ".join(urls), work)
+    return {"message": "URL accepted for processing", "job_id": job["job_id"], "namespace": namespace}
+
+
+@app.post("/ingest_file", status_code=202)
+async def ingest_file(request: Request, file: UploadFile = File(None), namespace: str | None = Form(None)):
+    if file is None:
+        raise HTTPException(status_code=400, detail="No file was uploaded")
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file was selected")
+    if not allowed_file(file.filename):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    namespace = request_namespace(request, namespace)
+
+    filename = secure_filename(file.filename)
+    contents = await file.read()
+    blob = await run_in_threadpool(uploads.put, contents, filename, namespace)
+    if blob.ingested:
+        # Same content was already converted and embedded into this namespace
+        uploads.unpin(blob.digest)
+        return JSONResponse({"message": "File processed successfully!", "namespace": namespace,
+                             "sha256": blob.digest, "duplicate": True, "chunks_added": 0})
+
+    def work(progress):
+        try:
+            pieces = FileConverter(blob.path).iter_text()
+            added = engine.ingest_stream(pieces, source=filename, namespace=namespace, progress=progress)
+            uploads.mark_ingested(blob.digest, namespace)
+            return {"chunks_added": added}
+        finally:
+            uploads.unpin(blob.digest)
 
-    url = data['url']
-    if not url:
-        return jsonify({"detail": "Empty URL provided"}), 400
+    job = jobs.submit(namespace, filename, work)
+    return {"message": "File accepted for processing", "job_id": job["job_id"], "namespace": namespace,
+            "sha256": blob.digest}
 
-    try:
-        converter = FileConverter(url)
-        result = converter.convert()
-        if os.path.isfile(result):
-            print(f"Conversion successful! Text saved to: {result}")
-        else:
-            return jsonify({"detail": f"Conversion failed or error: {result}"}), 500
-        return jsonify({"message": "File processed successfully!"}), 200
-    except Exception as e:
-        return jsonify({"detail": f"Error processing URL: {str(e)}"}), 500
 
-@app.route('/ingest_file', methods=["POST"])
-def ingest_file():
-    if 'file' not in request.files:
-        return jsonify({"detail": "No file was uploaded"}), 400
+@app.delete("/uploads/{digest}")
+async def release_upload(request: Request, digest: str, filename: str, namespace: str | None = None):
+    """Drop a (namespace, filename) reference to an uploaded blob; unreferenced blobs are deleted"""
+    namespace = request_namespace(request, namespace)
+    await run_in_threadpool(uploads.release, digest, namespace, secure_filename(filename))
+    return {"message": "Upload released", "sha256": digest}
 
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"detail": "No file was selected"}), 400
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['Upload_Folder'], filename)
-        file.save(filepath)
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
 
-        try:
-            converter = FileConverter(filepath)
-            result = converter.convert()
-            if os.path.isfile(result):
-                print(f"Conversion successful! Text saved to: {result}")
-            else:
-                return jsonify({"detail": f"Conversion failed or error: {result}"})
-            return jsonify({"message": "File processed successfully!"}), 200
-        except Exception as e:
-            return jsonify({"detail": f"Error processing file: {str(e)}"}), 500
 
-    else:
-        return jsonify({"detail": "Unsupported file type"}), 400
+def sse_events(pieces):
+    try:
+        for piece in pieces:
+            yield f"data: {json.dumps({'token': piece})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
 
-@app.route('/rag', methods=['POST'])
-def run_rag():
-    data = request.get_json()
-    if not data or 'query' not in data:
-        return jsonify({"error": "Missing 'query' in request body"}), 400
 
-    user_question = data['query']
-    is_first_message = data.get('is_first_message', False)
-    is_conversation_end = data.get('is_conversation_end', False)
+@app.post("/rag")
+async def run_rag(request: Request, data: RagRequest):
+    namespace = request_namespace(request, data.namespace)
+    args = (data.query, data.is_first_message, data.is_conversation_end)
 
+    # JSON by default; server-sent events when asked for
+    if data.stream or "text/event-stream" in request.headers.get("accept", ""):
+        # A sync generator: Starlette iterates it on the thread pool
+        pieces = engine.ask_stream(*args, namespace=namespace, conversation_id=data.conversation_id)
+        return StreamingResponse(sse_events(pieces), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
     try:
-        answer = RAG(user_question, is_first_message, is_conversation_end)
-        return jsonify({"answer": answer}), 200
+        answer = await run_in_threadpool(engine.ask, *args, namespace=namespace, conversation_id=data.conversation_id)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"answer": answer}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "retrieval_latency": engine.retrieval_stats.report(),
+        "answer_cache": engine.answer_cache.report(),
+        "loaded_namespaces": engine.namespaces.loaded(),
+        "conversations": len(engine.conversations),
+        "uploads": uploads.usage(),
+    }
+
+# ------------------------ Serve Frontend UI ------------------------
+
+# Mounted last so the API routes above take precedence
+app.mount("/", StaticFiles(directory="ui", html=True), name="ui")
 
 # ------------------------ Run App ------------------------
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=8080)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from answer_cache import normalize_question
+from hybrid_retrieval import tokenize
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+MEMORY_RECENT_TURNS = int(os.getenv("RAG_MEMORY_RECENT_TURNS", "4"))
+MEMORY_MAX_SESSIONS = int(os.getenv("RAG_MEMORY_MAX_SESSIONS", "1000"))
+MEMORY_SESSION_TTL = float(os.getenv("RAG_MEMORY_SESSION_TTL", "3600"))
+
+# Words that point back at an earlier turn ("what about it?", "and their salary?")
+REFERRING_WORDS = {"it", "its", "that", "this", "they", "them", "their", "those", "these", "he", "she", "his", "her"}
+FOLLOW_UP_OPENERS = ("and ", "also ", "what about", "how about", "then ")
+# Words that do not change what to search for ("anything else?", "tell me more")
+FILLER_WORDS = {"else", "more", "also", "then", "so", "ok", "okay", "please", "again", "too", "one", "ones"}
+
+
+def estimate_tokens(text):
+    # About four characters per token for English with Gemini/GPT tokenizers
+    return (len(text) + 3) // 4
+
+
+def pack_context(docs, budget=CONTEXT_TOKEN_BUDGET):
+    """Chunk texts in rank order, skipping any that would take the total past budget tokens"""
+    parts, used = [], 0
+    for doc in docs:
+        cost = estimate_tokens(doc.page_content)
+        if used + cost > budget:
+            continue
+        parts.append(doc.page_content)
+        used += cost
+    return "\n\n---\n\n".join(parts)
+
+
+class Session:
+    """One conversation: a rolling summary, the latest turns and the retrievals made so far"""
+
+    def __init__(self):
+        self.summary = ""
+        self.turns = []  # (question, answer), oldest first
+        self.retrievals = OrderedDict()  # normalized question -> docs
+        self.retrieval_version = None
+        self.last_docs = None
+        self.last_terms = set()  # search terms of the question last_docs were retrieved for
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+        self._folding = False
+
+    def is_follow_up(self, question):
+        """A question that leans on the conversation, so its answer must not be shared through the answer cache"""
+        if not self.turns:
+            return False
+        text = question.lower().strip()
+        words = set(text.replace("?", " ").split())
+        return text.startswith(FOLLOW_UP_OPENERS) or bool(words & REFERRING_WORDS) or len(tokenize(question)) <= 1
+
+    def new_search_terms(self, question):
+        """Search terms of question the last retrieval was not made for"""
+        return set(tokenize(question)) - REFERRING_WORDS - FILLER_WORDS - self.last_terms
+
+    def cached_retrieval(self, question, version):
+        with self.lock:
+            if self.retrieval_version != version:
+                self.retrievals.clear()
+                self.last_docs = None
+                self.retrieval_version = version
+            docs = self.retrievals.get(normalize_question(question))
+            # "What about it?" reuses the last retrieval; "What about Bob?" searches again
+            if docs is None and self.turns and not self.new_search_terms(question):
+                docs = self.last_docs
+            return docs
+
+    def remember_retrieval(self, question, version, docs):
+        with self.lock:
+            if self.retrieval_version != version:
+                self.retrievals.clear()
+                self.retrieval_version = version
+            self.retrievals[normalize_question(question)] = docs
+            while len(self.retrievals) > 32:
+                self.retrievals.popitem(last=False)
+            self.last_docs = docs
+            self.last_terms = set(tokenize(question))
+
+    def history(self):
+        with self.lock:
+            lines = [f"Summary of earlier conversation: {self.summary}"] if self.summary else []
+            for question, answer in self.turns:
+                lines.append(f"User: {question}\nAssistant: {answer}")
+            return "\n".join(lines)
+
+    def add_turn(self, question, answer, summarize):
+        """Record a turn; turns beyond MEMORY_RECENT_TURNS are folded into the summary in the background"""
+        with self.lock:
+            self.turns.append((question, answer))
+            self.touched = time.monotonic()
+            if len(self.turns) <= MEMORY_RECENT_TURNS or self._folding:
+                return
+            self._folding = True
+        threading.Thread(target=self._fold, args=(summarize,), name="conversation-summary", daemon=True).start()
+
+    def _fold(self, summarize):
+        with self.lock:
+            old = self.turns[:-MEMORY_RECENT_TURNS]
+            summary = self.summary
+        try:
+            transcript = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in old)
+            new_summary = summarize(summary, transcript)
+        except Exception as e:
+            print(f"Conversation summary failed: {e}")
+            with self.lock:
+                self._folding = False
+            return
+        with self.lock:
+            self.summary = new_summary.strip()
+            # Turns added while summarizing stay
+            self.turns = self.turns[len(old):]
+            self._folding = False
+
+
+class ConversationStore:
+    """Sessions by (namespace, conversation id), least recently used dropped first and after MEMORY_SESSION_TTL idle"""
+
+    def __init__(self, max_sessions=MEMORY_MAX_SESSIONS, ttl=MEMORY_SESSION_TTL):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace, conversation_id):
+        key = (namespace, conversation_id)
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or now - session.touched > self.ttl:
+                session = Session()
+                self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "100"))  # Gemini batchEmbedContents limit
+EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv("RAG_EMBED_REQUESTS_PER_MINUTE", "120"))
+EMBED_MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", "4"))
+EMBED_CHECKPOINT_DIR = os.getenv("RAG_EMBED_CHECKPOINT_DIR", "embedding_checkpoints")
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most per_minute start in any minute, across threads"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+# One limiter per process: the quota belongs to the API key, not to a job
+rate_limiter = RateLimiter(EMBED_REQUESTS_PER_MINUTE)
+
+
+def job_id_for(texts, scope=""):
+    """Checkpoint id for embedding texts into scope (the index path), so shards never share a folder"""
+    digest = hashlib.sha256(scope.encode("utf-8"))
+    for text in texts:
+        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return digest.hexdigest()[:24]
+
+
+class EmbeddingJob:
+    """
+    Embeds a list of texts in provider-sized batches.
+
+    Batches run EMBED_CONCURRENCY at a time under the shared rate limiter,
+    and failed calls are retried with backoff. Each finished batch is saved
+    to checkpoint_dir/<job id>/, with the job id derived from the scope
+    (the index the vectors are for) and the texts, so an ingest that dies
+    halfway only re-embeds the batches it had not finished when it is
+    retried. Checkpoints are written to a temporary file and renamed, so a
+    crash never leaves a truncated batch behind. Call discard() once the
+    vectors are safely stored.
+    """
+
+    def __init__(self, embeddings, texts, checkpoint_dir=EMBED_CHECKPOINT_DIR, scope="",
+                 batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY, progress=None):
+        self.embeddings = embeddings
+        self.texts = list(texts)
+        self.job_id = job_id_for(self.texts, scope)
+        self.path = os.path.join(checkpoint_dir, self.job_id)
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.progress = progress
+        self.stats = {"chunks": len(self.texts), "batches": 0, "resumed_batches": 0, "retries": 0, "seconds": 0.0}
+        self._done = 0
+        self._lock = threading.Lock()
+
+    def _checkpoint(self, number):
+        return os.path.join(self.path, f"batch_{number:06d}.npy")
+
+    def _embed_batch(self, number, batch):
+        checkpoint = self._checkpoint(number)
+        if os.path.exists(checkpoint):
+            vectors = np.load(checkpoint)
+            self._advance(len(batch), resumed=True)
+            return vectors
+        for attempt in range(EMBED_MAX_RETRIES + 1):
+            rate_limiter.acquire()
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(batch), dtype=np.float32)
+                break
+            except Exception as e:
+                if attempt == EMBED_MAX_RETRIES:
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                print(f"Embedding batch {number} of job {self.job_id} failed ({e}), retrying")
+                time.sleep(min(2 ** attempt, 30))
+        os.makedirs(self.path, exist_ok=True)
+        tmp = f"{checkpoint}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp, checkpoint)
+        self._advance(len(batch))
+        return vectors
+
+    def _advance(self, count, resumed=False):
+        with self._lock:
+            self._done += count
+            self.stats["batches"] += 1
+            if resumed:
+                self.stats["resumed_batches"] += 1
+            done = self._done
+        if self.progress:
+            self.progress(done, len(self.texts))
+
+    def run(self):
+        """One vector per text, in order"""
+        if not self.texts:
+            return []
+        os.makedirs(self.path, exist_ok=True)
+        started = time.monotonic()
+        batches = [self.texts[i:i + self.batch_size] for i in range(0, len(self.texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            results = list(pool.map(self._embed_batch, range(len(batches)), batches))
+        self.stats["seconds"] = round(time.monotonic() - started, 3)
+        rate = len(self.texts) / self.stats["seconds"] if self.stats["seconds"] else float(len(self.texts))
+        print(f"Embedded {len(self.texts)} chunks in {len(batches)} batches "
+              f"({self.stats['resumed_batches']} from checkpoint) in {self.stats['seconds']}s, {rate:.1f} chunks/s")
+        return [vector.tolist() for batch in results for vector in batch]
+
+    def discard(self):
+        shutil.rmtree(self.path, ignore_errors=True)
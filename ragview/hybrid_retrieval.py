@@ -0,0 +1,180 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+RETRIEVAL_K = int(os.getenv("RAG_RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RAG_RETRIEVAL_FETCH_K", "20"))
+RRF_K = 60
+# Queries with at most this many content terms, all of them in the index, skip the embedding call
+KEYWORD_QUERY_MAX_TERMS = int(os.getenv("RAG_KEYWORD_QUERY_MAX_TERMS", "3"))
+# Optional local cross-encoder, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2 (needs sentence-transformers)
+RERANKER_MODEL = os.getenv("RAG_RERANKER_MODEL", "")
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "has", "have",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "tell", "that", "the", "their", "this",
+    "to", "was", "what", "when", "where", "which", "who", "why", "with", "you", "your", "about", "any",
+}
+
+
+def tokenize(text):
+    """Lower-case terms; keeps c++, c#, node.js and the like in one piece"""
+    return [token.rstrip(".") for token in TOKEN_RE.findall(text.lower()) if token.rstrip(".") not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring, updated as chunks are added"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {doc id: term frequency}
+        self.lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, doc_id, text):
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self.lengths:
+                return
+            for term, count in terms.items():
+                self.postings[term][doc_id] = count
+            length = sum(terms.values())
+            self.lengths[doc_id] = length
+            self._total_length += length
+
+    def knows(self, term):
+        return term in self.postings
+
+    def search(self, terms, k):
+        """[(doc id, score)] best first"""
+        with self._lock:
+            count = len(self.lengths)
+            if not count:
+                return []
+            avg_length = self._total_length / count
+            scores = defaultdict(float)
+            for term in set(terms):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, freq in docs.items():
+                    norm = freq + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * freq * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K):
+    """Doc ids ordered by the sum of 1 / (k + rank) over the rankings they appear in"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """The cross-encoder named by RAG_RERANKER_MODEL, or None when unset or not installed"""
+    global _reranker
+    if not RERANKER_MODEL:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                print("RAG_RERANKER_MODEL is set but sentence-transformers is not installed; not reranking")
+                _reranker = False
+            else:
+                _reranker = CrossEncoder(RERANKER_MODEL)
+        return _reranker or None
+
+
+class LatencyStats:
+    """Running count, mean and max per retrieval stage, in milliseconds"""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        with self._lock:
+            for stage, ms in timings.items():
+                count, total, peak = self._stages.get(stage, (0, 0.0, 0.0))
+                self._stages[stage] = (count + 1, total + ms, max(peak, ms))
+
+    def report(self):
+        with self._lock:
+            return {
+                stage: {"count": count, "mean_ms": round(total / count, 2), "max_ms": round(peak, 2)}
+                for stage, (count, total, peak) in self._stages.items()
+            }
+
+
+class HybridRetriever:
+    """
+    BM25 and FAISS results merged by reciprocal rank fusion, optionally
+    reranked by a local cross-encoder.
+
+    Short keyword queries whose terms are all in the index (skill names,
+    product names) are answered from BM25 alone, without an embedding call.
+    retrieve() takes the question embedding when the caller already has
+    one; afterwards vector holds the embedding used, or None if there was
+    none, so the caller can reuse it.
+    """
+
+    def __init__(self, index, stats=None, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K):
+        self.index = index
+        self.stats = stats or LatencyStats()
+        self.k = k
+        self.fetch_k = fetch_k
+        self.vector = None
+
+    def is_keyword_query(self, terms):
+        return 0 < len(terms) <= KEYWORD_QUERY_MAX_TERMS and all(self.index.keywords.knows(term) for term in terms)
+
+    def retrieve(self, question, vector=None):
+        self.vector = vector
+        if self.index.store is None:
+            return []
+        timings = {}
+        started = time.perf_counter()
+        terms = tokenize(question)
+        keyword_ranking = [doc_id for doc_id, _ in self.index.keywords.search(terms, self.fetch_k)]
+        timings["bm25"] = (time.perf_counter() - started) * 1000
+
+        rankings = [keyword_ranking]
+        if not (self.is_keyword_query(terms) and keyword_ranking):
+            if self.vector is None:
+                started = time.perf_counter()
+                self.vector = self.index.embeddings.embed_query(question)
+                timings["embed"] = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            rankings.append(self.index.vector_search(self.vector, self.fetch_k))
+            timings["vector"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        fused = reciprocal_rank_fusion(*rankings)[:self.fetch_k]
+        docs = self.index.documents(fused)
+        timings["fusion"] = (time.perf_counter() - started) * 1000
+
+        reranker = get_reranker()
+        if reranker is not None and len(docs) > self.k:
+            started = time.perf_counter()
+            scores = reranker.predict([(question, doc.page_content) for doc in docs])
+            docs = [doc for _, doc in sorted(zip(scores, docs), key=lambda pair: pair[0], reverse=True)]
+            timings["rerank"] = (time.perf_counter() - started) * 1000
+
+        self.stats.record(timings)
+        print("Retrieval " + ", ".join(f"{stage} {ms:.1f} ms" for stage, ms in timings.items()))
+        return docs[:self.k]
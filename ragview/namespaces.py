@@ -0,0 +1,99 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from vector_index import SegmentedIndex
+
+DEFAULT_NAMESPACE = "default"
+NAMESPACES_ROOT = os.getenv("RAG_NAMESPACES_ROOT", "indexes")
+MAX_LOADED_NAMESPACES = int(os.getenv("RAG_MAX_LOADED_NAMESPACES", "16"))
+
+NAMESPACE_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class InvalidNamespace(ValueError):
+    pass
+
+
+def normalize_namespace(namespace):
+    """The namespace to use for a request value; None or "" means the default"""
+    namespace = (namespace or DEFAULT_NAMESPACE).strip()
+    if not NAMESPACE_RE.match(namespace):
+        raise InvalidNamespace("namespace must be 1-64 letters, digits, '-' or '_'")
+    return namespace
+
+
+class NamespaceRegistry:
+    """
+    One SegmentedIndex shard per namespace (a user or a session), loaded on
+    demand and kept in an LRU of at most max_loaded shards.
+
+    Shards live under root/<namespace>/; the default namespace keeps using
+    the original faiss_index folder so existing data stays searchable.
+    Unloading a shard only drops it from memory, its segments are already
+    on disk. Writers use ingesting(), which pins the shard: a pinned shard
+    is never evicted, so a later get() cannot load a second SegmentedIndex
+    for the same folder while the first is still writing segments.
+    """
+
+    def __init__(self, embeddings, root=NAMESPACES_ROOT, default_path=None, max_loaded=MAX_LOADED_NAMESPACES):
+        self.embeddings = embeddings
+        self.root = root
+        self.default_path = default_path
+        self.max_loaded = max(1, max_loaded)
+        self._loaded = OrderedDict()
+        self._pins = {}  # namespace -> ingests in flight
+        self._lock = threading.Lock()
+
+    def path_for(self, namespace):
+        if namespace == DEFAULT_NAMESPACE and self.default_path:
+            return self.default_path
+        return os.path.join(self.root, namespace)
+
+    def exists(self, namespace):
+        return namespace in self._loaded or os.path.exists(self.path_for(namespace))
+
+    def get(self, namespace):
+        namespace = normalize_namespace(namespace)
+        with self._lock:
+            index = self._loaded.get(namespace)
+            if index is not None:
+                self._loaded.move_to_end(namespace)
+                return index
+            index = SegmentedIndex(self.path_for(namespace), self.embeddings)
+            self._loaded[namespace] = index
+            self._evict()
+            return index
+
+    @contextmanager
+    def ingesting(self, namespace):
+        """The namespace's shard, pinned in memory until the block exits"""
+        namespace = normalize_namespace(namespace)
+        with self._lock:
+            self._pins[namespace] = self._pins.get(namespace, 0) + 1
+        try:
+            yield self.get(namespace)
+        finally:
+            with self._lock:
+                self._pins[namespace] -= 1
+                if not self._pins[namespace]:
+                    del self._pins[namespace]
+                self._evict()
+
+    def _evict(self):
+        # Least recently used first; pinned shards stay even if that leaves more than max_loaded
+        for namespace in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                return
+            if namespace in self._pins:
+                continue
+            # Under the registry lock on purpose: close() waits for a running
+            # compaction, and a reload of the same folder must not start before it ends
+            self._loaded.pop(namespace).close()
+            print(f"Unloaded namespace {namespace}")
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
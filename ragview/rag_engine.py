@@ -0,0 +1,247 @@
+import os
+import threading
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_core.output_parsers import StrOutputParser
+from langchain.prompts import PromptTemplate
+from langchain.docstore.document import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from answer_cache import AnswerCache
+from conversation import CONTEXT_TOKEN_BUDGET, ConversationStore, Session, estimate_tokens, pack_context
+from hybrid_retrieval import HybridRetriever, LatencyStats, tokenize
+from namespaces import DEFAULT_NAMESPACE, NamespaceRegistry
+
+VECTOR_DB_PATH = "faiss_index"
+CONTEXT_FILE = "output.txt"
+MODEL_NAME = "gemini-2.0-flash"
+EMBEDDING_MODEL = "models/embedding-001"
+# Converted text is chunked and embedded in windows of about this size
+STREAM_WINDOW_CHARS = int(os.getenv("RAG_STREAM_WINDOW_CHARS", "200000"))
+
+FALLBACK_ANSWER = "I'm not sure about that, but I'm happy to help with anything else you need!"
+GREETING = "Hi there! I'm excited to help you today. "
+FAREWELL = " Thanks for chatting with me! Feel free to reach out anytime."
+
+PROMPT_TEMPLATE = """
+    You are a friendly and knowledgeable assistant, acting like a human conversational partner. Your goal is to provide clear, concise, and relevant answers to the user's question based on the provided context. Follow these guidelines:
+    - Use a warm, conversational tone as if you're speaking to a friend.
+    - Answer only what the user asks, avoiding unnecessary details to keep responses focused and avoid confusion.
+    - If you can't find the answer in the context, respond politely with something like, "I'm not sure about that, but I'm happy to help with anything else you need!"
+    - If this is the first message (is_first_message=True), include a brief, friendly greeting before the answer.
+    - If this is the end of the conversation (is_conversation_end=True), include a polite farewell after the answer.
+    - Ensure the response feels natural and engaging, using phrases that make it sound human-like.
+
+    Conversation so far: {history}
+    Context: {context}
+    Question: {question}
+    Answer:
+    """
+
+SUMMARY_TEMPLATE = """
+    Update the summary of a conversation between a user and an assistant with the new turns below.
+    Keep names, facts and open questions the user may refer back to; at most five sentences.
+
+    Current summary: {summary}
+    New turns:
+    {transcript}
+    Updated summary:
+    """
+
+
+@dataclass
+class _Turn:
+    index: object
+    version: int
+    session: Session = None
+    follow_up: bool = False
+    vector: object = None
+    cached: str = None
+    docs: list = None
+    history: str = ""
+
+
+class RagEngine:
+    """
+    Model, embeddings, prompt and per-namespace FAISS indexes, built once per process.
+
+    Ingestion (ingest_text) and querying (ask) are separate paths: a question
+    costs one retrieval and one LLM call, and documents are split, embedded
+    and added to the index only when they are ingested. Every call names a
+    namespace, and each namespace has its own index shard (NamespaceRegistry),
+    so tenants only search, and only write to, their own documents. A
+    conversation_id keeps a session (ConversationStore) whose history goes
+    into the prompt and whose retrievals are reused by follow-up questions;
+    context chunks are packed up to CONTEXT_TOKEN_BUDGET tokens.
+    """
+
+    def __init__(self, index_path=VECTOR_DB_PATH):
+        load_dotenv()
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        self.index_path = index_path
+        self.model = ChatGoogleGenerativeAI(model=MODEL_NAME, google_api_key=google_api_key)
+        self.embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+        self.prompt = PromptTemplate.from_template(PROMPT_TEMPLATE)
+        self.chain = self.prompt | self.model | StrOutputParser()
+        self.summary_chain = PromptTemplate.from_template(SUMMARY_TEMPLATE) | self.model | StrOutputParser()
+        self.conversations = ConversationStore()
+        # Same chunking TextLoader.load_and_split() used
+        self.splitter = RecursiveCharacterTextSplitter()
+        self.namespaces = NamespaceRegistry(self.embeddings, default_path=index_path)
+        self.retrieval_stats = LatencyStats()
+        self.answer_cache = AnswerCache(embed=self.embeddings.embed_query)
+        if not self.namespaces.exists(DEFAULT_NAMESPACE) and os.path.exists(CONTEXT_FILE):
+            # First start without an index: embed whatever was last converted
+            with open(CONTEXT_FILE, encoding="utf-8") as f:
+                self.ingest_text(f.read(), source=CONTEXT_FILE)
+
+    def _split(self, text, source):
+        return self.splitter.split_documents([Document(page_content=text, metadata={"source": source})])
+
+    def ingest_text(self, text, source="upload", namespace=DEFAULT_NAMESPACE, progress=None):
+        """Split, embed and index the chunks of text not already in the namespace; returns how many were added"""
+        return self.ingest_stream([text], source=source, namespace=namespace, progress=progress)
+
+    def ingest_stream(self, pieces, source="upload", namespace=DEFAULT_NAMESPACE, progress=None):
+        """
+        Like ingest_text, for text arriving in pieces (FileConverter.iter_text).
+
+        Pieces are chunked and embedded a window at a time while conversion
+        continues, so the whole document is never held as one string. The
+        last chunk of each window is carried into the next one, since it may
+        continue in the next piece. progress(done, total) is called as each
+        embedding batch of the current window finishes.
+        """
+        added = 0
+        with self.namespaces.ingesting(namespace) as index:
+            window, window_size = [], 0
+            for piece in pieces:
+                window.append(piece)
+                window_size += len(piece)
+                if window_size < STREAM_WINDOW_CHARS:
+                    continue
+                chunks = self._split("".join(window), source)
+                carry = chunks.pop().page_content + "\n" if chunks else ""
+                added += index.add_documents(chunks, progress=progress)
+                window, window_size = [carry], len(carry)
+            if "".join(window).strip():
+                added += index.add_documents(self._split("".join(window), source), progress=progress)
+        if not added:
+            print(f"No new documents to add to {namespace}.")
+            return 0
+        print(f"Added {added} new documents to {namespace}.")
+        return added
+
+    def _start_turn(self, question, namespace, conversation_id):
+        index = self.namespaces.get(namespace)
+        turn = _Turn(index=index, version=index.version)
+        if conversation_id:
+            turn.session = self.conversations.get(namespace, conversation_id)
+            turn.follow_up = turn.session.is_follow_up(question)
+            turn.docs = turn.session.cached_retrieval(question, turn.version)
+        # A follow-up's answer depends on the conversation, so it is not shared
+        if not turn.follow_up:
+            # Embed for the semantic lookup only if retrieval would embed the question anyway
+            semantic = turn.docs is None and not HybridRetriever(index).is_keyword_query(tokenize(question))
+            turn.cached, turn.vector = self.answer_cache.lookup(namespace, turn.version, question, semantic=semantic)
+        return turn
+
+    def _retrieve(self, turn, question):
+        if turn.docs is not None:
+            return turn.docs
+        retriever = HybridRetriever(turn.index, stats=self.retrieval_stats)
+        # Reuses the embedding the answer cache computed, and keeps the one retrieval computed for store()
+        docs = retriever.retrieve(question, vector=turn.vector)
+        turn.vector = retriever.vector
+        if turn.session:
+            turn.session.remember_retrieval(question, turn.version, docs)
+        return docs
+
+    def _inputs(self, turn, question):
+        history = turn.session.history() if turn.session else ""
+        turn.history = history
+        budget = max(CONTEXT_TOKEN_BUDGET - estimate_tokens(history), CONTEXT_TOKEN_BUDGET // 4)
+        return {
+            "question": question,
+            "context": pack_context(self._retrieve(turn, question), budget),
+            "history": history or "(none)",
+        }
+
+    def _summarize(self, summary, transcript):
+        return self.summary_chain.invoke({"summary": summary or "(none)", "transcript": transcript})
+
+    def _finish_turn(self, turn, namespace, question, result):
+        """Cache a freshly generated answer and record the turn, cached or not, in the session"""
+        # An answer generated with this session's history in the prompt may depend on
+        # it, so only answers without history are shared through the cache
+        if turn.cached is None and not turn.follow_up and not turn.history:
+            # Cached without the greeting/farewell, which depend on the turn
+            self.answer_cache.store(namespace, turn.version, question, result, turn.vector)
+        if turn.session:
+            turn.session.add_turn(question, result, self._summarize)
+
+    def ask(self, question, is_first_message=False, is_conversation_end=False, namespace=DEFAULT_NAMESPACE,
+            conversation_id=None):
+        turn = self._start_turn(question, namespace, conversation_id)
+        result = turn.cached
+        if result is None:
+            if turn.index.store is None:
+                result = ""
+            else:
+                result = self.chain.invoke(self._inputs(turn, question))
+
+            # Handle cases where the result might indicate no answer was found
+            if not result.strip() or "no information" in result.lower():
+                result = FALLBACK_ANSWER
+        self._finish_turn(turn, namespace, question, result)
+
+        # Add greeting for the first message
+        if is_first_message:
+            result = f"{GREETING}{result}"
+
+        # Add farewell for the end of the conversation
+        if is_conversation_end:
+            result = f"{result}{FAREWELL}"
+
+        return result
+
+    def ask_stream(self, question, is_first_message=False, is_conversation_end=False, namespace=DEFAULT_NAMESPACE,
+                   conversation_id=None):
+        """ask() as a stream of text pieces; a cached answer arrives as one piece"""
+        if is_first_message:
+            yield GREETING
+        turn = self._start_turn(question, namespace, conversation_id)
+        if turn.cached is not None:
+            result = turn.cached
+            yield result
+        else:
+            parts = []
+            if turn.index.store is not None:
+                for token in self.chain.stream(self._inputs(turn, question)):
+                    parts.append(token)
+                    yield token
+            result = "".join(parts)
+            if not result.strip():
+                result = FALLBACK_ANSWER
+                yield result
+            elif "no information" in result.lower():
+                # Already streamed; later asks get the fallback from the cache
+                result = FALLBACK_ANSWER
+        self._finish_turn(turn, namespace, question, result)
+        if is_conversation_end:
+            yield FAREWELL
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide RagEngine, created on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RagEngine()
+    return _engine
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+UPLOAD_ROOT = os.getenv("RAG_UPLOAD_ROOT", "uploads")
+UPLOAD_QUOTA_BYTES = int(float(os.getenv("RAG_UPLOAD_QUOTA_MB", "1024")) * 1024 * 1024)
+INDEX_FILE = "blobs.json"
+
+
+class Blob:
+    def __init__(self, digest, path, ingested):
+        self.digest = digest
+        self.path = path
+        self.ingested = ingested  # already embedded into the requested namespace
+
+
+class UploadStore:
+    """
+    Content-addressed upload storage.
+
+    Uploads are stored once per content hash as blobs/<aa>/<sha256><ext>;
+    the extension stays because FileConverter picks the converter from it.
+    blobs.json records, per hash, the (namespace, filename) references,
+    the namespaces it has been ingested into and when it was last used.
+    Re-uploading known content into a namespace that already has it skips
+    conversion and embedding. When the blobs exceed the quota, the least
+    recently used ones are deleted, unreferenced ones first; their records
+    stay, so a repeat upload is still recognised. put() pins the blob so it
+    cannot be evicted before it is converted; call unpin() when done. A blob
+    released while pinned is deleted by the last unpin().
+    """
+
+    def __init__(self, root=UPLOAD_ROOT, quota_bytes=UPLOAD_QUOTA_BYTES):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._pinned = {}
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._blobs = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self._blobs = json.load(f)
+
+    def _save(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._blobs, f)
+        os.replace(tmp, self.index_path)
+
+    def _blob_path(self, digest, ext):
+        return os.path.join(self.root, "blobs", digest[:2], digest + ext)
+
+    def put(self, data, filename, namespace):
+        digest = hashlib.sha256(data).hexdigest()
+        ext = os.path.splitext(filename)[1].lower()
+        with self._lock:
+            record = self._blobs.setdefault(digest, {"ext": ext, "size": len(data), "refs": [], "ingested": []})
+            path = self._blob_path(digest, record["ext"])
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            record["stored"] = True
+            ref = [namespace, filename]
+            if ref not in record["refs"]:
+                record["refs"].append(ref)
+            record["last_used"] = time.time()
+            ingested = namespace in record["ingested"]
+            self._pinned[digest] = self._pinned.get(digest, 0) + 1
+            self._evict()
+            self._save()
+            return Blob(digest, path, ingested)
+
+    def mark_ingested(self, digest, namespace):
+        with self._lock:
+            record = self._blobs.get(digest)
+            if record is not None and namespace not in record["ingested"]:
+                record["ingested"].append(namespace)
+                self._save()
+
+    def release(self, digest, namespace, filename):
+        """Drop one reference; an unreferenced blob is deleted straight away"""
+        with self._lock:
+            record = self._blobs.get(digest)
+            if record is None:
+                return
+            record["refs"] = [ref for ref in record["refs"] if ref != [namespace, filename]]
+            if not record["refs"] and digest not in self._pinned:
+                self._delete_file(digest, record)
+            self._save()
+
+    def unpin(self, digest):
+        with self._lock:
+            self._pinned[digest] -= 1
+            if self._pinned[digest]:
+                return
+            del self._pinned[digest]
+            record = self._blobs.get(digest)
+            if record is not None and not record["refs"] and record.get("stored", True):
+                # Released while it was being converted
+                self._delete_file(digest, record)
+                self._save()
+
+    def _delete_file(self, digest, record):
+        try:
+            os.remove(self._blob_path(digest, record["ext"]))
+        except FileNotFoundError:
+            pass
+        record["stored"] = False
+
+    def _evict(self):
+        stored = [(digest, record) for digest, record in self._blobs.items() if record.get("stored", True)]
+        used = sum(record["size"] for _, record in stored)
+        if used <= self.quota_bytes:
+            return
+        # Unreferenced first, then least recently used
+        for digest, record in sorted(stored, key=lambda item: (bool(item[1]["refs"]), item[1].get("last_used", 0))):
+            if used <= self.quota_bytes:
+                break
+            if digest in self._pinned:
+                continue
+            self._delete_file(digest, record)
+            used -= record["size"]
+            print(f"Evicted upload {digest[:12]} ({record['size']} bytes)")
+
+    def usage(self):
+        with self._lock:
+            stored = [record for record in self._blobs.values() if record.get("stored", True)]
+            return {"blobs": len(stored), "bytes": sum(record["size"] for record in stored),
+                    "quota_bytes": self.quota_bytes, "known_hashes": len(self._blobs)}
@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+import httpx
+
+URL_CACHE_DIR = os.getenv("RAG_URL_CACHE_DIR", "url_cache")
+URL_FETCH_CONCURRENCY = int(os.getenv("RAG_URL_FETCH_CONCURRENCY", "8"))
+URL_FETCH_TIMEOUT = float(os.getenv("RAG_URL_FETCH_TIMEOUT", "10"))
+
+
+class URLFetcher:
+    """
+    Shared async HTTP client for URL ingestion.
+
+    One pooled httpx.AsyncClient runs on a background event loop of its
+    own, so the ingest jobs, which run on worker threads rather than on
+    FastAPI's event loop, reuse connections across requests. At most
+    URL_FETCH_CONCURRENCY requests are in flight. Responses carrying an
+    ETag or Last-Modified are cached on disk and revalidated with a
+    conditional GET, so an unchanged page costs a 304 and no body.
+    """
+
+    def __init__(self, cache_dir=URL_CACHE_DIR, concurrency=URL_FETCH_CONCURRENCY, timeout=URL_FETCH_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.concurrency = concurrency
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="url-fetcher", daemon=True).start()
+        self._client = None
+        self._semaphore = None
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    async def _setup(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def _cache_paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".body"
+
+    def _cached(self, url):
+        meta_path, body_path = self._cache_paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None, None
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, encoding="utf-8") as f:
+            return meta, f.read()
+
+    def _store(self, url, response):
+        validators = {name: response.headers[name] for name in ("etag", "last-modified") if name in response.headers}
+        if not validators:
+            return
+        meta_path, body_path = self._cache_paths(url)
+        with open(body_path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, **validators}, f)
+
+    async def _fetch(self, url):
+        meta, body = self._cached(url)
+        headers = {}
+        if meta:
+            if "etag" in meta:
+                headers["If-None-Match"] = meta["etag"]
+            if "last-modified" in meta:
+                headers["If-Modified-Since"] = meta["last-modified"]
+        async with self._semaphore:
+            response = await self._client.get(url, headers=headers)
+        if response.status_code == 304 and body is not None:
+            print(f"Not modified, using cached copy: {url}")
+            return body
+        response.raise_for_status()
+        self._store(url, response)
+        return response.text
+
+    async def _fetch_all(self, urls):
+        return await asyncio.gather(*(self._fetch(url) for url in urls), return_exceptions=True)
+
+    def fetch(self, url):
+        """HTML of one URL; raises httpx.HTTPError"""
+        return asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop).result()
+
+    def fetch_many(self, urls):
+        """HTML (or the exception raised) for each URL, fetched concurrently, in input order"""
+        return asyncio.run_coroutine_threadsafe(self._fetch_all(urls), self._loop).result()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = URLFetcher()
+    return _fetcher
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from embedding_jobs import EmbeddingJob
+from hybrid_retrieval import BM25Index
+
+SEGMENTS_DIR = "segments"
+HASHES_FILE = "hashes.txt"
+MANIFEST_FILE = "manifest.json"
+BASE_PREFIX = "base_"
+COMPACT_MAX_SEGMENTS = int(os.getenv("RAG_COMPACT_MAX_SEGMENTS", "8"))
+COMPACT_INTERVAL = float(os.getenv("RAG_COMPACT_INTERVAL", "300"))
+
+
+def chunk_hash(text):
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class SegmentedIndex:
+    """
+    FAISS index stored as a base plus append-only segments.
+
+    The base starts as index.faiss/index.pkl in the index folder (the layout
+    save_local has always used, so existing indexes load unchanged). Each
+    ingest embeds only chunks whose content hash is new (see EmbeddingJob),
+    writes them as a small segment under segments/ and merges them into the
+    in-memory index, so its cost is O(new chunks). Hashes are appended to hashes.txt. A
+    background thread folds segments back into the base once there are more
+    than COMPACT_MAX_SEGMENTS of them (checked every COMPACT_INTERVAL).
+    Compaction writes a new base_<generation>/ folder and then switches
+    manifest.json, which names the current base and the segments folded
+    into it, with one atomic rename; a crash at any step leaves either the
+    old or the new base, and segments the manifest lists are skipped and
+    deleted on load instead of being merged twice.
+    Merges and compaction mutate the FAISS index in place, so readers go
+    through vector_search() and documents(), which take the same lock.
+    close() waits for a running compaction, so a shard can be reloaded from
+    disk as soon as close() returns.
+    keywords is a BM25 index over the same chunks, kept in memory only.
+    version is the number of chunks stored, so it only changes when content
+    is added and survives reloads.
+    """
+
+    def __init__(self, path, embeddings):
+        self.path = path
+        self.embeddings = embeddings
+        self.store = None
+        self.hashes = set()
+        self.keywords = BM25Index()
+        self.version = 0
+        self._lock = threading.RLock()
+        self._segments = []
+        self._base = None
+        self._folded = set()
+        self._compactor = None
+        self._closed = threading.Event()
+        os.makedirs(os.path.join(path, SEGMENTS_DIR), exist_ok=True)
+        self._load()
+
+    def _load_store(self, folder):
+        return FAISS.load_local(folder, self.embeddings, allow_dangerous_deserialization=True)
+
+    def _read_manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {"base": None, "folded": []}
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        tmp = manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, manifest_path)
+
+    def _base_folder(self, base):
+        return os.path.join(self.path, base) if base else self.path
+
+    def _remove_stale_bases(self, current):
+        """Bases a finished or interrupted compaction left behind"""
+        for name in os.listdir(self.path):
+            if name.startswith(BASE_PREFIX) and name != current:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        if current:
+            for name in ("index.faiss", "index.pkl"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+
+    def _load(self):
+        manifest = self._read_manifest()
+        self._base = manifest["base"]
+        self._folded = set(manifest["folded"])
+        self._remove_stale_bases(self._base)
+        base_folder = self._base_folder(self._base)
+        if os.path.exists(os.path.join(base_folder, "index.faiss")):
+            self.store = self._load_store(base_folder)
+        segments_root = os.path.join(self.path, SEGMENTS_DIR)
+        for name in sorted(os.listdir(segments_root)):
+            folder = os.path.join(segments_root, name)
+            if name in self._folded or not os.path.exists(os.path.join(folder, "index.faiss")):
+                # Already in the base (crash before cleanup) or a partial write from a crash
+                shutil.rmtree(folder, ignore_errors=True)
+                continue
+            self._merge(self._load_store(folder))
+            self._segments.append(folder)
+
+        hashes_path = os.path.join(self.path, HASHES_FILE)
+        if os.path.exists(hashes_path):
+            with open(hashes_path, encoding="utf-8") as f:
+                self.hashes = {line.strip() for line in f if line.strip()}
+        if self.store is not None:
+            # Indexes written before hashes.txt existed (or a crash between the
+            # segment write and the hash append): hash what is actually stored
+            stored = {chunk_hash(doc.page_content) for doc in self.store.docstore._dict.values()}
+            missing = stored - self.hashes
+            if missing:
+                self._append_hashes(missing)
+                self.hashes |= missing
+            self._index_keywords(self.store)
+        self.version = len(self.hashes)
+        print(f"Loaded index {self.path}: {len(self.hashes)} chunks, {len(self._segments)} segments")
+
+    def _merge(self, segment):
+        """Merge a segment into the in-memory store, skipping chunks it already holds"""
+        if self.store is None:
+            self.store = segment
+            return
+        # Ids are chunk hashes, so a segment written twice (e.g. by two loads of
+        # the same shard) carries ids the store has; merge_from would refuse them
+        duplicate = [doc_id for doc_id in segment.index_to_docstore_id.values() if doc_id in self.store.docstore._dict]
+        if duplicate:
+            if len(duplicate) == len(segment.index_to_docstore_id):
+                return
+            segment.delete(duplicate)
+        self.store.merge_from(segment)
+
+    def _index_keywords(self, store):
+        for doc_id, doc in store.docstore._dict.items():
+            self.keywords.add(doc_id, doc.page_content)
+
+    def _append_hashes(self, hashes):
+        with open(os.path.join(self.path, HASHES_FILE), "a", encoding="utf-8") as f:
+            f.writelines(f"{h}\n" for h in hashes)
+
+    def new_documents(self, documents):
+        """Documents whose content is not indexed yet (deduplicated within the batch too)"""
+        fresh, seen = [], set()
+        for doc in documents:
+            digest = chunk_hash(doc.page_content)
+            if digest in self.hashes or digest in seen:
+                continue
+            seen.add(digest)
+            doc.metadata["chunk_hash"] = digest
+            fresh.append(doc)
+        return fresh
+
+    def add_documents(self, documents, progress=None):
+        """Embed and append the new documents as one segment; returns how many were added"""
+        with self._lock:
+            fresh = self.new_documents(documents)
+        if not fresh:
+            return 0
+        # Embedding is the slow part, so it runs outside the lock
+        job = EmbeddingJob(self.embeddings, [doc.page_content for doc in fresh], scope=self.path, progress=progress)
+        vectors = job.run()
+        with self._lock:
+            # Another ingest may have added some of the same chunks meanwhile
+            keep = [i for i, doc in enumerate(fresh) if doc.metadata["chunk_hash"] not in self.hashes]
+            if keep:
+                ids = [fresh[i].metadata["chunk_hash"] for i in keep]
+                segment = FAISS.from_embeddings(
+                    [(fresh[i].page_content, vectors[i]) for i in keep],
+                    self.embeddings,
+                    metadatas=[fresh[i].metadata for i in keep],
+                    ids=ids,
+                )
+                self._commit_segment(segment, ids)
+        job.discard()
+        return len(keep)
+
+    def _commit_segment(self, segment, ids):
+        folder = os.path.join(self.path, SEGMENTS_DIR, f"seg_{time.time_ns()}")
+        segment.save_local(folder)
+        self._append_hashes(ids)
+        self.hashes.update(ids)
+        self._segments.append(folder)
+        self._index_keywords(segment)
+        self._merge(segment)
+        self.version = len(self.hashes)
+        self.start_compactor()
+
+    def vector_search(self, vector, k):
+        """Docstore ids of the k nearest chunks, nearest first"""
+        with self._lock:
+            if self.store is None:
+                return []
+            # Searches the raw FAISS index, as similarity_search does, but keeps docstore ids for fusion
+            _, positions = self.store.index.search(np.array([vector], dtype=np.float32), k)
+            return [self.store.index_to_docstore_id[position] for position in positions[0] if position != -1]
+
+    def documents(self, doc_ids):
+        """Stored chunks for the given docstore ids, in order, skipping unknown ids"""
+        with self._lock:
+            if self.store is None:
+                return []
+            docs = [self.store.docstore.search(doc_id) for doc_id in doc_ids]
+        return [doc for doc in docs if hasattr(doc, "page_content")]
+
+    def compact(self):
+        """Fold all current segments into a new base generation"""
+        with self._lock:
+            # A closed shard may already be reloaded by another instance that owns the folder now
+            if self._closed.is_set() or not self._segments or self.store is None:
+                return False
+            merged = list(self._segments)
+            base = f"{BASE_PREFIX}{time.time_ns()}"
+            self.store.save_local(self._base_folder(base))
+            # Folded names stay listed while their folders exist, in case a deletion failed
+            segments_root = os.path.join(self.path, SEGMENTS_DIR)
+            folded = {os.path.basename(folder) for folder in merged}
+            folded |= {name for name in self._folded if os.path.exists(os.path.join(segments_root, name))}
+            # The commit point: before it the old base and segments load, after it the new base alone
+            self._write_manifest({"base": base, "folded": sorted(folded)})
+            self._base, self._folded = base, folded
+            self._remove_stale_bases(base)
+            for folder in merged:
+                shutil.rmtree(folder, ignore_errors=True)
+            self._segments = [folder for folder in self._segments if folder not in merged]
+        print(f"Compacted {len(merged)} segments into {self.path}")
+        return True
+
+    def close(self):
+        """Stop the compactor and wait for a compaction in progress; everything added is already on disk"""
+        self._closed.set()
+        compactor = self._compactor
+        if compactor is not None and compactor is not threading.current_thread():
+            compactor.join()
+
+    def start_compactor(self):
+        if self._compactor is not None or self._closed.is_set():
+            return
+        self._compactor = threading.Thread(target=self._compact_loop, name="faiss-compactor", daemon=True)
+        self._compactor.start()
+
+    def _compact_loop(self):
+        while not self._closed.wait(COMPACT_INTERVAL):
+            if len(self._segments) > COMPACT_MAX_SEGMENTS:
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"Compaction of {self.path} failed: {e}")